@@ -0,0 +1,263 @@
+"""
+Per-stage ETL benchmark
+Measures records/sec and peak RSS of extract, transform, load and validate
+separately, each in a fresh process, and saves the results as JSON so runs
+can be compared
+"""
+
+import argparse
+import json
+import logging
+import resource
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+from config import *
+from sources import InputSource
+from utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+STAGES = ['extract', 'transform', 'load', 'validate']
+
+# Settings recorded with every result, since they change what is measured
+RECORDED_SETTINGS = ['batch_size', 'chunked', 'workers', 'bulk_load', 'load_data_infile',
+                     'key_strategy', 'defer_indexes', 'quality_json_schema']
+
+BENCHMARK_DIR = BASE_DIR / 'logs' / 'benchmarks'
+# Generated inputs, kept between runs so results compare on the same records
+BENCHMARK_INPUT_DIR = BENCHMARK_DIR / 'inputs'
+
+class TimedIterator:
+    """Wraps an iterator and adds up the time spent producing its items"""
+
+    def __init__(self, iterable: Iterable[Any]):
+        self.iterator = iter(iterable)
+        self.seconds = 0.0
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Any]:
+        return self
+
+    def __next__(self) -> Any:
+        start = time.perf_counter()
+        try:
+            item = next(self.iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.count += 1
+        return item
+
+class SQLiteLoader:
+    """Embedded stand-in for MySQL: one untyped table per transformed table"""
+
+    def __init__(self, path: str):
+        sqlite3.register_adapter(date, date.isoformat)
+        sqlite3.register_adapter(datetime, datetime.isoformat)
+        self.connection = sqlite3.connect(path)
+        self.columns: Dict[str, List[str]] = {}
+
+    def load(self, transformed_data: Dict[str, List[Dict[str, Any]]]) -> int:
+        """Insert one batch and commit; returns the number of rows written"""
+        rows_written = 0
+        for table_key in LOAD_ORDER:
+            rows = transformed_data.get(table_key, [])
+            if not rows:
+                continue
+            table = TABLES.get(table_key, table_key)
+            if table not in self.columns:
+                self.columns[table] = list(rows[0]._fields)
+                self.connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(self.columns[table])})")
+            columns = self.columns[table]
+            # Rows are value tuples in the table's column order
+            self.connection.executemany(f"INSERT INTO {table} VALUES ({', '.join(['?'] * len(columns))})", rows)
+            rows_written += len(rows)
+        self.connection.commit()
+        return rows_written
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def transformed_batches(etl: Any, extract: TimedIterator) -> Iterator[tuple]:
+    """(record count, transformed tables) per batch, as PropertyETL.run_batches sees them"""
+    batches = etl.data_processor.batched(extract, ETL_CONFIG['batch_size'])
+    for record_count, transformed_data in etl.transform_batches(batches):
+        yield record_count, etl.dedupe_locations(transformed_data)
+
+def run_stage(stage: str, input_file: str, target: str, sqlite_path: Optional[str]) -> Dict[str, Any]:
+    """Run one stage (with the stages before it streaming into it) and measure it
+
+    Runs in a fresh process so peak RSS belongs to this stage. Time spent in
+    the upstream stages is subtracted; their memory is not, but it stays
+    bounded by the batch size.
+    """
+    from etl import PropertyETL
+    from quality_metrics import QualityCollector
+
+    logging.getLogger().setLevel(logging.WARNING)
+    baseline = peak_rss_mb()
+    etl = PropertyETL()
+    extract = TimedIterator(InputSource(input_file).records())
+    start = time.perf_counter()
+    rows_out = 0
+    stage_seconds = None
+
+    if stage == 'extract':
+        for _ in extract:
+            pass
+    elif stage == 'transform':
+        for _, transformed_data in transformed_batches(etl, extract):
+            rows_out += sum(len(rows) for rows in transformed_data.values())
+    elif stage == 'validate':
+        quality = QualityCollector(ETL_CONFIG['quality_json_schema'])
+        stage_seconds = 0.0
+        for _, transformed_data in transformed_batches(etl, extract):
+            observe_start = time.perf_counter()
+            quality.observe(transformed_data)
+            stage_seconds += time.perf_counter() - observe_start
+        rows_out = sum(quality.rows.values())
+    elif stage == 'load':
+        stage_seconds = 0.0
+        if target == 'mysql':
+            etl.setup()
+        else:
+            loader = SQLiteLoader(sqlite_path)
+        for _, transformed_data in transformed_batches(etl, extract):
+            load_start = time.perf_counter()
+            if target == 'mysql':
+                etl.load_data(transformed_data, commit_per_table=False)
+                etl.db_manager.commit()
+                rows_out += sum(len(rows) for rows in transformed_data.values())
+            else:
+                rows_out += loader.load(transformed_data)
+            stage_seconds += time.perf_counter() - load_start
+        if target == 'mysql':
+            finish_start = time.perf_counter()
+            if etl.bulk_session:
+                etl.finish_bulk_session()
+            stage_seconds += time.perf_counter() - finish_start
+            etl.db_manager.disconnect()
+    elif stage == 'validate_sql':
+        from validation_rules import ValidationEngine
+        etl.db_manager.connect()
+        etl.db_manager.use_database(SCHEMA_DATABASE)
+        report = ValidationEngine(etl.db_manager).run()
+        etl.db_manager.disconnect()
+        rows_out = sum(table['rows'] for table in report['tables'].values())
+        stage_seconds = report['seconds']
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+
+    elapsed = time.perf_counter() - start
+    if stage_seconds is None:
+        # Extract is timed on its own; transform is whatever remains
+        stage_seconds = extract.seconds if stage == 'extract' else elapsed - extract.seconds
+
+    records = extract.count
+    return {
+        'records': records,
+        'rows_out': rows_out,
+        'seconds': round(stage_seconds, 3),
+        'records_per_sec': round(records / stage_seconds) if stage_seconds and records else None,
+        'wall_seconds': round(elapsed, 3),
+        'baseline_rss_mb': round(baseline, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+class StageBenchmark:
+    """Runs each requested stage in its own process and collects the results"""
+
+    def __init__(self, input_file: Path, target: str = 'sqlite', stages: Optional[List[str]] = None):
+        self.input_file = input_file
+        self.target = target
+        self.stages = stages or STAGES
+
+    def run(self) -> Dict[str, Any]:
+        """Benchmark every stage; returns the result document"""
+        stages = list(self.stages)
+        if self.target == 'mysql' and 'validate' in stages:
+            stages.insert(stages.index('validate') + 1, 'validate_sql')
+
+        results = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'input': str(self.input_file),
+            'input_bytes': sum(path.stat().st_size for path in InputSource(self.input_file).files),
+            'target': self.target,
+            'settings': {key: ETL_CONFIG.get(key) for key in RECORDED_SETTINGS},
+            'stages': {}
+        }
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sqlite_path = str(Path(temp_dir) / 'benchmark.db')
+            for stage in stages:
+                logger.info(f"Benchmarking {stage}...")
+                # A fresh interpreter per stage keeps peak RSS per stage
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                    result = executor.submit(run_stage, stage, str(self.input_file), self.target, sqlite_path).result()
+                results['stages'][stage] = result
+                logger.info(f"{stage}: {result['records_per_sec']} records/sec, peak RSS {result['peak_rss_mb']} MB")
+
+        return results
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """Speed of each stage relative to a previous run (above 1 is faster)"""
+    ratios = {}
+    for stage, result in current['stages'].items():
+        before = previous.get('stages', {}).get(stage, {}).get('records_per_sec')
+        now = result.get('records_per_sec')
+        ratios[stage] = round(now / before, 2) if before and now else None
+    return ratios
+
+def main(argv: Optional[List[str]] = None):
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', type=Path, default=None,
+                        help='input file, directory, glob or manifest (default: generate --records records under logs/benchmarks/inputs)')
+    parser.add_argument('--records', type=int, default=100000, help='records to generate when --input is not given')
+    parser.add_argument('--target', choices=['sqlite', 'mysql'], default='sqlite',
+                        help='load into an embedded SQLite stand-in or the MySQL in DB_CONFIG (its schema is recreated)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--output', type=Path, default=None, help='result file (default: logs/benchmarks/)')
+    parser.add_argument('--compare', type=Path, default=None, help='previous result file to compare against')
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    try:
+        input_file = args.input
+        if input_file is None:
+            from generate_data import SyntheticDataGenerator
+            input_file = BENCHMARK_INPUT_DIR / f"benchmark_{args.records}.json"
+            if not input_file.exists():
+                SyntheticDataGenerator().write(input_file, args.records)
+
+        results = StageBenchmark(input_file, args.target, args.stages).run()
+        if args.compare:
+            with open(args.compare, 'r', encoding='utf-8') as file:
+                results['compared_to'] = str(args.compare)
+                results['speedup'] = compare(results, json.load(file))
+
+        output = args.output or BENCHMARK_DIR / f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    except Exception as e:
+        print(f"Benchmark failed: {e}")
+        return 1
+
+    print(f"{'stage':<14}{'records/sec':>14}{'seconds':>10}{'peak RSS MB':>14}{'speedup':>10}")
+    for stage, result in results['stages'].items():
+        speedup = results.get('speedup', {}).get(stage)
+        print(f"{stage:<14}{result['records_per_sec'] or 0:>14,}{result['seconds']:>10}"
+              f"{result['peak_rss_mb']:>14}{speedup if speedup is not None else '':>10}")
+    print(f"Results saved to {output}")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,129 @@
+"""
+Primary key benchmark
+Compares insert throughput and on-disk size of random VARCHAR(36) UUID keys
+against time-ordered BINARY(16) keys on scratch tables
+"""
+
+import argparse
+import logging
+import time
+import uuid
+from typing import Dict, Any, Callable
+
+from config import *
+from utils import DatabaseManager, UUID7Generator, setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Name -> (column type, key factory)
+KEY_SCHEMES: Dict[str, tuple] = {
+    'uuid4_varchar': ('VARCHAR(36)', lambda: str(uuid.uuid4())),
+    'uuid7_binary': ('BINARY(16)', UUID7Generator().generate),
+}
+
+class KeyBenchmark:
+    """Loads the same parent/child workload once per key scheme and measures it"""
+
+    def __init__(self, rows: int, batch_size: int, keep_tables: bool = False):
+        self.db_manager = DatabaseManager(pool_size=1)
+        self.rows = rows
+        self.batch_size = batch_size
+        self.keep_tables = keep_tables
+
+    def create_tables(self, name: str, key_type: str):
+        """Scratch tables shaped like properties / property_valuations"""
+        self.drop_tables(name)
+        self.db_manager.execute_query(f'''
+            CREATE TABLE bench_{name}_parent (
+                id {key_type} PRIMARY KEY,
+                payload VARCHAR(100),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''', fetch=False)
+        self.db_manager.execute_query(f'''
+            CREATE TABLE bench_{name}_child (
+                id {key_type} PRIMARY KEY,
+                parent_id {key_type},
+                amount DECIMAL(15,2),
+                INDEX idx_bench_{name}_parent (parent_id)
+            )
+        ''', fetch=False)
+
+    def drop_tables(self, name: str):
+        """Remove the scratch tables of one scheme"""
+        self.db_manager.execute_query(f"DROP TABLE IF EXISTS bench_{name}_child", fetch=False)
+        self.db_manager.execute_query(f"DROP TABLE IF EXISTS bench_{name}_parent", fetch=False)
+
+    def load(self, name: str, new_key: Callable[[], Any]) -> float:
+        """Insert self.rows parents and as many children; returns elapsed seconds"""
+        start = time.perf_counter()
+        for offset in range(0, self.rows, self.batch_size):
+            count = min(self.batch_size, self.rows - offset)
+            parents = [(new_key(), f'property {offset + i}') for i in range(count)]
+            children = [(new_key(), parent_id, 1000.0 + i) for i, (parent_id, _) in enumerate(parents)]
+            self.db_manager.insert_multirow(f"bench_{name}_parent", ['id', 'payload'], parents)
+            self.db_manager.insert_multirow(f"bench_{name}_child", ['id', 'parent_id', 'amount'], children)
+        return time.perf_counter() - start
+
+    def table_sizes(self, name: str) -> Dict[str, int]:
+        """Data and index bytes of both scratch tables"""
+        self.db_manager.execute_query(f"ANALYZE TABLE bench_{name}_parent, bench_{name}_child")
+        result = self.db_manager.execute_query('''
+            SELECT SUM(data_length), SUM(index_length)
+            FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name IN (%s, %s)
+        ''', (f"bench_{name}_parent", f"bench_{name}_child"))
+        data_length, index_length = result[0] if result else (0, 0)
+        return {'data_bytes': int(data_length or 0), 'index_bytes': int(index_length or 0)}
+
+    def run(self) -> Dict[str, Dict[str, Any]]:
+        """Run every key scheme and return its measurements"""
+        results = {}
+        try:
+            self.db_manager.connect()
+            self.db_manager.execute_query(f"CREATE DATABASE IF NOT EXISTS {SCHEMA_DATABASE}", fetch=False)
+            self.db_manager.use_database(SCHEMA_DATABASE)
+            # information_schema sizes are cached for a day by default
+            self.db_manager.execute_query("SET SESSION information_schema_stats_expiry = 0", fetch=False)
+
+            for name, (key_type, new_key) in KEY_SCHEMES.items():
+                logger.info(f"Benchmarking {name} ({key_type}) with {self.rows} rows...")
+                self.create_tables(name, key_type)
+                elapsed = self.load(name, new_key)
+                results[name] = {
+                    'key_type': key_type,
+                    'rows': self.rows * 2,
+                    'seconds': round(elapsed, 3),
+                    'rows_per_sec': round(self.rows * 2 / elapsed) if elapsed else None,
+                    **self.table_sizes(name)
+                }
+                if not self.keep_tables:
+                    self.drop_tables(name)
+        finally:
+            self.db_manager.disconnect()
+
+        return results
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='parent rows per scheme (children match)')
+    parser.add_argument('--batch-size', type=int, default=ETL_CONFIG['batch_size'])
+    parser.add_argument('--keep-tables', action='store_true', help='leave the scratch tables for inspection')
+    args = parser.parse_args()
+    setup_logging()
+
+    try:
+        results = KeyBenchmark(args.rows, args.batch_size, args.keep_tables).run()
+    except Exception as e:
+        print(f"Key benchmark failed: {e}")
+        return 1
+
+    print(f"{'scheme':<16}{'rows/sec':>12}{'data MB':>10}{'index MB':>10}")
+    for name, result in results.items():
+        print(f"{name:<16}{result['rows_per_sec']:>12,}"
+              f"{result['data_bytes'] / 2 ** 20:>10.1f}{result['index_bytes'] / 2 ** 20:>10.1f}")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
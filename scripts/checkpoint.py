@@ -0,0 +1,206 @@
+"""
+Run checkpoints
+Journals the batches and tables a chunked run has committed, with their
+source record offsets, so that a failed run can resume where it stopped
+instead of recreating the schema and starting over
+"""
+
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Set
+
+from config import *
+
+if TYPE_CHECKING:
+    from sources import InputSource
+
+logger = logging.getLogger(__name__)
+
+# Settings a resumed run must share with the run it continues
+RESUME_SETTINGS = ['key_strategy', 'incremental', 'dedupe_locations', 'location_coordinate_precision',
+                   'defer_indexes', 'create_indexes', 'dimension_tables']
+
+def input_fingerprint(source: 'InputSource') -> Dict[str, Any]:
+    """Identity of the input files and of the settings that shape the loaded rows"""
+    return dict(source.fingerprint(), settings={key: ETL_CONFIG.get(key) for key in RESUME_SETTINGS})
+
+class RunCheckpoint:
+    """Manifest and append-only journal of one chunked run
+
+    manifest.json identifies the run: input files, settings, whether loading
+    started in a bulk-load session, and its status. journal.jsonl gets one
+    line, flushed to disk, per event: a table of a batch committed, a batch
+    fully committed (with its source record range and the location index
+    changes it made), an input file read to the end (with its record
+    count, so a resumed run can pass over it unopened) or a finishing stage
+    completed. When tables commit
+    separately (with a connection pool) the transformed batch is also
+    spilled to disk until all its tables are in, so a resumed run writes
+    the remaining tables with the same keys.
+    """
+
+    def __init__(self, directory: Path = CHECKPOINT_DIR):
+        self.directory = Path(directory)
+        self.manifest_path = self.directory / 'manifest.json'
+        self.journal_path = self.directory / 'journal.jsonl'
+        self.lock = threading.Lock()
+        self.manifest: Dict[str, Any] = {}
+        self.journal = None
+        # State replayed from the journal
+        self.tables: Dict[int, Set[str]] = defaultdict(set)
+        self.batches: Dict[int, Dict[str, Any]] = {}
+        self.stages: Set[str] = set()
+        self.file_records: Dict[str, int] = {}
+
+    def start(self, source: 'InputSource'):
+        """Begin a new run, discarding the checkpoint of any previous one"""
+        if self.directory.exists():
+            shutil.rmtree(self.directory)
+        self.directory.mkdir(parents=True)
+        self.manifest = dict(input_fingerprint(source), bulk_session=False, status='running',
+                             started_at=datetime.now().isoformat(timespec='seconds'))
+        self.write_manifest()
+        self.journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def update_manifest(self, **values: Any):
+        """Record more about the run in the manifest"""
+        self.manifest.update(values)
+        self.write_manifest()
+
+    def resume(self, source: 'InputSource') -> bool:
+        """Reload the previous run's checkpoint; False if that run already completed
+
+        Raises when there is nothing to resume or the input files or settings
+        changed since the run started.
+        """
+        if not self.manifest_path.exists():
+            raise RuntimeError(f"No checkpoint to resume in {self.directory}")
+        with open(self.manifest_path, 'r', encoding='utf-8') as file:
+            self.manifest = json.load(file)
+
+        current = input_fingerprint(source)
+        changed = [key for key, value in current.items() if self.manifest.get(key) != value]
+        if changed:
+            raise RuntimeError(f"Cannot resume: {', '.join(changed)} changed since the run started")
+        if self.manifest['status'] == 'completed':
+            return False
+
+        self.replay()
+        self.manifest.update(status='running', resumed_at=datetime.now().isoformat(timespec='seconds'))
+        self.write_manifest()
+        self.journal = open(self.journal_path, 'a', encoding='utf-8')
+        logger.info(f"Resuming run started {self.manifest['started_at']}: {len(self.batches)} batches "
+                    f"({self.records_done} records) committed, stages done: {sorted(self.stages) or 'none'}")
+        return True
+
+    def replay(self):
+        """Rebuild the committed state from the journal"""
+        if not self.journal_path.exists():
+            return
+        with open(self.journal_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by the crash; nothing after it was committed
+                    logger.warning("Ignoring a truncated checkpoint journal entry")
+                    break
+                if event['event'] == 'table':
+                    self.tables[event['batch']].add(event['table'])
+                elif event['event'] == 'batch':
+                    self.batches[event['batch']] = event
+                elif event['event'] == 'stage':
+                    self.stages.add(event['stage'])
+                elif event['event'] == 'file':
+                    self.file_records[event['path']] = event['records']
+
+    def write_manifest(self):
+        """Rewrite manifest.json atomically"""
+        temp_path = Path(f"{self.manifest_path}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.manifest, file, indent=2)
+        temp_path.replace(self.manifest_path)
+
+    def record(self, event: Dict[str, Any]):
+        """Append one event to the journal and force it to disk"""
+        line = json.dumps(dict(event, at=datetime.now().isoformat(timespec='seconds'))) + '\n'
+        with self.lock:
+            self.journal.write(line)
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+
+    def table_committed(self, batch: int, table_key: str, rows: int):
+        """A table of a batch is committed; safe to call from loader threads"""
+        with self.lock:
+            self.tables[batch].add(table_key)
+        self.record({'event': 'table', 'batch': batch, 'table': table_key, 'rows': rows})
+
+    def batch_committed(self, batch: int, start: int, end: int, rows: Dict[str, int],
+                        location_changes: Optional[Dict[str, Any]]):
+        """Every table of a batch is committed; the batch will be skipped on resume"""
+        event = {'event': 'batch', 'batch': batch, 'start': start, 'end': end, 'rows': rows,
+                 'locations': location_changes}
+        self.batches[batch] = event
+        self.record(event)
+        self.spill_path(batch).unlink(missing_ok=True)
+
+    def file_read(self, stats: Dict[str, Any]):
+        """An input file was read to the end; takes InputSource stats"""
+        self.file_records[stats['path']] = stats['records']
+        self.record({'event': 'file', 'path': stats['path'], 'records': stats['records'],
+                     'bytes': stats['bytes_read']})
+
+    def stage_completed(self, stage: str):
+        """A stage after the batch loads finished (load, indexes, summary)"""
+        self.stages.add(stage)
+        self.record({'event': 'stage', 'stage': stage})
+
+    def spill_path(self, batch: int) -> Path:
+        """File holding the transformed rows of a batch that is being loaded"""
+        return self.directory / f"batch_{batch}.pickle"
+
+    def spill(self, batch: int, start: int, end: int, transformed_data: Dict[str, List[Dict[str, Any]]],
+              location_changes: Optional[Dict[str, Any]]):
+        """Keep a batch's transformed rows until all of its tables are committed"""
+        temp_path = Path(f"{self.spill_path(batch)}.tmp")
+        with open(temp_path, 'wb') as file:
+            pickle.dump({'batch': batch, 'start': start, 'end': end, 'data': transformed_data,
+                         'locations': location_changes}, file, protocol=pickle.HIGHEST_PROTOCOL)
+        temp_path.replace(self.spill_path(batch))
+
+    def pending_spill(self) -> Optional[Dict[str, Any]]:
+        """The spilled batch after the last committed one, if the failed run left one"""
+        path = self.spill_path(self.next_batch)
+        if not path.exists():
+            return None
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+
+    @property
+    def next_batch(self) -> int:
+        """Number of the first batch not yet committed"""
+        return max(self.batches, default=0) + 1
+
+    @property
+    def records_done(self) -> int:
+        """Source records covered by the committed batches"""
+        return max((event['end'] for event in self.batches.values()), default=0)
+
+    def location_changes(self) -> List[Dict[str, Any]]:
+        """Location index changes of the committed batches, in batch order"""
+        return [self.batches[batch]['locations'] for batch in sorted(self.batches) if self.batches[batch]['locations']]
+
+    def finish(self, status: str):
+        """Mark the run completed or failed"""
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+        self.manifest.update(status=status, finished_at=datetime.now().isoformat(timespec='seconds'))
+        self.write_manifest()
@@ -0,0 +1,307 @@
+"""
+Property ETL command line
+One entry point for the pipeline's commands. Each command imports only the
+modules it needs, so quick commands such as validate and report (run from
+cron and health checks) do not pay for pandas, NumPy or the Excel reader.
+
+  schema     create the schema with its indexes and constraints
+  extract    stream the input files and count records (optionally to NDJSON)
+  transform  transform the input without loading it and count rows per table
+             (optionally staging the tables as Arrow or Parquet files)
+  load       run the full pipeline (etl.py)
+  validate   run the SQL validation scans (validate_data.py)
+  quality    run the DB-free quality checks on the staged tables
+  report     summarize the latest validation, quality and metrics reports
+  bench      per-stage benchmark (benchmark.py)
+  indexes    recommend secondary indexes from EXPLAIN of the project's queries
+             (index_advisor.py)
+  startup    check the import time of the quick commands against a budget
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from config import *
+
+# Commands that forward their arguments to an existing script's main()
+DELEGATED_COMMANDS = {
+    'load': ('etl', 'run the full pipeline: extract, transform and load (etl.py)'),
+    'validate': ('validate_data', 'run the SQL validation scans (validate_data.py)'),
+    'bench': ('benchmark', 'benchmark each stage separately (benchmark.py)'),
+    'indexes': ('index_advisor', "recommend secondary indexes from EXPLAIN of the project's queries (index_advisor.py)")
+}
+
+# Modules the quick commands import before doing any work, and the budget for that
+STARTUP_COMMANDS = {
+    'validate': ['validate_data'],
+    'report': []
+}
+# validate spends ~80 ms of its ~130 ms in mysql.connector; pandas alone takes ~700 ms
+STARTUP_BUDGET_MS = 250
+
+# Modules the quick commands must never import
+HEAVY_MODULES = ['pandas', 'numpy', 'openpyxl']
+
+# Reports summarized by `report`
+REPORT_FILES = {
+    'validation': VALIDATION_REPORT_FILE,
+    'quality': QUALITY_REPORT_FILE,
+    'metrics': METRICS_FILE
+}
+
+def command_schema(args: argparse.Namespace) -> int:
+    """Create the schema, then its indexes and constraints"""
+    from utils import setup_logging
+    setup_logging()
+    from etl import PropertyETL
+
+    etl = PropertyETL()
+    try:
+        etl.db_manager.connect()
+        etl.create_schema()
+        if etl.bulk_session:
+            etl.finish_bulk_session()
+        print(f"Schema {SCHEMA_DATABASE} created")
+    except Exception as e:
+        print(f"Schema creation failed: {e}")
+        return 1
+    finally:
+        etl.db_manager.disconnect()
+    return 0
+
+def command_extract(args: argparse.Namespace) -> int:
+    """Stream the input and count its records, optionally writing them as NDJSON"""
+    from sources import InputSource
+
+    start = time.perf_counter()
+    count = 0
+    source = InputSource(args.input, args.read_workers)
+    try:
+        records = source.records()
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as file:
+                for record in records:
+                    file.write(json.dumps(record) + '\n')
+                    count += 1
+        else:
+            for _ in records:
+                count += 1
+    except Exception as e:
+        print(f"Extract failed: {e}")
+        return 1
+
+    elapsed = time.perf_counter() - start
+    print(f"Extracted {count} records from {args.input} in {elapsed:.2f}s "
+          f"({count / elapsed if elapsed else 0:,.0f} records/sec)")
+    if len(source.stats) > 1:
+        for stats in source.stats:
+            print(f"  {stats['path']:<48}{stats['records']:>10} records{stats['bytes_read'] / 2 ** 20:>10.1f} MB")
+    return 0
+
+def command_transform(args: argparse.Namespace) -> int:
+    """Transform the input batch by batch without loading it and count rows per table"""
+    from utils import DataProcessor, setup_logging
+    setup_logging()
+    from etl import PropertyETL
+    from sources import InputSource
+
+    etl = PropertyETL()
+    rows = {table_key: 0 for table_key in LOAD_ORDER}
+    start = time.perf_counter()
+    records = 0
+    try:
+        staging = None
+        if args.stage:
+            from staging import StagingWriter
+            staging = StagingWriter(args.staging_dir, args.format or ETL_CONFIG['staging_format'])
+            staging.start()
+        batches = DataProcessor.batched(InputSource(args.input, args.read_workers).records(),
+                                        ETL_CONFIG['batch_size'])
+        for batch_number, (record_count, transformed_data) in enumerate(etl.transform_batches(batches), 1):
+            records += record_count
+            transformed_data = etl.dedupe_locations(transformed_data)
+            for table_key, table_rows in transformed_data.items():
+                rows[table_key] += len(table_rows)
+            if staging:
+                staging.write_batch(batch_number, record_count, transformed_data)
+        if staging:
+            staging.finish(args.input)
+    except Exception as e:
+        print(f"Transform failed: {e}")
+        return 1
+
+    elapsed = time.perf_counter() - start
+    print(f"Transformed {records} records in {elapsed:.2f}s ({records / elapsed if elapsed else 0:,.0f} records/sec)")
+    for table_key, count in rows.items():
+        print(f"  {TABLES.get(table_key, table_key):<22}{count:>10}")
+    for name, cache in etl.field_mapping.cache_report().items():
+        if cache['calls']:
+            print(f"  cache {name:<32}{cache['hit_rate']:>8.1%} hits, {cache['entries']} values")
+    return 0
+
+def command_quality(args: argparse.Namespace) -> int:
+    """Run the inline quality rules over staged tables and write the quality report"""
+    from utils import setup_logging
+    setup_logging()
+    from staging import check_staged
+    from validation_rules import save_report
+
+    try:
+        quality = check_staged(args.staging_dir, args.json_schema)
+    except Exception as e:
+        print(f"Quality check failed: {e}")
+        return 1
+
+    quality.log_summary()
+    report = quality.report()
+    report['staging'] = str(args.staging_dir)
+    save_report(report, args.output)
+    for table_key, count in report['rows'].items():
+        print(f"  {TABLES.get(table_key, table_key):<22}{count:>10}")
+    print(f"{report['warnings']} rules with violations; report written to {args.output}")
+    return 0
+
+def read_report(path: Path) -> Optional[Dict[str, Any]]:
+    """A JSON report, or None if it has not been written yet"""
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def command_report(args: argparse.Namespace) -> int:
+    """Summarize the latest reports; fails if validation failed or a report is stale"""
+    reports = {name: read_report(path) for name, path in REPORT_FILES.items()}
+    if args.json:
+        print(json.dumps(reports, indent=2))
+
+    status = 0
+    validation = reports['validation']
+    if validation is None:
+        print(f"validation: no report at {REPORT_FILES['validation']}")
+    else:
+        failed = not validation['passed']
+        status = 1 if failed else status
+        print(f"validation: {'FAILED' if failed else 'passed'} at {validation.get('generated_at')}, "
+              f"{validation['warnings']} warnings, {len(validation['errors'])} failed scans")
+
+    quality = reports['quality']
+    if quality is not None:
+        print(f"quality: {sum(quality['rows'].values())} rows observed at {quality.get('generated_at')}, "
+              f"{quality['warnings']} rules with violations")
+
+    metrics = reports['metrics']
+    if metrics is not None:
+        print(f"metrics: run at {metrics.get('generated_at')}")
+        for name, stage in metrics['stages'].items():
+            print(f"  {name:<24}{stage['wall_seconds']:>10.2f}s{stage['rows_per_sec'] or 0:>12,} rows/s")
+        if metrics.get('pipeline'):
+            print(f"  pipeline bottleneck: {metrics['pipeline']['bottleneck']}")
+
+    if args.max_age_hours is not None:
+        for name, path in REPORT_FILES.items():
+            if path.exists():
+                age_hours = (time.time() - path.stat().st_mtime) / 3600
+                if age_hours > args.max_age_hours:
+                    print(f"{name}: report is {age_hours:.1f} hours old (limit {args.max_age_hours})")
+                    status = 1
+    return status
+
+STARTUP_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import cli
+for module in {modules!r}:
+    __import__(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+def measure_startup(modules: List[str], repeat: int = 3) -> Dict[str, Any]:
+    """Best-of-repeat import time of cli plus modules, each in a fresh interpreter"""
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-c', STARTUP_PROBE.format(modules=modules, heavy=HEAVY_MODULES)],
+            cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+        )
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run['ms'])
+
+def command_startup(args: argparse.Namespace) -> int:
+    """Fail if a quick command imports a heavy module or exceeds the import budget"""
+    status = 0
+    for command, modules in STARTUP_COMMANDS.items():
+        result = measure_startup(modules)
+        over = result['ms'] > args.budget_ms
+        if over or result['heavy']:
+            status = 1
+        heavy = f", imports {', '.join(result['heavy'])}" if result['heavy'] else ''
+        print(f"{command:<10}{result['ms']:>8.1f} ms{' over budget' if over else ''}{heavy}")
+    print(f"budget: {args.budget_ms} ms")
+    return status
+
+def build_parser() -> argparse.ArgumentParser:
+    """Parser for every command; delegated commands parse their own arguments"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', metavar='command', required=True)
+
+    commands.add_parser('schema', help='create the schema with its indexes and constraints')
+
+    input_help = 'file, directory, glob or manifest of (optionally compressed) JSON/NDJSON files'
+    extract = commands.add_parser('extract', help='stream the input files and count records')
+    extract.add_argument('--input', default=str(INPUT_SOURCE), help=input_help)
+    extract.add_argument('--read-workers', type=int, default=None, help="override ETL_CONFIG['read_workers']")
+    extract.add_argument('--output', type=Path, default=None, help='write the records as NDJSON')
+
+    transform = commands.add_parser('transform', help='transform the input without loading it')
+    transform.add_argument('--input', default=str(INPUT_SOURCE), help=input_help)
+    transform.add_argument('--read-workers', type=int, default=None, help="override ETL_CONFIG['read_workers']")
+    transform.add_argument('--stage', action='store_true', help='write the transformed tables to --staging-dir')
+    transform.add_argument('--staging-dir', type=Path, default=STAGING_DIR)
+    transform.add_argument('--format', choices=['arrow', 'parquet'], default=None,
+                           help="override ETL_CONFIG['staging_format']")
+
+    for command, (_, help_text) in DELEGATED_COMMANDS.items():
+        commands.add_parser(command, help=f"{help_text}; see {command} --help", add_help=False)
+
+    quality = commands.add_parser('quality', help='run the DB-free quality checks on the staged tables')
+    quality.add_argument('--staging-dir', type=Path, default=STAGING_DIR)
+    quality.add_argument('--json-schema', action='store_true', help='also validate every row against its JSON Schema')
+    quality.add_argument('--output', type=Path, default=QUALITY_REPORT_FILE)
+
+    report = commands.add_parser('report', help='summarize the latest reports')
+    report.add_argument('--json', action='store_true', help='also print the reports themselves')
+    report.add_argument('--max-age-hours', type=float, default=None, help='fail if any report is older than this')
+
+    startup = commands.add_parser('startup', help='check the import time of the quick commands')
+    startup.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Main function"""
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+
+    if args.command in DELEGATED_COMMANDS:
+        module = __import__(DELEGATED_COMMANDS[args.command][0])
+        return module.main(extra) or 0
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    handlers = {
+        'schema': command_schema,
+        'extract': command_extract,
+        'transform': command_transform,
+        'quality': command_quality,
+        'report': command_report,
+        'startup': command_startup
+    }
+    return handlers[args.command](args)
+
+if __name__ == "__main__":
+    sys.exit(main())
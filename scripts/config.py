@@ -14,17 +14,62 @@ DB_CONFIG = {
     'password': '6equj5_root',  # Update based on docker-compose.initial.yml
     'database': 'db_user',  # Update based on docker-compose.initial.yml
     'charset': 'utf8mb4',
-    'autocommit': False
+    'autocommit': False,
+    'pool_size': 4  # connections for concurrent table loads; 1 disables the pool
 }
 
 # File Paths
-BASE_DIR = Path(_file_).parent.parent
+BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = BASE_DIR / 'data'
 SQL_DIR = BASE_DIR / 'sql'
 
+# Database created and selected by sql/schema.sql
+SCHEMA_DATABASE = 'property_db'
+
+# Schema script; its VARCHAR(36) key columns take the type of ETL_CONFIG['key_strategy']
+SCHEMA_FILE = SQL_DIR / 'schema.sql'
+KEY_COLUMN_TYPES = {
+    'uuid4': 'VARCHAR(36)',
+    'uuid7_binary': 'BINARY(16)'
+}
+
+# Secondary indexes and foreign keys, applied after the schema script
+INDEXES_FILE = SQL_DIR / 'indexes.sql'
+CONSTRAINTS_FILE = SQL_DIR / 'constraints.sql'
+
+# ETL_CONFIG['dimension_tables']: lookup tables and id columns applied after the
+# schema script, indexes built instead of INDEXES_FILE, and foreign keys added
+# after CONSTRAINTS_FILE
+DIMENSIONS_FILE = SQL_DIR / 'dimensions.sql'
+DIMENSION_INDEXES_FILE = SQL_DIR / 'indexes_dimensions.sql'
+DIMENSION_CONSTRAINTS_FILE = SQL_DIR / 'constraints_dimensions.sql'
+
 # Input files
 JSON_FILE = DATA_DIR / 'fake_property_data.json'  
+# What the ETL reads: JSON_FILE, or a directory, glob or manifest (.txt) of JSON/NDJSON
+# files, each optionally compressed (.gz, .bz2, .xz, .zst); see sources.InputSource
+INPUT_SOURCE = JSON_FILE
 FIELD_CONFIG_FILE = DATA_DIR / 'Field Config.xlsx' 
+LOCATION_INDEX_FILE = DATA_DIR / 'location_index.json'
+# Compiled field mappings, rebuilt whenever the Field Config changes
+FIELD_MAPPING_CACHE_FILE = DATA_DIR / 'field_mapping.pickle'
+
+# Structured output of the validation scans
+VALIDATION_REPORT_FILE = BASE_DIR / 'logs' / 'validation_report.json'
+QUALITY_REPORT_FILE = BASE_DIR / 'logs' / 'quality_report.json'
+# EXPLAIN-based index recommendations of index_advisor.py
+INDEX_REPORT_FILE = BASE_DIR / 'logs' / 'index_report.json'
+
+# Stage metrics of the last run, and profiles taken with etl.py --profile
+METRICS_FILE = BASE_DIR / 'logs' / 'metrics.json'
+METRICS_PROMETHEUS_FILE = BASE_DIR / 'logs' / 'metrics.prom'
+PROFILE_DIR = BASE_DIR / 'logs' / 'profiles'
+
+# Manifest and journal of the current chunked run, used by etl.py --resume
+CHECKPOINT_DIR = BASE_DIR / 'logs' / 'checkpoint'
+
+# Transformed tables as Arrow IPC or Parquet files, for etl.py --from-staging
+STAGING_DIR = DATA_DIR / 'staging'
 
 # Logging Configuration
 LOG_CONFIG = {
@@ -36,10 +81,33 @@ LOG_CONFIG = {
 # ETL Settings
 ETL_CONFIG = {
     'batch_size': 1000,
-    'max_retries': 3,
-    'retry_delay': 1,  # seconds
-    'validate_data': True,
-    'create_indexes': True
+    'chunked': True,  # extract -> transform -> load one batch of source records at a time
+    'pipelined': False,  # chunked runs: extract, transform and load on their own threads so they overlap
+    'queue_size': 4,  # batches buffered between pipelined stages; caps memory via backpressure
+    'staging': False,  # also write the transformed tables to STAGING_DIR (needs pyarrow)
+    'staging_format': 'arrow',  # 'arrow' (IPC, memory-mapped when read) or 'parquet' (compressed)
+    'workers': 1,  # transform processes; 1 keeps the transform in-process, 0 uses every CPU
+    'read_chunk_size': 1 << 20,  # characters read per step when streaming JSON
+    'category_cache_size': 4096,  # distinct raw values memoized per 'category' column (least recently used go first)
+    'read_workers': 1,  # input files read and decompressed at once on reader threads; records stay in file order; JSON parsing holds the GIL, so only reads and decompression run in parallel
+    'bulk_load': True,  # multi-row INSERT / LOAD DATA instead of executemany
+    'load_data_infile': False,  # needs local_infile=ON on the MySQL server
+    'commit_every': 10000,  # rows per transaction when a whole table is loaded at once
+    'key_strategy': 'uuid4',  # 'uuid4' (VARCHAR(36)) or 'uuid7_binary' (time-ordered BINARY(16))
+    'dedupe_locations': True,  # records at the same normalized address share one location row
+    'location_coordinate_precision': None,  # decimals of lat/long added to the address key, or None
+    'persist_location_index': True,  # keep location ids stable across runs via LOCATION_INDEX_FILE
+    'dimension_tables': False,  # keep the DIMENSIONS columns in lookup tables, referenced by TINYINT/SMALLINT ids
+    'refresh_summary': True,  # keep the property_summary table current (full rebuild, or changed ids when incremental)
+    'incremental': False,  # keep existing tables and upsert only new or changed records
+    'max_retries': 3,  # retries of a batch after a deadlock, lock wait timeout or lost connection
+    'retry_delay': 1,  # seconds before the first retry; doubles with each further retry
+    'checkpoint': True,  # journal committed batches so a failed chunked run can continue with --resume
+    'quality_metrics': True,  # count rule violations inline during the transform
+    'quality_json_schema': False,  # also validate every transformed row against quality_metrics.ROW_SCHEMAS
+    'validate_data': False,  # post-load SQL scans of every table; an opt-in cross-check of the inline metrics
+    'create_indexes': True,  # build the secondary indexes in sql/indexes.sql
+    'defer_indexes': True  # bulk-load session: load bare tables with FK/unique checks off, then add indexes and constraints
 }
 
 # Table Names (for consistency)
@@ -49,4 +117,132 @@ TABLES = {
     'valuations': 'property_valuations',
     'rehab_estimates': 'rehab_estimates',
     'locations': 'property_locations'
+}
+
+# DEFAULTs of the loaded columns in sql/schema*.sql; a None in these columns is
+# written as the default, as when the column is left out of the INSERT
+COLUMN_DEFAULTS = {
+    'properties': {'pool': False, 'fireplace': False, 'basement': False}
+}
+
+# Table load order (respecting foreign key constraints)
+LOAD_ORDER = ['locations', 'properties', 'hoa_details', 'valuations', 'rehab_estimates']
+
+# Low-cardinality columns kept in lookup tables with ETL_CONFIG['dimension_tables']:
+# lookup table -> (table key, column, id type). The lookup table has <column>_id
+# and <column>; the fact table stores <column>_id in place of <column>. The id
+# types must match sql/dimensions.sql: SMALLINT for columns whose values come
+# from the input, TINYINT for the ones the transform fills from a fixed set.
+DIMENSIONS = {
+    'property_types': ('properties', 'property_type', 'SMALLINT'),
+    'property_conditions': ('properties', 'property_condition', 'SMALLINT'),
+    'listing_statuses': ('properties', 'listing_status', 'SMALLINT'),
+    'valuation_types': ('valuations', 'valuation_type', 'TINYINT'),
+    'valuation_sources': ('valuations', 'valuation_source', 'TINYINT'),
+    'confidence_levels': ('valuations', 'confidence_level', 'TINYINT'),
+    'estimate_types': ('rehab_estimates', 'estimate_type', 'TINYINT'),
+    'estimate_statuses': ('rehab_estimates', 'status', 'TINYINT')
+}
+
+# Fact table columns holding lookup ids; numbers, unlike the other *_id columns
+DIMENSION_ID_COLUMNS = {f"{column}_id" for _, column, _ in DIMENSIONS.values()}
+
+# Wide raw columns unpivoted into valuation and rehab estimate rows
+VALUATION_MAPPINGS = {
+    'market_value': 'market',
+    'assessed_value': 'assessed',
+    'arv': 'arv',
+    'list_price': 'list',
+    'sale_price': 'sale'
+}
+
+# notes of each imported valuation, by source field
+VALUATION_NOTES = {field: f'Imported from raw data field: {field}' for field in VALUATION_MAPPINGS}
+
+REHAB_MAPPINGS = {
+    'rehab_cost': 'full_rehab',
+    'repair_cost': 'repair',
+    'cosmetic_cost': 'cosmetic',
+    'structural_cost': 'structural'
+}
+
+# Raw fields read into each transformed table: target column -> (source
+# aliases in lookup order, cleaning). The first alias present in a record
+# wins; an 'integer' column is None unless some alias is truthy, so
+# bedrooms=0 with beds=3 gives 0. Valuation and rehab cost columns come from
+# the mappings above.
+# 'category' cleans like 'string' for low-cardinality columns, memoizing
+# the result and interning it so every row shares one string per value.
+FIELD_MAPPINGS = {
+    'locations': {
+        'address_line_1': (['address', 'street_address'], 'string'),
+        'address_line_2': (['address_line_2'], 'string'),
+        'city': (['city'], 'category'),
+        'state': (['state'], 'category'),
+        'zip_code': (['zip_code', 'zip'], 'string'),
+        'county': (['county'], 'category'),
+        'latitude': (['latitude'], 'numeric'),
+        'longitude': (['longitude'], 'numeric')
+    },
+    'properties': {
+        'property_type': (['property_type', 'type'], 'category'),
+        'bedrooms': (['bedrooms', 'beds'], 'integer'),
+        'bathrooms': (['bathrooms', 'baths'], 'numeric'),
+        'square_footage': (['square_footage', 'sqft'], 'integer'),
+        'lot_size': (['lot_size'], 'numeric'),
+        'year_built': (['year_built'], 'integer'),
+        'garage_spaces': (['garage_spaces'], 'integer'),
+        'pool': (['pool'], 'boolean'),
+        'fireplace': (['fireplace'], 'boolean'),
+        'basement': (['basement'], 'boolean'),
+        'property_condition': (['condition'], 'category'),
+        'listing_status': (['status'], 'category'),
+        'mls_number': (['mls_number'], 'string')
+    },
+    'hoa_details': {
+        'hoa_name': (['hoa_name'], 'string'),
+        'monthly_fee': (['hoa_monthly_fee', 'hoa_fee'], 'numeric'),
+        'annual_fee': (['hoa_annual_fee'], 'numeric'),
+        'hoa_contact_info': (['hoa_contact'], 'string'),
+        'amenities': (['hoa_amenities'], 'string'),
+        'restrictions': (['hoa_restrictions'], 'string')
+    },
+    'rehab_estimates': {
+        'contractor_name': (['contractor_name'], 'category'),
+        'timeline_weeks': (['timeline_weeks'], 'integer'),
+        'materials_cost': (['materials_cost'], 'numeric'),
+        'labor_cost': (['labor_cost'], 'numeric'),
+        'permit_cost': (['permit_cost'], 'numeric'),
+        'contingency_percentage': (['contingency_percentage'], 'numeric')
+    }
+}
+
+# A record gets an hoa_details row when any of these columns has a value
+HOA_PRESENCE_COLUMNS = ['hoa_name', 'monthly_fee', 'amenities']
+
+# Field Config "Target Table" values and the mappings they extend;
+# valuations and rehab_costs are the wide amount columns
+FIELD_CONFIG_TABLES = {
+    'property': ['locations', 'properties'],
+    'hoa': ['hoa_details'],
+    'valuation': ['valuations'],
+    'rehab': ['rehab_costs', 'rehab_estimates']
+}
+
+# Field Config column names (lower case) that do not match an alias or a
+# target column by name
+FIELD_CONFIG_ALIASES = {
+    'bed': 'bedrooms',
+    'bath': 'bathrooms',
+    'sqft_total': 'square_footage',
+    'basementyesno': 'basement'
+}
+
+# Foreign key dependencies between tables; a table loads once its parents are committed
+TABLE_DEPENDENCIES = {
+    'locations': [],
+    'properties': ['locations'],
+    'hoa_details': ['properties'],
+    'valuations': ['properties'],
+    'rehab_estimates': ['properties']
 }
\ No newline at end of file
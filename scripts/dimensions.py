@@ -0,0 +1,174 @@
+"""
+Dimension tables
+With ETL_CONFIG['dimension_tables'] the low-cardinality columns listed in
+DIMENSIONS are stored once per distinct value in small lookup tables and
+referenced from the fact tables by TINYINT/SMALLINT ids. Transformed rows
+keep their text values and are encoded to ids only when written, so quality
+metrics, staging and incremental content hashes do not depend on the mode.
+"""
+
+import logging
+import threading
+from collections import namedtuple
+from operator import attrgetter
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import *
+from rows import ROW_COLUMNS
+from utils import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Largest id of each (UNSIGNED) id type
+ID_LIMITS = {
+    'TINYINT': 255,
+    'SMALLINT': 65535
+}
+
+def dimension_of(table_key: str, column: str) -> Optional[str]:
+    """Lookup table of a fact column, or None if the column is stored as text"""
+    if ETL_CONFIG['dimension_tables']:
+        for name, (dimension_table, dimension_column, _) in DIMENSIONS.items():
+            if (dimension_table, dimension_column) == (table_key, column):
+                return name
+    return None
+
+def value_sql(table_key: str, column: str, alias: str) -> str:
+    """SQL expression for the text value of a column of the fact row aliased alias"""
+    name = dimension_of(table_key, column)
+    if name is None:
+        return f"{alias}.{column}"
+    return f"(SELECT d.{column} FROM {name} d WHERE d.{column}_id = {alias}.{column}_id)"
+
+def equals_sql(table_key: str, column: str, value: str) -> str:
+    """SQL condition on a fact table column having a constant value
+
+    With dimension tables the value is looked up once and the fact table is
+    filtered on the id column, which is what its index covers.
+    """
+    name = dimension_of(table_key, column)
+    if name is None:
+        return f"{column} = '{value}'"
+    return f"{column}_id = (SELECT {column}_id FROM {name} WHERE {column} = '{value}')"
+
+class DimensionIndex:
+    """In-memory value -> id dictionary of every lookup table
+
+    Ids are numbered from 1 in the order values are first seen. observe()
+    runs on each transformed batch in the main process, whichever worker
+    transformed it; encode() numbers any value it has not seen, so
+    staged batches load too. A new value's lookup row is written ahead of
+    the rows that reference it and written again on every load until one
+    that included it commits, so a rolled-back batch cannot lose it.
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, Dict[str, int]] = {name: {} for name in DIMENSIONS}
+        self.last_ids: Dict[str, int] = {name: 0 for name in DIMENSIONS}
+        self.limits = {name: ID_LIMITS[id_type] for name, (_, _, id_type) in DIMENSIONS.items()}
+        self.lock = threading.Lock()
+        # Lookup rows not known to be committed, and those written in the caller's open transaction
+        self.unwritten: Dict[str, Dict[str, int]] = {name: {} for name in DIMENSIONS}
+        self.uncommitted: Dict[str, List[Tuple[int, str]]] = {}
+
+        # (position in the row, lookup table) of each dimension column, and the
+        # row type with <column>_id in its place, per fact table
+        self.columns: Dict[str, List[Tuple[int, str]]] = {}
+        for name, (table_key, column, _) in DIMENSIONS.items():
+            self.columns.setdefault(table_key, []).append((ROW_COLUMNS[table_key].index(column), name))
+        self.row_types = {}
+        for table_key, columns in self.columns.items():
+            id_columns = {position for position, _ in columns}
+            fields = [f"{column}_id" if position in id_columns else column
+                      for position, column in enumerate(ROW_COLUMNS[table_key])]
+            self.row_types[table_key] = namedtuple(''.join(part.title() for part in table_key.split('_')) + 'IdRow',
+                                                   fields)
+
+    def load(self, db_manager: DatabaseManager):
+        """Continue the numbering of the lookup tables of an existing schema"""
+        for name, (_, column, _) in DIMENSIONS.items():
+            try:
+                rows = db_manager.execute_query(f"SELECT {column}_id, {column} FROM {name}", commit=False)
+            except Exception as e:
+                logger.error(f"Error reading lookup table {name} (was the schema created with dimension tables?): {e}")
+                raise
+            with self.lock:
+                self.ids[name] = {value: value_id for value_id, value in rows}
+                self.last_ids[name] = max(self.ids[name].values(), default=0)
+        logger.info(f"Dimension tables: {self.size()} values already stored")
+
+    def id_of(self, name: str, value: str) -> int:
+        """Id of a value in a lookup table, numbering it if it is new"""
+        value_id = self.ids[name].get(value)
+        if value_id is not None:
+            return value_id
+        with self.lock:
+            value_id = self.ids[name].get(value)
+            if value_id is None:
+                value_id = self.last_ids[name] + 1
+                if value_id > self.limits[name]:
+                    raise ValueError(f"Lookup table {name} is full: more than {self.limits[name]} distinct "
+                                     f"{DIMENSIONS[name][1]} values; widen its id type in sql/dimensions.sql")
+                self.ids[name][value] = self.unwritten[name][value] = self.last_ids[name] = value_id
+        return value_id
+
+    def observe(self, transformed_data: Dict[str, List[tuple]]):
+        """Number the values of one transformed batch that were not seen before"""
+        for table_key, columns in self.columns.items():
+            rows = transformed_data.get(table_key)
+            if not rows:
+                continue
+            for position, name in columns:
+                ids = self.ids[name]
+                for value in set(map(attrgetter(ROW_COLUMNS[table_key][position]), rows)):
+                    if value is not None and value not in ids:
+                        self.id_of(name, value)
+
+    def encode(self, table_key: str, rows: List[tuple]) -> List[tuple]:
+        """Rows of a fact table with each dimension column replaced by its id"""
+        columns = self.columns.get(table_key)
+        if not columns or not rows:
+            return rows
+        encoded = [list(row) for row in rows]
+        for position, name in columns:
+            ids = self.ids[name]
+            for values in encoded:
+                value = values[position]
+                if value is not None:
+                    values[position] = ids.get(value) or self.id_of(name, value)
+        return list(map(self.row_types[table_key]._make, encoded))
+
+    def write(self, db_manager: DatabaseManager, commit: bool):
+        """Upsert the lookup rows not known to be committed
+
+        With commit=False they join the caller's transaction and count as
+        written once the caller has committed it and calls committed().
+        """
+        with self.lock:
+            unwritten = {name: sorted((value_id, value) for value, value_id in values.items())
+                         for name, values in self.unwritten.items() if values}
+        for name, entries in unwritten.items():
+            column = DIMENSIONS[name][1]
+            rows = [{f"{column}_id": value_id, column: value} for value_id, value in entries]
+            db_manager.upsert_batch(name, rows, [f"{column}_id"], commit=False)
+        self.uncommitted = unwritten
+        if commit and unwritten:
+            db_manager.commit()
+            self.committed()
+
+    def committed(self):
+        """The transaction holding the last write() has committed"""
+        with self.lock:
+            for name, entries in self.uncommitted.items():
+                for value_id, value in entries:
+                    if self.unwritten[name].get(value) == value_id:
+                        del self.unwritten[name][value]
+        self.uncommitted = {}
+
+    def size(self) -> int:
+        """Distinct values across every lookup table"""
+        return sum(len(ids) for ids in self.ids.values())
+
+    def report(self) -> Dict[str, Any]:
+        """Distinct values and id capacity per lookup table"""
+        return {name: {'values': len(self.ids[name]), 'limit': self.limits[name]} for name in DIMENSIONS}
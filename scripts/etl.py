@@ -3,27 +3,81 @@ ETL Pipeline for Property Data Normalization
 Reads raw JSON data and loads it into normalized MySQL tables
 """
 
+import argparse
 import json
 import logging
+import os
 import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-from datetime import datetime
-import pandas as pd
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Set
+from datetime import date, datetime
 
 # Import our custom modules
 from config import *
-from utils import DatabaseManager, DataProcessor, create_directories, read_field_config
+from utils import (CONNECTION_LOST_ERRNOS, DatabaseManager, DataProcessor, create_directories, retry_transient,
+                   schema_script, setup_logging, split_statements)
+from incremental import HASH_TABLE, IncrementalLoader
+from checkpoint import RunCheckpoint
+from pipeline import Pipeline
+from sources import InputSource
+from rows import HoaDetailsRow, LocationsRow, PropertiesRow, RehabEstimatesRow, ValuationsRow
+from staging import StagingReader, StagingWriter
+from field_mapping import get_field_mapping
+from location_index import LocationIndex
+from dimensions import DimensionIndex
+from quality_metrics import QualityCollector
+from summary import SummaryRefresher
+from instrumentation import PROFILERS, MetricsRecorder
+from validation_rules import ValidationEngine, active_rules, save_report
 
-logger = logging.getLogger(_name_)
+logger = logging.getLogger(__name__)
+
+def count_rows(transformed_data: Dict[str, List[Dict[str, Any]]]) -> int:
+    """Rows across all tables of a transformed batch"""
+    return sum(len(rows) for rows in transformed_data.values())
+
+# Transformer of a worker process, kept across batches with its caches
+_worker_etl: Optional['PropertyETL'] = None
+
+def _transform_batch(batch: List[Dict[str, Any]], run_date: date) -> Dict[str, List[Dict[str, Any]]]:
+    """Transform one batch in a worker process, dating rows with the parent run's date"""
+    global _worker_etl
+    if _worker_etl is None:
+        _worker_etl = PropertyETL()
+    _worker_etl.run_date = run_date
+    return _worker_etl.transform_data(batch)
 
 class PropertyETL:
     """Main ETL class for processing property data"""
     
-    def _init_(self):
+    def __init__(self, profile_stage: Optional[str] = None, profiler: str = 'cprofile', resume: bool = False,
+                 from_staging: bool = False, input_source: Optional[str] = None):
         self.db_manager = DatabaseManager()
+        self.metrics = MetricsRecorder(profile_stage, profiler)
         self.data_processor = DataProcessor()
-        self.field_config = None
+        # Lookup ids of the categorical columns, with ETL_CONFIG['dimension_tables']
+        self.dimensions = DimensionIndex() if ETL_CONFIG['dimension_tables'] else None
+        self.incremental_loader = IncrementalLoader(self.db_manager, self.dimensions)
+        self.summary = SummaryRefresher(self.db_manager)
+        self.quality = QualityCollector(ETL_CONFIG['quality_json_schema']) if ETL_CONFIG['quality_metrics'] else None
+        self.location_index = LocationIndex(ETL_CONFIG['key_strategy'], ETL_CONFIG['location_coordinate_precision'])
+        self.field_mapping = get_field_mapping()
+        # Valuation and estimate date of every row of the run, even one that runs past midnight
+        self.run_date = datetime.now().date()
+        self.row_builders = self.field_mapping.builders
+        self.bulk_session = False
+        self.resume = resume
+        self.from_staging = from_staging
+        # A load from staging is replayed in full, never resumed
+        checkpoint = ETL_CONFIG['checkpoint'] and ETL_CONFIG['chunked'] and not from_staging
+        self.checkpoint = RunCheckpoint() if checkpoint else None
+        self.input_source = InputSource(input_source or INPUT_SOURCE)
+        if self.checkpoint:
+            self.input_source.on_file = self.checkpoint.file_read
+        self.staging = None
         
     def setup(self):
         """Initialize ETL pipeline"""
@@ -35,41 +89,171 @@ class PropertyETL:
         # Connect to database
         self.db_manager.connect()
         
-        # Load field configuration
-        if FIELD_CONFIG_FILE.exists():
-            self.field_config = read_field_config(FIELD_CONFIG_FILE)
-            logger.info("Field configuration loaded")
-        else:
-            logger.warning("Field configuration file not found")
+        # Load the address index saved by the previous run
+        if self.location_index_enabled() and ETL_CONFIG['persist_location_index'] and LOCATION_INDEX_FILE.exists():
+            self.location_index.load(LOCATION_INDEX_FILE)
+        
+        if self.resume:
+            self.resume_schema()
+            return
+        
+        if self.checkpoint:
+            # Before the schema is dropped, so an old checkpoint never outlives its tables
+            self.checkpoint.start(self.input_source)
         
         # Create database schema
         self.create_schema()
         
+        if self.checkpoint:
+            self.checkpoint.update_manifest(bulk_session=self.bulk_session)
+    
+    def resume_schema(self):
+        """Continue in the interrupted run's schema and bulk-load session"""
+        if not self.schema_exists():
+            raise RuntimeError(f"Cannot resume: schema {SCHEMA_DATABASE} not found")
+        self.db_manager.use_database(SCHEMA_DATABASE)
+        
+        if self.location_index_enabled():
+            for changes in self.checkpoint.location_changes():
+                self.location_index.apply_changes(changes)
+        
+        if self.dimensions:
+            self.dimensions.load(self.db_manager)
+        
+        if self.checkpoint.manifest['bulk_session'] and 'indexes' not in self.checkpoint.stages:
+            self.begin_bulk_session()
+        
+    def schema_exists(self) -> bool:
+        """Whether a previous run already created the schema"""
+        result = self.db_manager.execute_query(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s AND table_name = %s",
+            (SCHEMA_DATABASE, HASH_TABLE)
+        )
+        return bool(result and result[0][0])
+    
     def create_schema(self):
         """Create database schema"""
+        if ETL_CONFIG['incremental'] and self.schema_exists():
+            # schema.sql drops every table, so incremental runs reuse what is there
+            logger.info("Incremental mode: keeping existing schema")
+            self.db_manager.use_database(SCHEMA_DATABASE)
+            if self.dimensions:
+                self.dimensions.load(self.db_manager)
+            return
+        
         logger.info("Creating database schema...")
-        schema_file = SQL_DIR / 'schema.sql'
+        schema_file = SCHEMA_FILE
         
         if schema_file.exists():
-            self.db_manager.execute_script(schema_file)
+            self.db_manager.execute_script(schema_file, schema_script(schema_file, ETL_CONFIG['key_strategy']))
+            self.db_manager.use_database(SCHEMA_DATABASE)
             logger.info("Database schema created successfully")
         else:
             logger.error("Schema file not found")
             raise FileNotFoundError(f"Schema file not found: {schema_file}")
+        
+        if self.dimensions:
+            # Lookup tables, and id columns in place of the categorical text columns
+            self.db_manager.execute_script(DIMENSIONS_FILE)
+            logger.info(f"Dimension tables created for {len(DIMENSIONS)} categorical columns")
+        
+        if ETL_CONFIG['defer_indexes']:
+            self.begin_bulk_session()
+        else:
+            self.build_indexes()
+            self.add_constraints()
+    
+    def begin_bulk_session(self):
+        """Load into bare tables with foreign key and unique checks off
+
+        Pooled connections inherit the settings. finish_bulk_session builds
+        the indexes and constraints and checks integrity once at the end.
+        """
+        logger.info("Bulk-load session: deferring indexes and constraints, foreign_key_checks=0, unique_checks=0")
+        self.db_manager.set_session({'foreign_key_checks': 0, 'unique_checks': 0})
+        self.bulk_session = True
     
-    def extract_data(self) -> List[Dict[str, Any]]:
-        """Extract data from JSON file"""
-        logger.info("Extracting data from JSON file...")
+    def finish_bulk_session(self):
+        """Build indexes and constraints on the loaded tables, then verify integrity"""
+        self.build_indexes()
+        # Still without foreign_key_checks, so adding a constraint does not re-check every row
+        self.add_constraints()
+        self.db_manager.reset_session()
+        self.bulk_session = False
+        self.verify_integrity()
+    
+    def build_indexes(self):
+        """Run sql/indexes.sql, one table per statement, in parallel when a pool exists
+
+        With dimension tables sql/indexes_dimensions.sql is run instead, which
+        indexes the id columns.
+        """
+        if not ETL_CONFIG['create_indexes']:
+            logger.info("Skipping secondary indexes (create_indexes disabled)")
+            return
+        
+        indexes_file = DIMENSION_INDEXES_FILE if self.dimensions else INDEXES_FILE
+        statements = split_statements(indexes_file.read_text())
+        logger.info(f"Building secondary indexes ({len(statements)} tables)...")
+        start = time.perf_counter()
+        
+        def build(statement: str):
+            if self.db_manager.pool:
+                with self.db_manager.acquire() as worker:
+                    worker.execute_query(statement, fetch=False)
+            else:
+                self.db_manager.execute_query(statement, fetch=False)
         
-        if not JSON_FILE.exists():
-            logger.error(f"JSON file not found: {JSON_FILE}")
-            raise FileNotFoundError(f"JSON file not found: {JSON_FILE}")
+        workers = self.db_manager.pool_size if self.db_manager.pool else 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # list() re-raises the first failure
+            list(executor.map(build, statements))
         
-        raw_data = self.data_processor.load_json(JSON_FILE)
-        logger.info(f"Extracted {len(raw_data)} records")
-        return raw_data
+        logger.info(f"Secondary indexes built in {time.perf_counter() - start:.1f}s")
     
-    def transform_data(self, raw_data: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    def add_constraints(self):
+        """Run sql/constraints.sql, and sql/constraints_dimensions.sql with dimension tables
+
+        The statements run one after another: each ALTER TABLE locks the
+        parent table's metadata as well as its own.
+        """
+        start = time.perf_counter()
+        script = CONSTRAINTS_FILE.read_text()
+        if self.dimensions:
+            script += '\n' + DIMENSION_CONSTRAINTS_FILE.read_text()
+        for statement in split_statements(script):
+            self.db_manager.execute_query(statement, fetch=False)
+        logger.info(f"Foreign key constraints added in {time.perf_counter() - start:.1f}s")
+    
+    def verify_integrity(self):
+        """Fail the run if any row references a missing parent
+
+        Needed after a bulk-load session, where neither the inserts nor the
+        constraints checked foreign keys.
+        """
+        rules = [rule for rule in active_rules() if rule['category'] == 'foreign_keys']
+        report = ValidationEngine(self.db_manager, rules).run()
+        orphans = {check['name']: check['count'] for check in report['checks'] if check['count']}
+        
+        if report['errors'] or orphans:
+            for name, count in orphans.items():
+                logger.error(f"{name}: {count} orphaned records")
+            raise RuntimeError(f"Integrity check failed after bulk load: {orphans or report['errors']}")
+        logger.info("Integrity check passed: no orphaned records")
+    
+    def extract_data(self, skip: int = 0) -> Iterator[Dict[str, Any]]:
+        """Extract data from the input files as a stream of records, after the first skip of them"""
+        logger.info(f"Extracting data from {self.input_source.source}...")
+        
+        try:
+            # Files a resumed run already read to the end are passed over unopened
+            known_records = self.checkpoint.file_records if self.checkpoint else None
+            return self.input_source.records(skip, known_records)
+        except Exception as e:
+            logger.error(f"Error opening input {self.input_source.source}: {e}")
+            raise
+    
+    def transform_data(self, raw_data: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
         """Transform raw data into normalized format"""
         logger.info("Transforming data...")
         
@@ -85,10 +269,10 @@ class PropertyETL:
             try:
                 # Transform each record
                 location_data = self.transform_location(record)
-                property_data = self.transform_property(record, location_data['location_id'])
-                hoa_data = self.transform_hoa(record, property_data['property_id'])
-                valuation_data = self.transform_valuations(record, property_data['property_id'])
-                rehab_data = self.transform_rehab_estimates(record, property_data['property_id'])
+                property_data = self.transform_property(record, location_data.location_id)
+                hoa_data = self.transform_hoa(record, property_data.property_id)
+                valuation_data = self.transform_valuations(record, property_data.property_id)
+                rehab_data = self.transform_rehab_estimates(record, property_data.property_id)
                 
                 # Add to transformed data
                 transformed_data['locations'].append(location_data)
@@ -107,207 +291,669 @@ class PropertyETL:
         logger.info("Data transformation completed")
         return transformed_data
     
-    def transform_location(self, record: Dict[str, Any]) -> Dict[str, Any]:
+    def get_worker_count(self) -> int:
+        """Number of transform processes to use"""
+        workers = ETL_CONFIG.get('workers', 1)
+        return workers if workers else (os.cpu_count() or 1)
+    
+    def transform_batches(self, batches: Iterable[List[Dict[str, Any]]]) -> Iterator[tuple]:
+        """Transform batches, yielding (batch size, transformed data) in input order
+
+        With more than one worker the batches are fanned out to a process pool.
+        At most two batches per worker are in flight, which bounds memory and
+        keeps the output in the same deterministic order as the input.
+        """
+        workers = self.get_worker_count()
+        
+        if workers <= 1:
+            for batch in batches:
+                yield len(batch), self.transform_data(batch)
+            return
+        
+        logger.info(f"Transforming with {workers} worker processes...")
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            try:
+                for batch in batches:
+                    pending.append((len(batch), executor.submit(_transform_batch, batch, self.run_date)))
+                    if len(pending) >= workers * 2:
+                        size, future = pending.popleft()
+                        yield size, future.result()
+                
+                while pending:
+                    size, future = pending.popleft()
+                    yield size, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+    
+    def transform_data_parallel(self, raw_data: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Transform all records across worker processes and merge the tables in input order"""
+        transformed_data = {table_key: [] for table_key in LOAD_ORDER}
+        
+        batches = self.data_processor.batched(raw_data, ETL_CONFIG['batch_size'])
+        for _, batch_data in self.transform_batches(batches):
+            for table_key in LOAD_ORDER:
+                transformed_data[table_key].extend(batch_data[table_key])
+        
+        return transformed_data
+    
+    def location_index_enabled(self) -> bool:
+        """Whether locations are de-duplicated through the address index
+
+        Incremental runs already derive location ids from the normalized
+        address, so they do not need the index.
+        """
+        return ETL_CONFIG['dedupe_locations'] and not ETL_CONFIG['incremental']
+    
+    def dedupe_locations(self, transformed_data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Point records at an already-seen address to that address's location_id
+
+        Runs in the main process after the transform, so it sees every batch
+        whichever worker produced it.
+        """
+        if not self.location_index_enabled():
+            return transformed_data
+        
+        remapped = {}
+        locations = []
+        for location in transformed_data['locations']:
+            location_id, emit = self.location_index.resolve(location)
+            if location_id != location.location_id:
+                remapped[location.location_id] = location_id
+                location = location._replace(location_id=location_id)
+            if emit:
+                locations.append(location)
+        
+        if remapped:
+            transformed_data['properties'] = [
+                prop._replace(location_id=remapped[prop.location_id]) if prop.location_id in remapped else prop
+                for prop in transformed_data['properties']
+            ]
+        
+        transformed_data['locations'] = locations
+        return transformed_data
+    
+    def transform_location(self, record: Dict[str, Any]) -> LocationsRow:
         """Transform location data"""
-        location_id = self.data_processor.generate_uuid()
-        
-        return {
-            'location_id': location_id,
-            'address_line_1': self.data_processor.clean_string(record.get('address', record.get('street_address'))),
-            'address_line_2': self.data_processor.clean_string(record.get('address_line_2')),
-            'city': self.data_processor.clean_string(record.get('city')),
-            'state': self.data_processor.clean_string(record.get('state')),
-            'zip_code': self.data_processor.clean_string(record.get('zip_code', record.get('zip'))),
-            'county': self.data_processor.clean_string(record.get('county')),
-            'latitude': self.data_processor.clean_numeric(record.get('latitude')),
-            'longitude': self.data_processor.clean_numeric(record.get('longitude'))
-        }
+        return self.row_builders['locations'](record, self.data_processor.generate_uuid())
     
-    def transform_property(self, record: Dict[str, Any], location_id: str) -> Dict[str, Any]:
+    def transform_property(self, record: Dict[str, Any], location_id: str) -> PropertiesRow:
         """Transform property data"""
-        property_id = self.data_processor.generate_uuid()
-        
-        return {
-            'property_id': property_id,
-            'location_id': location_id,
-            'property_type': self.data_processor.clean_string(record.get('property_type', record.get('type'))),
-            'bedrooms': int(record.get('bedrooms', record.get('beds', 0))) if record.get('bedrooms') or record.get('beds') else None,
-            'bathrooms': self.data_processor.clean_numeric(record.get('bathrooms', record.get('baths'))),
-            'square_footage': int(record.get('square_footage', record.get('sqft', 0))) if record.get('square_footage') or record.get('sqft') else None,
-            'lot_size': self.data_processor.clean_numeric(record.get('lot_size')),
-            'year_built': int(record.get('year_built', 0)) if record.get('year_built') else None,
-            'garage_spaces': int(record.get('garage_spaces', 0)) if record.get('garage_spaces') else None,
-            'pool': bool(record.get('pool', False)),
-            'fireplace': bool(record.get('fireplace', False)),
-            'basement': bool(record.get('basement', False)),
-            'property_condition': self.data_processor.clean_string(record.get('condition')),
-            'listing_status': self.data_processor.clean_string(record.get('status')),
-            'mls_number': self.data_processor.clean_string(record.get('mls_number'))
-        }
+        return self.row_builders['properties'](record, self.data_processor.generate_uuid(), location_id)
     
-    def transform_hoa(self, record: Dict[str, Any], property_id: str) -> Optional[Dict[str, Any]]:
+    def transform_hoa(self, record: Dict[str, Any], property_id: str) -> Optional[HoaDetailsRow]:
         """Transform HOA data"""
         # Check if HOA data exists
-        hoa_fields = ['hoa_name', 'hoa_fee', 'hoa_monthly_fee', 'hoa_amenities']
-        has_hoa_data = any(record.get(field) for field in hoa_fields)
-        
-        if not has_hoa_data:
+        if not self.field_mapping.has_hoa(record):
             return None
         
-        return {
-            'hoa_id': self.data_processor.generate_uuid(),
-            'property_id': property_id,
-            'hoa_name': self.data_processor.clean_string(record.get('hoa_name')),
-            'monthly_fee': self.data_processor.clean_numeric(record.get('hoa_monthly_fee', record.get('hoa_fee'))),
-            'annual_fee': self.data_processor.clean_numeric(record.get('hoa_annual_fee')),
-            'hoa_contact_info': self.data_processor.clean_string(record.get('hoa_contact')),
-            'amenities': self.data_processor.clean_string(record.get('hoa_amenities')),
-            'restrictions': self.data_processor.clean_string(record.get('hoa_restrictions'))
-        }
+        return self.row_builders['hoa_details'](record, self.data_processor.generate_uuid(), property_id)
     
-    def transform_valuations(self, record: Dict[str, Any], property_id: str) -> List[Dict[str, Any]]:
+    def transform_valuations(self, record: Dict[str, Any], property_id: str) -> List[ValuationsRow]:
         """Transform valuation data"""
         valuations = []
+        amounts = self.row_builders['valuations'](record)
         
-        # Map different valuation types
-        valuation_mappings = {
-            'market_value': 'market',
-            'assessed_value': 'assessed',
-            'arv': 'arv',
-            'list_price': 'list',
-            'sale_price': 'sale'
-        }
-        
-        for field, valuation_type in valuation_mappings.items():
-            value = self.data_processor.clean_numeric(record.get(field))
+        for field, valuation_type in VALUATION_MAPPINGS.items():
+            value = amounts[field]
             if value:
-                valuations.append({
-                    'valuation_id': self.data_processor.generate_uuid(),
-                    'property_id': property_id,
-                    'valuation_type': valuation_type,
-                    'valuation_amount': value,
-                    'valuation_date': datetime.now().date(),
-                    'valuation_source': 'Import',
-                    'confidence_level': 'Medium',
-                    'notes': f'Imported from raw data field: {field}'
-                })
+                valuations.append(ValuationsRow(
+                    valuation_id=self.data_processor.generate_uuid(),
+                    property_id=property_id,
+                    valuation_type=valuation_type,
+                    valuation_amount=value,
+                    valuation_date=self.run_date,
+                    valuation_source='Import',
+                    confidence_level='Medium',
+                    notes=VALUATION_NOTES[field]
+                ))
         
         return valuations
     
-    def transform_rehab_estimates(self, record: Dict[str, Any], property_id: str) -> List[Dict[str, Any]]:
+    def transform_rehab_estimates(self, record: Dict[str, Any], property_id: str) -> List[RehabEstimatesRow]:
         """Transform rehab estimate data"""
         estimates = []
+        costs = self.row_builders['rehab_costs'](record)
+        if not any(costs.values()):
+            return estimates
         
-        # Map different rehab estimate types
-        rehab_mappings = {
-            'rehab_cost': 'full_rehab',
-            'repair_cost': 'repair',
-            'cosmetic_cost': 'cosmetic',
-            'structural_cost': 'structural'
-        }
+        # Fields shared by every estimate of the record
+        shared = self.row_builders['rehab_estimates'](record)
         
-        for field, estimate_type in rehab_mappings.items():
-            cost = self.data_processor.clean_numeric(record.get(field))
+        for field, estimate_type in REHAB_MAPPINGS.items():
+            cost = costs[field]
             if cost:
-                estimates.append({
-                    'estimate_id': self.data_processor.generate_uuid(),
-                    'property_id': property_id,
-                    'estimate_type': estimate_type,
-                    'estimated_cost': cost,
-                    'estimate_date': datetime.now().date(),
-                    'contractor_name': self.data_processor.clean_string(record.get('contractor_name')),
-                    'work_description': self.data_processor.clean_string(record.get(f'{field}_description')),
-                    'timeline_weeks': int(record.get('timeline_weeks', 0)) if record.get('timeline_weeks') else None,
-                    'materials_cost': self.data_processor.clean_numeric(record.get('materials_cost')),
-                    'labor_cost': self.data_processor.clean_numeric(record.get('labor_cost')),
-                    'permit_cost': self.data_processor.clean_numeric(record.get('permit_cost')),
-                    'contingency_percentage': self.data_processor.clean_numeric(record.get('contingency_percentage')),
-                    'status': 'draft'
-                })
+                estimates.append(RehabEstimatesRow(
+                    estimate_id=self.data_processor.generate_uuid(),
+                    property_id=property_id,
+                    estimate_type=estimate_type,
+                    estimated_cost=cost,
+                    estimate_date=self.run_date,
+                    contractor_name=shared['contractor_name'],
+                    work_description=self.data_processor.clean_string(record.get(f'{field}_description')),
+                    timeline_weeks=shared['timeline_weeks'],
+                    materials_cost=shared['materials_cost'],
+                    labor_cost=shared['labor_cost'],
+                    permit_cost=shared['permit_cost'],
+                    contingency_percentage=shared['contingency_percentage'],
+                    status='draft'
+                ))
         
         return estimates
     
-    def load_data(self, transformed_data: Dict[str, List[Dict[str, Any]]]):
-        """Load transformed data into database"""
+    def load_data(self, transformed_data: Dict[str, List[Dict[str, Any]]], commit_per_table: bool = True,
+                  tables: Optional[List[str]] = None, on_commit: Optional[Callable[[str, int], None]] = None):
+        """Load transformed data into database
+
+        With commit_per_table=False nothing is committed here; the caller
+        commits or rolls back all tables as one unit. When a connection pool
+        is available the tables are loaded concurrently instead, which always
+        commits per table and calls on_commit(table_key, rows) after each.
+        tables limits the load to some of the tables, e.g. on a retry.
+        """
+        tables = LOAD_ORDER if tables is None else tables
         logger.info("Loading data into database...")
         
+        if self.dimensions:
+            # New lookup rows go first; they commit on their own when the tables commit separately
+            self.dimensions.write(self.db_manager, commit_per_table or bool(self.db_manager.pool))
+        
+        if ETL_CONFIG['incremental']:
+            # Deltas are written on the primary connection in one transaction
+            self.incremental_loader.load(transformed_data)
+            if ETL_CONFIG['refresh_summary']:
+                # Same transaction, so the summary never lags the rows it describes
+                self.summary.refresh(self.incremental_loader.last_changed)
+            if commit_per_table:
+                self.db_manager.commit()
+            return
+        
+        if self.db_manager.pool:
+            self.load_data_concurrently(transformed_data, tables, on_commit)
+            return
+        
         # Load data in correct order (respecting foreign key constraints)
-        load_order = ['locations', 'properties', 'hoa_details', 'valuations', 'rehab_estimates']
+        for table_key in tables:
+            self.load_table(self.db_manager, table_key, transformed_data.get(table_key, []), commit_per_table)
+    
+    def load_data_concurrently(self, transformed_data: Dict[str, List[Dict[str, Any]]],
+                               tables: Optional[List[str]] = None,
+                               on_commit: Optional[Callable[[str, int], None]] = None):
+        """Load tables in parallel, following the foreign key dependency graph
+
+        Each table is loaded and committed on its own pooled connection as soon
+        as every table it references has been committed. With the default
+        graph the three child tables load together once properties is done, so
+        wall time is the longest dependency chain rather than the sum.
+        """
+        tables = LOAD_ORDER if tables is None else tables
+        # Tables left out are already committed, so nothing waits for them
+        remaining = {table_key: set(TABLE_DEPENDENCIES.get(table_key, [])) & set(tables) for table_key in tables}
         
-        for table_key in load_order:
-            table_name = TABLES.get(table_key, table_key)
-            data = transformed_data.get(table_key, [])
-            
-            if data:
-                # Filter out None values and empty records
-                clean_data = []
-                for record in data:
-                    clean_record = {k: v for k, v in record.items() if v is not None}
-                    if clean_record:
-                        clean_data.append(clean_record)
+        def load(table_key: str):
+            rows = transformed_data.get(table_key, [])
+            with self.db_manager.acquire() as worker:
+                self.load_table(worker, table_key, rows)
+            if on_commit:
+                on_commit(table_key, len(rows))
+        
+        with ThreadPoolExecutor(max_workers=self.db_manager.pool_size) as executor:
+            running = {}
+            while remaining or running:
+                ready = [table_key for table_key, parents in remaining.items() if not parents]
+                for table_key in ready:
+                    del remaining[table_key]
+                    running[executor.submit(load, table_key)] = table_key
                 
-                if clean_data:
-                    self.db_manager.insert_batch(table_name, clean_data)
-                    logger.info(f"Loaded {len(clean_data)} records into {table_name}")
-                else:
-                    logger.info(f"No valid data to load for {table_name}")
-            else:
-                logger.info(f"No data found for {table_name}")
+                if not running:
+                    raise RuntimeError(f"Circular table dependencies: {sorted(remaining)}")
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    table_key = running.pop(future)
+                    # Re-raise the first failure; tables already running finish first
+                    future.result()
+                    for parents in remaining.values():
+                        parents.discard(table_key)
+    
+    def load_table(self, db_manager: DatabaseManager, table_key: str, data: List[Dict[str, Any]],
+                   commit: bool = True):
+        """Load the rows of one table through the given DatabaseManager"""
+        with self.metrics.stage(f"load.{table_key}", rows_in=len(data), rows_out=len(data)):
+            self.write_table(db_manager, table_key, data, commit)
+    
+    def write_table(self, db_manager: DatabaseManager, table_key: str, data: List[Dict[str, Any]], commit: bool):
+        """Write the rows of one table with the configured insert method"""
+        table_name = TABLES.get(table_key, table_key)
+        
+        if self.dimensions:
+            data = self.dimensions.encode(table_key, data)
+        
+        # Rows have the table's fixed column list, with None sent as NULL
+        if data and ETL_CONFIG['bulk_load']:
+            db_manager.bulk_insert(table_name, data, commit=commit)
+        elif data:
+            db_manager.insert_batch(table_name, data, commit=commit)
+            logger.info(f"Loaded {len(data)} records into {table_name}")
+        else:
+            logger.info(f"No data found for {table_name}")
     
     def validate_data(self):
-        """Validate loaded data"""
+        """Validate loaded data with one aggregated scan per table
+
+        The counts are compared with the ones collected during the transform,
+        if any, and mismatches are logged.
+        """
         logger.info("Validating loaded data...")
         
-        validation_queries = [
-            ("SELECT COUNT(*) FROM property_locations", "property_locations"),
-            ("SELECT COUNT(*) FROM properties", "properties"),
-            ("SELECT COUNT(*) FROM hoa_details", "hoa_details"),
-            ("SELECT COUNT(*) FROM property_valuations", "property_valuations"),
-            ("SELECT COUNT(*) FROM rehab_estimates", "rehab_estimates"),
-            ("SELECT COUNT(*) FROM properties p LEFT JOIN property_locations pl ON p.location_id = pl.location_id WHERE pl.location_id IS NULL", "orphaned_properties"),
-        ]
+        try:
+            report = ValidationEngine(self.db_manager).run()
+            save_report(report, VALIDATION_REPORT_FILE)
+            
+            if self.quality:
+                for mismatch in self.quality.compare(report):
+                    logger.warning(f"{mismatch['name']}: {mismatch['inline']} rows counted during transform, "
+                                   f"{mismatch['sql']} in the database")
+        except Exception as e:
+            logger.error(f"Error validating data: {e}")
+    
+    def run_batches(self):
+        """Transform and load records in batches of ETL_CONFIG['batch_size']
+
+        Each batch is written to all five tables and committed before the next
+        one starts, so peak memory follows the batch size rather than the size
+        of the input. Without a connection pool the batch is one transaction;
+        with one, tables commit individually as they finish. On a resumed run
+        the records of committed batches are skipped.
+        """
+        batch_size = ETL_CONFIG['batch_size']
+        logger.info(f"Running chunked ETL with batch size {batch_size}...")
+        
+        batch_number, offset = self.skip_committed()
+        # Records are timed as the transform pulls them
+        raw_data = self.metrics.iterate('extract', self.extract_data(offset))
+        batches = self.data_processor.batched(raw_data, batch_size)
+        transformed_batches = self.transform_batches(batches)
         
-        for query, description in validation_queries:
-            try:
-                result = self.db_manager.execute_query(query)
-                count = result[0][0] if result else 0
-                logger.info(f"{description}: {count} records")
-            except Exception as e:
-                logger.error(f"Error validating {description}: {e}")
+        total_records = 0
+        while True:
+            with self.metrics.stage('transform') as stage:
+                item = next(transformed_batches, None)
+                if item:
+                    stage['rows_in'], stage['rows_out'] = item[0], count_rows(item[1])
+            if item is None:
+                break
+            record_count, transformed_data = item
+            batch_number += 1
+            
+            transformed_data = self.post_transform(transformed_data)
+            location_changes = self.location_index.take_changes() if self.location_index_enabled() else None
+            if self.staging:
+                self.stage_batch(batch_number, record_count, transformed_data)
+            
+            with self.metrics.stage('load', rows_in=count_rows(transformed_data)):
+                self.load_batch(batch_number, offset, offset + record_count, transformed_data, location_changes)
+            
+            offset += record_count
+            total_records += record_count
+            logger.info(f"Committed batch {batch_number} ({total_records} records so far)")
+        
+        logger.info(f"Chunked ETL processed {total_records} records")
+    
+    def skip_committed(self) -> tuple:
+        """(last batch number, records done) before the first batch
+
+        A fresh run starts at zero. A resumed run first completes the batch
+        the interrupted run left half-committed, if any, then skips every
+        record of the committed batches.
+        """
+        if not self.resume:
+            return 0, 0
+        
+        batch_number, offset = self.checkpoint.next_batch - 1, self.checkpoint.records_done
+        spilled = self.checkpoint.pending_spill()
+        if spilled:
+            logger.info(f"Completing batch {spilled['batch']}; already committed: "
+                        f"{', '.join(sorted(self.checkpoint.tables[spilled['batch']]))}")
+            if spilled['locations']:
+                self.location_index.apply_changes(spilled['locations'])
+            with self.metrics.stage('load', rows_in=count_rows(spilled['data'])):
+                self.load_batch(spilled['batch'], spilled['start'], spilled['end'], spilled['data'],
+                                spilled['locations'])
+            batch_number, offset = spilled['batch'], spilled['end']
+        logger.info(f"Skipping the first {offset} records, committed by the interrupted run")
+        return batch_number, offset
+    
+    def run_pipelined(self):
+        """Like run_batches, with extract, transform and load overlapping
+
+        Extract (reading and batching records) and transform (including
+        location de-duplication and quality metrics) run on their own
+        threads; loading stays on this thread, so batches are committed and
+        checkpointed in order exactly as in run_batches. Each queue holds at
+        most ETL_CONFIG['queue_size'] batches; a stage that gets ahead blocks
+        until the next one catches up. A failure in any stage stops all of
+        them and is raised here.
+        """
+        batch_size = ETL_CONFIG['batch_size']
+        queue_size = ETL_CONFIG['queue_size']
+        logger.info(f"Running pipelined ETL with batch size {batch_size}, {queue_size} batches per queue...")
+        
+        batch_number, offset = self.skip_committed()
+        raw_data = self.metrics.iterate('extract', self.extract_data(offset))
+        total_records = 0
+        
+        with Pipeline(self.metrics, queue_size) as pipeline:
+            batches = pipeline.queue('batches')
+            transformed = pipeline.queue('transformed')
+            
+            def extract():
+                for batch in self.data_processor.batched(raw_data, batch_size):
+                    batches.put(batch)
+                batches.close()
+            
+            def transform():
+                transformed_batches = self.transform_batches(batches)
+                try:
+                    while True:
+                        with self.metrics.stage('transform') as stage:
+                            item = next(transformed_batches, None)
+                            if item:
+                                stage['rows_in'], stage['rows_out'] = item[0], count_rows(item[1])
+                        if item is None:
+                            break
+                        record_count, transformed_data = item
+                        transformed_data = self.post_transform(transformed_data)
+                        location_changes = self.location_index.take_changes() if self.location_index_enabled() else None
+                        transformed.put((record_count, transformed_data, location_changes))
+                finally:
+                    # Shuts down the worker processes, also when the pipeline is stopping
+                    transformed_batches.close()
+                transformed.close()
+            
+            pipeline.start('extract', extract, outputs=batches)
+            pipeline.start('transform', transform, inputs=batches, outputs=transformed)
+            
+            for record_count, transformed_data, location_changes in pipeline.consume('load', transformed):
+                batch_number += 1
+                if self.staging:
+                    self.stage_batch(batch_number, record_count, transformed_data)
+                with self.metrics.stage('load', rows_in=count_rows(transformed_data)):
+                    self.load_batch(batch_number, offset, offset + record_count, transformed_data, location_changes)
+                offset += record_count
+                total_records += record_count
+                logger.info(f"Committed batch {batch_number} ({total_records} records so far)")
+        
+        logger.info(f"Pipelined ETL processed {total_records} records")
+    
+    def start_staging(self):
+        """Write the transformed tables of this run to STAGING_DIR as well"""
+        if self.resume:
+            # The staged files of the interrupted run were never completed
+            logger.warning("Staging is skipped on a resumed run; run without --resume to stage the full input")
+            return
+        self.staging = StagingWriter(STAGING_DIR, ETL_CONFIG['staging_format'])
+        self.staging.start()
+    
+    def stage_batch(self, batch_number: int, record_count: int, transformed_data: Dict[str, List[Dict[str, Any]]]):
+        """Write one transformed batch to the staging directory"""
+        rows = count_rows(transformed_data)
+        with self.metrics.stage('staging', rows_in=rows, rows_out=rows):
+            self.staging.write_batch(batch_number, record_count, transformed_data)
+    
+    def load_staged(self):
+        """Load the tables staged by an earlier run, skipping extract and transform
+
+        Files are memory-mapped and converted to rows one batch at a time,
+        and every batch is committed like a batch of a chunked run.
+        """
+        reader = StagingReader(STAGING_DIR)
+        reader.check_key_strategy()
+        manifest = reader.manifest
+        logger.info(f"Loading {manifest['records']} records staged at {manifest['generated_at']} "
+                    f"from {STAGING_DIR} ({manifest['format']})...")
+        
+        for batch_number, record_count, transformed_data in self.metrics.iterate('read_staging', reader.batches()):
+            rows = count_rows(transformed_data)
+            if self.dimensions:
+                # Number new values before load_data writes the lookup rows ahead of the batch
+                with self.metrics.stage('dimensions'):
+                    self.dimensions.observe(transformed_data)
+            if self.quality:
+                with self.metrics.stage('quality', rows_in=rows, rows_out=rows):
+                    self.quality.observe(transformed_data)
+            with self.metrics.stage('load', rows_in=rows):
+                self.load_batch(batch_number, 0, record_count, transformed_data, None)
+            logger.info(f"Committed staged batch {batch_number}")
+    
+    def load_batch(self, batch_number: int, start: int, end: int, transformed_data: Dict[str, List[Dict[str, Any]]],
+                   location_changes: Optional[Dict[str, Any]]):
+        """Load and commit one batch, retrying transient errors, then checkpoint it
+
+        Without a pool the whole batch is one transaction, so a retry starts
+        it over. With one, tables commit as they finish and a retry loads
+        only the tables that are not committed yet.
+        """
+        committed: Set[str] = set(self.checkpoint.tables[batch_number]) if self.checkpoint else set()
+        commits_per_table = bool(self.db_manager.pool) and not ETL_CONFIG['incremental']
+        if self.checkpoint and commits_per_table and not self.checkpoint.spill_path(batch_number).exists():
+            self.checkpoint.spill(batch_number, start, end, transformed_data, location_changes)
+        
+        def table_committed(table_key: str, rows: int):
+            committed.add(table_key)
+            if self.checkpoint:
+                self.checkpoint.table_committed(batch_number, table_key, rows)
+        
+        def load():
+            tables = [table_key for table_key in LOAD_ORDER if table_key not in committed]
+            self.load_data(transformed_data, commit_per_table=False, tables=tables, on_commit=table_committed)
+            self.db_manager.commit()
+        
+        try:
+            retry_transient(load, f"Batch {batch_number}", on_retry=self.recover_connection)
+        except Exception as e:
+            logger.error(f"Error loading batch {batch_number}: {e}")
+            self.recover_connection(e)
+            raise
+        
+        if self.dimensions:
+            self.dimensions.committed()
+        
+        if self.checkpoint:
+            rows = {table_key: len(transformed_data.get(table_key, [])) for table_key in LOAD_ORDER}
+            self.checkpoint.batch_committed(batch_number, start, end, rows, location_changes)
+    
+    def recover_connection(self, error: Exception):
+        """Roll back after a failed batch, reconnecting if the connection was lost"""
+        try:
+            self.db_manager.rollback()
+        except Exception as e:
+            logger.warning(f"Rollback failed: {e}")
+        if getattr(error, 'errno', None) in CONNECTION_LOST_ERRNOS:
+            self.db_manager.reconnect()
+    
+    def post_transform(self, transformed_data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """De-duplicate locations, number new lookup values and collect quality metrics for one transformed batch"""
+        with self.metrics.stage('dedupe', rows_in=len(transformed_data['locations'])) as stage:
+            transformed_data = self.dedupe_locations(transformed_data)
+            stage['rows_out'] = len(transformed_data['locations'])
+        if self.dimensions:
+            with self.metrics.stage('dimensions'):
+                self.dimensions.observe(transformed_data)
+        if self.quality:
+            rows = count_rows(transformed_data)
+            with self.metrics.stage('quality', rows_in=rows, rows_out=rows):
+                self.quality.observe(transformed_data)
+        return transformed_data
     
     def run(self):
         """Run the complete ETL pipeline"""
+        status = 'failed'
         try:
             logger.info("Starting ETL pipeline...")
             
+            if self.resume and not self.resume_checkpoint():
+                status = 'completed'
+                return
+            
             # Setup
-            self.setup()
+            with self.metrics.stage('setup'):
+                self.setup()
             
-            # Extract
-            raw_data = self.extract_data()
+            if ETL_CONFIG['staging'] and not self.from_staging:
+                self.start_staging()
             
-            # Transform
-            transformed_data = self.transform_data(raw_data)
+            if self.from_staging:
+                self.load_staged()
+            elif self.stage_done('load'):
+                logger.info("All batches were loaded by the interrupted run")
+            elif ETL_CONFIG['chunked']:
+                # Extract, transform and load one batch at a time
+                if ETL_CONFIG['pipelined']:
+                    self.run_pipelined()
+                else:
+                    self.run_batches()
+                self.complete_stage('load')
+                if self.staging:
+                    self.staging.finish(self.input_source.source)
+            else:
+                raw_data = self.metrics.iterate('extract', self.extract_data())
+
+                # Transform
+                with self.metrics.stage('transform') as stage:
+                    if self.get_worker_count() > 1:
+                        transformed_data = self.transform_data_parallel(raw_data)
+                    else:
+                        transformed_data = self.transform_data(raw_data)
+                    stage['rows_out'] = count_rows(transformed_data)
+                transformed_data = self.post_transform(transformed_data)
+                if self.staging:
+                    # Transformed in one pass, so one part per table; one record per property
+                    self.stage_batch(1, len(transformed_data['properties']), transformed_data)
+                    self.staging.finish(self.input_source.source)
+                
+                # Load
+                with self.metrics.stage('load', rows_in=count_rows(transformed_data)):
+                    self.load_data(transformed_data)
+            
+            if self.location_index_enabled() and not self.from_staging:
+                logger.info(f"Location index: {self.location_index.hits} records reused an existing location, "
+                            f"{len(self.location_index.locations)} distinct addresses")
+                if ETL_CONFIG['persist_location_index']:
+                    self.location_index.save(LOCATION_INDEX_FILE)
+            
+            if self.dimensions:
+                logger.info(f"Dimension tables: {self.dimensions.size()} distinct values "
+                            f"in {len(DIMENSIONS)} lookup tables")
+            
+            if ETL_CONFIG['incremental']:
+                totals = self.incremental_loader.totals
+                logger.info(f"Incremental load: {totals['inserted']} inserted, {totals['updated']} updated, "
+                            f"{totals['unchanged']} unchanged")
+            
+            if self.bulk_session:
+                with self.metrics.stage('indexes'):
+                    self.finish_bulk_session()
+                self.complete_stage('indexes')
+            
+            if ETL_CONFIG['refresh_summary']:
+                if ETL_CONFIG['incremental']:
+                    logger.info(f"Property summary refreshed for {self.summary.refreshed} changed properties")
+                elif not self.stage_done('summary'):
+                    with self.metrics.stage('summary') as stage:
+                        stage['rows_out'] = self.summary.rebuild()
+                    self.complete_stage('summary')
             
-            # Load
-            self.load_data(transformed_data)
+            if self.quality:
+                self.quality.log_summary()
+                save_report(self.quality.report(), QUALITY_REPORT_FILE)
             
-            # Validate
+            # Post-load SQL cross-check
             if ETL_CONFIG['validate_data']:
-                self.validate_data()
+                with self.metrics.stage('validate'):
+                    self.validate_data()
             
             logger.info("ETL pipeline completed successfully")
+            status = 'completed'
             
         except Exception as e:
             logger.error(f"ETL pipeline failed: {e}")
+            if self.checkpoint and self.checkpoint.manifest:
+                logger.error("Committed batches are checkpointed; run again with --resume to continue")
             raise
         finally:
+            if self.checkpoint and self.checkpoint.manifest:
+                self.checkpoint.finish(status)
             self.db_manager.disconnect()
+            self.write_metrics()
+    
+    def resume_checkpoint(self) -> bool:
+        """Load the interrupted run's checkpoint; False if there is nothing left to do"""
+        if not self.checkpoint:
+            raise RuntimeError("--resume needs ETL_CONFIG['chunked'] and ETL_CONFIG['checkpoint']")
+        if not self.checkpoint.resume(self.input_source):
+            logger.info("The last run completed; nothing to resume")
+            return False
+        if self.quality:
+            logger.info("Quality metrics cover only the records loaded by this run")
+        return True
+    
+    def stage_done(self, stage: str) -> bool:
+        """Whether the interrupted run already completed a stage"""
+        return self.resume and stage in self.checkpoint.stages
+    
+    def complete_stage(self, stage: str):
+        """Checkpoint a completed stage"""
+        if self.checkpoint:
+            self.checkpoint.stage_completed(stage)
+    
+    def write_metrics(self):
+        """Log and write the stage metrics, and the profile if one was taken"""
+        try:
+            if self.input_source.stats:
+                self.metrics.inputs = self.input_source.report()
+            # Transforms run in worker processes fill their own caches, not counted here
+            self.metrics.caches = {name: cache for name, cache in self.field_mapping.cache_report().items()
+                                   if cache['calls']}
+            self.metrics.log_summary()
+            self.metrics.write(METRICS_FILE, METRICS_PROMETHEUS_FILE)
+            self.metrics.write_profile(PROFILE_DIR)
+        except Exception as e:
+            # Metrics must never hide the outcome of the run
+            logger.error(f"Error writing metrics: {e}")
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """Main function"""
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Property data ETL pipeline")
+    parser.add_argument('--profile', metavar='STAGE', default=None,
+                        help='profile one stage, e.g. transform, load or load.properties (written to logs/profiles/)')
+    parser.add_argument('--profiler', choices=PROFILERS, default='cprofile',
+                        help='cprofile for time per function, tracemalloc for memory per line')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue the last failed run from its checkpoint instead of starting over')
+    parser.add_argument('--stage', action='store_true',
+                        help='also write the transformed tables to the staging directory (data/staging/)')
+    parser.add_argument('--from-staging', action='store_true',
+                        help='load the tables staged by an earlier run instead of extracting and transforming')
+    parser.add_argument('--input', default=None,
+                        help='file, directory, glob or manifest of (optionally compressed) JSON/NDJSON files; '
+                             'defaults to INPUT_SOURCE')
+    parser.add_argument('--read-workers', type=int, default=None,
+                        help="input files read at once; overrides ETL_CONFIG['read_workers']")
+    args = parser.parse_args(argv)
+    
+    if args.stage:
+        ETL_CONFIG['staging'] = True
+    if args.read_workers:
+        ETL_CONFIG['read_workers'] = args.read_workers
+    if args.profile and args.profile.split('.')[0] == 'transform' and ETL_CONFIG['workers'] != 1:
+        logger.warning("The transform runs in worker processes (ETL_CONFIG['workers']); "
+                       "its profile only covers waiting for and merging their results")
+    
     try:
-        etl = PropertyETL()
+        etl = PropertyETL(args.profile, args.profiler, args.resume, args.from_staging, args.input)
         etl.run()
         print("ETL pipeline completed successfully!")
         
@@ -315,5 +961,5 @@ def main():
         print(f"ETL pipeline failed: {e}")
         sys.exit(1)
 
-if _name_ == "_main_":
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,339 @@
+"""
+Compiled field mappings
+Turns FIELD_MAPPINGS, extended with the source columns listed in the Field
+Config workbook, into one generated row-builder function per table, and
+caches the merged mapping so later runs skip parsing the workbook
+"""
+
+import copy
+import hashlib
+import logging
+import pickle
+import sys
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from config import *
+from rows import ROW_TYPES
+from utils import DataProcessor, read_field_config
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached layout changes
+CACHE_FORMAT = 1
+
+# Arguments of each builder that are copied into the row ahead of the mapped columns
+KEY_COLUMNS = {
+    'locations': ['location_id'],
+    'properties': ['property_id', 'location_id'],
+    'hoa_details': ['hoa_id', 'property_id']
+}
+
+# Marks an alias that is absent from the record, as opposed to an explicit null
+MISSING = object()
+
+def clean_integer(value: Any) -> Optional[int]:
+    """int(value) for a truthy value, None otherwise; raises like int() on bad input"""
+    return int(value) if value else None
+
+def clean_category(value: Any) -> Optional[str]:
+    """clean_string, interned so that equal values share one string object"""
+    cleaned = DataProcessor.clean_string(value)
+    return None if cleaned is None else sys.intern(cleaned)
+
+class CategoryCache:
+    """Bounded memo of clean_category for one column
+
+    A hit is a plain lookup in values, inlined by the row builder; only a
+    miss calls miss(), which cleans the value and keeps it while there are
+    fewer than max_size entries. Later new values are cleaned but not kept,
+    so a column that turns out not to be low-cardinality costs no memory,
+    only a low hit rate. Only strings and None are kept: 1, 1.0 and True are
+    equal keys but clean to different strings. calls is shared with the row
+    builder, which counts its records there; clean() counts its own.
+    """
+
+    def __init__(self, max_size: int, calls: List[int]):
+        self.values: Dict[Any, Optional[str]] = {}
+        self.max_size = max_size
+        self.calls = calls
+        self.direct_calls = 0
+        self.misses = 0
+
+    def miss(self, value: Any) -> Optional[str]:
+        """Clean a value that is not in the cache, keeping it if there is room"""
+        self.misses += 1
+        cleaned = clean_category(value)
+        if (value is None or value.__class__ is str) and len(self.values) < self.max_size:
+            self.values[value] = cleaned
+        return cleaned
+
+    def clean(self, value: Any) -> Optional[str]:
+        """Cached clean_category of one value, for callers other than the row builder"""
+        self.direct_calls += 1
+        try:
+            return self.values[value]
+        except (KeyError, TypeError):
+            return self.miss(value)
+
+    def report(self) -> Dict[str, Any]:
+        """Lookups, hits, misses and entries so far"""
+        calls = self.calls[0] + self.direct_calls
+        hits = calls - self.misses
+        return {
+            'calls': calls,
+            'hits': hits,
+            'misses': self.misses,
+            'entries': len(self.values),
+            'capacity': self.max_size,
+            'hit_rate': round(hits / calls, 4) if calls else None
+        }
+
+# Function each kind of cleaning compiles to; 'category' columns go through their CategoryCache
+CLEANERS: Dict[str, Callable[[Any], Any]] = {
+    'string': DataProcessor.clean_string,
+    'category': clean_category,
+    'numeric': DataProcessor.clean_numeric,
+    'integer': clean_integer,
+    'boolean': DataProcessor.clean_boolean
+}
+
+def base_spec() -> Dict[str, Dict[str, Tuple[List[str], str]]]:
+    """FIELD_MAPPINGS plus the wide valuation and rehab cost columns, as an independent copy"""
+    spec = copy.deepcopy(FIELD_MAPPINGS)
+    spec['valuations'] = {field: ([field], 'numeric') for field in VALUATION_MAPPINGS}
+    spec['rehab_costs'] = {field: ([field], 'numeric') for field in REHAB_MAPPINGS}
+    return spec
+
+def apply_field_config(spec: Dict[str, Dict[str, Tuple[List[str], str]]],
+                       columns: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """Add Field Config source columns to the aliases of the columns they feed
+
+    A source column feeds a target column of its target table when its
+    lower-cased name is one of that column's aliases, the column itself, or
+    listed in FIELD_CONFIG_ALIASES. It is appended after the existing
+    aliases, so it never changes which field wins for records that already
+    map. Returns the coverage: which source columns mapped where, and which
+    did not map at all.
+    """
+    mapped = {}
+    unmapped = []
+    for name, target in columns:
+        key = name.strip().lower()
+        tables = FIELD_CONFIG_TABLES.get(target.strip().lower(), [])
+        found = None
+        for table_key in tables:
+            for column, (aliases, _) in spec[table_key].items():
+                if key == column or key in aliases or FIELD_CONFIG_ALIASES.get(key) == column:
+                    found = (table_key, column)
+                    break
+            if found:
+                break
+
+        if not found:
+            unmapped.append(f"{name} ({target})")
+            continue
+        table_key, column = found
+        aliases = spec[table_key][column][0]
+        if name not in aliases:
+            aliases.append(name)
+        mapped[name] = f"{table_key}.{column}"
+
+    return {'columns': len(columns), 'mapped': mapped, 'unmapped': unmapped}
+
+def compile_row_builder(table_key: str, fields: Dict[str, Tuple[List[str], str]],
+                        category_caches: Optional[Dict[str, CategoryCache]] = None) -> Callable[..., Any]:
+    """Generate a function building one table's row from a raw record
+
+    The function takes the record followed by the table's KEY_COLUMNS. Each
+    alias is looked up once, in order (integer columns with several aliases
+    look them up again to see whether any is truthy), and single-alias
+    columns are read and cleaned inline, so per record there is no loop over
+    the mapping. Tables
+    with KEY_COLUMNS get their rows.ROW_TYPES row, built positionally; the
+    other mappings (wide valuation and rehab columns, shared rehab fields)
+    are intermediate and return a dict. Each 'category' column gets a
+    CategoryCache, added to category_caches as 'table.column'.
+    """
+    key_columns = KEY_COLUMNS.get(table_key, [])
+    lines = [f"def build_{table_key}(record{''.join(', ' + key for key in key_columns)}):", "    get = record.get"]
+    values = {key: key for key in key_columns}
+    namespace = {f"clean_{cleaning}": cleaner for cleaning, cleaner in CLEANERS.items()}
+    category_caches = {} if category_caches is None else category_caches
+    calls = [0]
+
+    for index, (column, (aliases, cleaning)) in enumerate(fields.items()):
+        cleaner = f"clean_{cleaning}"
+        variable = f"value_{index}"
+        if len(aliases) == 1 and cleaning != 'category':
+            values[column] = f"{cleaner}(get({aliases[0]!r}))"
+            continue
+        if len(aliases) == 1:
+            lines.append(f"    {variable} = get({aliases[0]!r})")
+        else:
+            # record.get(a, record.get(b)) without evaluating the fallback when a is present
+            lines.append(f"    {variable} = get({aliases[0]!r}, MISSING)")
+            for alias in aliases[1:-1]:
+                lines.append(f"    if {variable} is MISSING: {variable} = get({alias!r}, MISSING)")
+            lines.append(f"    if {variable} is MISSING: {variable} = get({aliases[-1]!r})")
+        if cleaning == 'integer':
+            # As int(get(a, get(b, 0))) if get(a) or get(b) else None: any truthy alias
+            # asks for a value, and the first alias present is converted, even if falsy
+            wanted = ' or '.join(f"get({alias!r})" for alias in aliases)
+            values[column] = f"int({variable}) if {wanted} else None"
+        elif cleaning == 'category':
+            cache = CategoryCache(ETL_CONFIG['category_cache_size'], calls)
+            category_caches[f"{table_key}.{column}"] = cache
+            namespace[f"cache_{index}"] = cache.values
+            namespace[f"miss_{index}"] = cache.miss
+            # KeyError: not cached yet; TypeError: unhashable (a list or object)
+            lines.append(f"    try: {variable} = cache_{index}[{variable}]")
+            lines.append(f"    except (KeyError, TypeError): {variable} = miss_{index}({variable})")
+            values[column] = variable
+        else:
+            values[column] = f"{cleaner}({variable})"
+
+    row_type = ROW_TYPES[table_key] if key_columns else None
+    if row_type:
+        if set(values) != set(row_type._fields):
+            raise ValueError(f"Field mappings of {table_key} do not cover its row columns {list(row_type._fields)}")
+        lines.append("    return Row(" + ", ".join(values[column] for column in row_type._fields) + ")")
+    else:
+        lines.append("    return {" + ", ".join(f"{column!r}: {value}" for column, value in values.items()) + "}")
+    if any(cleaning == 'category' for _, cleaning in fields.values()):
+        lines.insert(1, "    calls[0] += 1")
+        namespace['calls'] = calls
+    source = "\n".join(lines) + "\n"
+
+    namespace['MISSING'] = MISSING
+    namespace['Row'] = row_type
+    exec(compile(source, f"<field mapping: {table_key}>", 'exec'), namespace)
+    builder = namespace[f"build_{table_key}"]
+    builder.source = source
+    return builder
+
+class FieldMapping:
+    """Field mappings compiled into one row-builder function per table"""
+
+    def __init__(self, spec: Dict[str, Dict[str, Tuple[List[str], str]]], coverage: Optional[Dict[str, Any]] = None):
+        self.spec = spec
+        self.coverage = coverage or {}
+        # Caches of the 'category' columns, by 'table.column'
+        self.category_caches: Dict[str, CategoryCache] = {}
+        self.builders = {table_key: compile_row_builder(table_key, fields, self.category_caches)
+                         for table_key, fields in spec.items()}
+        self.hoa_aliases = tuple(alias for column in HOA_PRESENCE_COLUMNS for alias in spec['hoa_details'][column][0])
+
+    def aliases(self, table_key: str, column: str) -> List[str]:
+        """Source aliases of a target column, in lookup order"""
+        return self.spec[table_key][column][0]
+
+    def has_hoa(self, record: Dict[str, Any]) -> bool:
+        """Whether the record carries any HOA data"""
+        get = record.get
+        return any(get(alias) for alias in self.hoa_aliases)
+
+    def clean_category(self, table_key: str, column: str, value: Any) -> Optional[str]:
+        """Clean a value of a 'category' column through that column's cache"""
+        return self.category_caches[f"{table_key}.{column}"].clean(value)
+
+    def cache_report(self) -> Dict[str, Dict[str, Any]]:
+        """Hits, misses, entries and hit rate of each 'category' column's cache in this process"""
+        return {name: cache.report() for name, cache in self.category_caches.items()}
+
+    def source_fields(self) -> List[str]:
+        """Every raw field the transform reads, without duplicates"""
+        fields = [alias for table in self.spec.values() for aliases, _ in table.values() for alias in aliases]
+        fields += [f"{field}_description" for field in REHAB_MAPPINGS]
+        return list(dict.fromkeys(fields))
+
+def spec_fingerprint() -> str:
+    """Hash of the built-in mappings, so editing config.py invalidates the cache"""
+    return hashlib.sha256(repr((CACHE_FORMAT, base_spec(), FIELD_CONFIG_TABLES, FIELD_CONFIG_ALIASES,
+                                HOA_PRESENCE_COLUMNS)).encode('utf-8')).hexdigest()
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file's contents"""
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def load_cached_spec(config_path: Path, cache_path: Path) -> Optional[Dict[str, Any]]:
+    """The cached mapping if it was built from this Field Config and these built-in mappings
+
+    The file's mtime and size are checked first; only when they differ is
+    the content hashed, so touching the workbook does not force a rebuild.
+    """
+    if not cache_path.exists():
+        return None
+    try:
+        with open(cache_path, 'rb') as file:
+            cached = pickle.load(file)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable field mapping cache {cache_path}: {e}")
+        return None
+
+    if cached.get('format') != CACHE_FORMAT or cached.get('fingerprint') != spec_fingerprint():
+        return None
+    stat = config_path.stat()
+    if (cached['mtime_ns'], cached['size']) == (stat.st_mtime_ns, stat.st_size):
+        return cached
+    if cached['sha256'] == file_digest(config_path):
+        return cached
+    return None
+
+def build_spec(config_path: Path, cache_path: Optional[Path]) -> Dict[str, Any]:
+    """Parse the Field Config, merge it into the built-in mappings and cache the result"""
+    frame = read_field_config(config_path)
+    columns = [(str(name), str(target)) for name, target in zip(frame['Column Name'], frame['Target Table'])
+               if isinstance(name, str) and name.strip()]
+    spec = base_spec()
+    coverage = apply_field_config(spec, columns)
+    stat = config_path.stat()
+    cached = {
+        'format': CACHE_FORMAT,
+        'fingerprint': spec_fingerprint(),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': file_digest(config_path),
+        'spec': spec,
+        'coverage': coverage
+    }
+
+    if coverage['unmapped']:
+        logger.info(f"Field Config columns without a target column: {', '.join(coverage['unmapped'])}")
+    if cache_path:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(cache_path, 'wb') as file:
+                pickle.dump(cached, file, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            logger.warning(f"Could not write field mapping cache {cache_path}: {e}")
+    return cached
+
+def load_field_mapping(config_path: Path = FIELD_CONFIG_FILE,
+                       cache_path: Optional[Path] = FIELD_MAPPING_CACHE_FILE) -> FieldMapping:
+    """Compile the field mappings, extended by the Field Config when it exists"""
+    config_path = Path(config_path)
+    if not config_path.exists():
+        logger.warning("Field configuration file not found, using the built-in field mappings")
+        return FieldMapping(base_spec())
+
+    cached = load_cached_spec(config_path, cache_path) if cache_path else None
+    source = 'cached'
+    if cached is None:
+        cached = build_spec(config_path, cache_path)
+        source = 'parsed'
+
+    coverage = cached['coverage']
+    logger.info(f"Field configuration {source}: {len(coverage['mapped'])} of {coverage['columns']} "
+                f"columns mapped to target columns")
+    return FieldMapping(cached['spec'], coverage)
+
+_field_mapping: Optional[FieldMapping] = None
+
+def get_field_mapping() -> FieldMapping:
+    """The field mapping of this process, compiled on first use"""
+    global _field_mapping
+    if _field_mapping is None:
+        _field_mapping = load_field_mapping()
+    return _field_mapping
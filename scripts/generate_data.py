@@ -0,0 +1,220 @@
+"""
+Synthetic property data generator
+Writes deterministic records shaped like fake_property_data.json, using every
+source field alias the ETL understands, with configurable null and dirty
+value rates
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterator
+
+from config import *
+
+logger = logging.getLogger(__name__)
+
+STREETS = ['Main St', 'Oak Ave', 'Maple Dr', 'Cedar Ln', 'Park Blvd', 'Lake Rd', 'Hill St', 'Pine Ct',
+           'Elm St', 'Sunset Blvd', 'River Rd', 'Washington Ave']
+# (city, state, county, zip prefix, latitude, longitude)
+CITIES = [
+    ('Dallas', 'TX', 'Dallas', '752', 32.78, -96.80),
+    ('Austin', 'TX', 'Travis', '787', 30.27, -97.74),
+    ('Phoenix', 'AZ', 'Maricopa', '850', 33.45, -112.07),
+    ('Atlanta', 'GA', 'Fulton', '303', 33.75, -84.39),
+    ('Tampa', 'FL', 'Hillsborough', '336', 27.95, -82.46),
+    ('Charlotte', 'NC', 'Mecklenburg', '282', 35.23, -80.84),
+    ('Denver', 'CO', 'Denver', '802', 39.74, -104.99),
+    ('Columbus', 'OH', 'Franklin', '432', 39.96, -83.00)
+]
+PROPERTY_TYPES = ['Single Family', 'Condo', 'Townhouse', 'Multi Family', 'Mobile Home']
+CONDITIONS = ['Excellent', 'Good', 'Fair', 'Poor']
+STATUSES = ['Active', 'Pending', 'Sold', 'Off Market']
+HOA_NAMES = ['Oak Ridge HOA', 'Lakeside Community Association', 'Sunset Villas HOA', 'Park Place Owners']
+AMENITIES = ['Pool', 'Gym', 'Clubhouse', 'Tennis Courts', 'Playground', 'Gated Entry']
+CONTRACTORS = ['ABC Construction', 'Premier Renovations', 'HomeFix Pros', 'BuildRight LLC']
+
+# Values that every cleaner has to cope with
+MISSING_VALUES = [None, '']
+DIRTY_NUMBERS = ['N/A', 'unknown', '-', 'TBD']
+
+# Each source field in pairs of aliases; a record uses one alias of each pair
+ALIASES = {
+    'address': ('address', 'street_address'),
+    'zip': ('zip_code', 'zip'),
+    'property_type': ('property_type', 'type'),
+    'bedrooms': ('bedrooms', 'beds'),
+    'bathrooms': ('bathrooms', 'baths'),
+    'square_footage': ('square_footage', 'sqft'),
+    'hoa_fee': ('hoa_monthly_fee', 'hoa_fee')
+}
+
+class SyntheticDataGenerator:
+    """Deterministic generator of raw property records
+
+    The same seed and rates always produce the same records. null_rate is
+    the share of optional values left out or empty; dirty_rate the share of
+    values made messy: padded or re-cased strings, numbers as strings,
+    placeholders like 'N/A' in numeric fields and, rarely, out-of-range
+    values for the validation rules to catch.
+    """
+
+    def __init__(self, seed: int = 42, null_rate: float = 0.1, dirty_rate: float = 0.05):
+        self.seed = seed
+        self.null_rate = null_rate
+        self.dirty_rate = dirty_rate
+        self.random = random.Random(seed)
+
+    def missing(self) -> bool:
+        """Whether the next value is left out"""
+        return self.random.random() < self.null_rate
+
+    def dirty(self) -> bool:
+        """Whether the next value is made messy"""
+        return self.random.random() < self.dirty_rate
+
+    def text(self, value: str) -> Any:
+        """A string value, possibly missing, padded or re-cased"""
+        if self.missing():
+            return self.random.choice(MISSING_VALUES)
+        if self.dirty():
+            return self.random.choice([f"  {value} ", value.upper(), value.lower(), f"{value}\t"])
+        return value
+
+    def number(self, value: float) -> Any:
+        """A float value, possibly missing, a numeric string or a placeholder"""
+        if self.missing():
+            return self.random.choice(MISSING_VALUES)
+        if self.dirty():
+            return self.random.choice([str(value), f" {value} ", self.random.choice(DIRTY_NUMBERS)])
+        return value
+
+    def integer(self, value: int) -> Any:
+        """An int value, possibly missing or given as a string"""
+        if self.missing():
+            return None
+        if self.dirty():
+            return str(value)
+        return value
+
+    def alias(self, field: str) -> str:
+        """One of the source names of field"""
+        return self.random.choice(ALIASES[field])
+
+    def record(self, index: int) -> Dict[str, Any]:
+        """One raw record; index keeps MLS numbers unique"""
+        rnd = self.random
+        city, state, county, zip_prefix, latitude, longitude = rnd.choice(CITIES)
+        record: Dict[str, Any] = {
+            self.alias('address'): self.text(f"{rnd.randint(1, 9999)} {rnd.choice(STREETS)}"),
+            'city': self.text(city),
+            'state': self.text(state),
+            self.alias('zip'): self.text(f"{zip_prefix}{rnd.randint(0, 99):02d}"),
+            'county': self.text(county),
+            'latitude': self.number(round(latitude + rnd.uniform(-0.3, 0.3), 6)),
+            'longitude': self.number(round(longitude + rnd.uniform(-0.3, 0.3), 6)),
+            self.alias('property_type'): self.text(rnd.choice(PROPERTY_TYPES)),
+            self.alias('bedrooms'): self.integer(rnd.randint(1, 6)),
+            self.alias('bathrooms'): self.number(rnd.choice([1, 1.5, 2, 2.5, 3, 3.5, 4])),
+            self.alias('square_footage'): self.integer(rnd.randint(600, 5000)),
+            'lot_size': self.number(round(rnd.uniform(0.05, 2.0), 2)),
+            'year_built': self.integer(rnd.randint(1900, 2023)),
+            'garage_spaces': self.integer(rnd.randint(0, 3)),
+            'pool': rnd.random() < 0.2,
+            'fireplace': rnd.random() < 0.4,
+            'basement': rnd.random() < 0.3,
+            'condition': self.text(rnd.choice(CONDITIONS)),
+            'status': self.text(rnd.choice(STATUSES)),
+            'mls_number': None if self.missing() else f"MLS{self.seed:04d}{index:09d}"
+        }
+
+        if rnd.random() < 0.4:
+            monthly_fee = round(rnd.uniform(50, 800), 2)
+            record.update({
+                'hoa_name': self.text(rnd.choice(HOA_NAMES)),
+                self.alias('hoa_fee'): self.number(monthly_fee),
+                'hoa_annual_fee': self.number(round(monthly_fee * 12, 2)),
+                'hoa_contact': self.text(f"(555) {rnd.randint(100, 999)}-{rnd.randint(1000, 9999)}"),
+                'hoa_amenities': self.text(', '.join(rnd.sample(AMENITIES, rnd.randint(1, 3)))),
+                'hoa_restrictions': self.text('No short-term rentals')
+            })
+
+        market_value = rnd.randint(80, 1500) * 1000
+        for field in VALUATION_MAPPINGS:
+            if rnd.random() < 0.7:
+                record[field] = self.number(round(market_value * rnd.uniform(0.8, 1.3), -2))
+
+        if rnd.random() < 0.5:
+            for field in rnd.sample(list(REHAB_MAPPINGS), rnd.randint(1, len(REHAB_MAPPINGS))):
+                record[field] = self.number(rnd.randint(2, 120) * 500)
+                record[f"{field}_description"] = self.text(f"{REHAB_MAPPINGS[field].replace('_', ' ')} work")
+            record.update({
+                'contractor_name': self.text(rnd.choice(CONTRACTORS)),
+                'timeline_weeks': self.integer(rnd.randint(1, 26)),
+                'materials_cost': self.number(rnd.randint(1, 50) * 500),
+                'labor_cost': self.number(rnd.randint(1, 50) * 500),
+                'permit_cost': self.number(rnd.randint(1, 10) * 100),
+                'contingency_percentage': self.number(rnd.choice([5, 10, 15, 20]))
+            })
+
+        # Rare values outside the ranges the validation rules accept
+        if self.dirty() and rnd.random() < 0.1:
+            outlier = rnd.choice(['year_built', 'bedrooms', 'market_value'])
+            record[outlier] = {'year_built': 1700, 'bedrooms': 25, 'market_value': -1}[outlier]
+
+        return record
+
+    def iter_records(self, count: int) -> Iterator[Dict[str, Any]]:
+        """Yield count records"""
+        for index in range(count):
+            yield self.record(index)
+
+    def write(self, path: Path, count: int, ndjson: bool = False) -> int:
+        """Stream count records to path as a JSON array or NDJSON; returns bytes written"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        with open(path, 'w', encoding='utf-8') as file:
+            if not ndjson:
+                file.write('[\n')
+            for index, record in enumerate(self.iter_records(count)):
+                if ndjson:
+                    file.write(json.dumps(record) + '\n')
+                else:
+                    file.write((',\n' if index else '') + json.dumps(record))
+            if not ndjson:
+                file.write('\n]\n')
+            size = file.tell()
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Wrote {count} records ({size / 2 ** 20:.1f} MB) to {path} in {elapsed:.1f}s")
+        return size
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--output', type=Path, default=JSON_FILE)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--null-rate', type=float, default=0.1)
+    parser.add_argument('--dirty-rate', type=float, default=0.05)
+    parser.add_argument('--ndjson', action='store_true', help='one record per line instead of a JSON array')
+    args = parser.parse_args()
+
+    from utils import setup_logging
+    setup_logging()
+
+    try:
+        generator = SyntheticDataGenerator(args.seed, args.null_rate, args.dirty_rate)
+        generator.write(args.output, args.records, args.ndjson)
+        print(f"Generated {args.records} records in {args.output}")
+    except Exception as e:
+        print(f"Data generation failed: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,206 @@
+"""
+Incremental (delta) loading
+Derives stable keys from natural keys, keeps a content hash per property and
+writes only new or changed properties with INSERT ... ON DUPLICATE KEY UPDATE
+"""
+
+import hashlib
+import logging
+import uuid
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Set, Tuple
+
+from config import TABLES
+from location_index import normalize_address
+from utils import DatabaseManager, binary_keys
+
+if TYPE_CHECKING:
+    from dimensions import DimensionIndex
+
+logger = logging.getLogger(__name__)
+
+# Namespace for uuid5 keys; changing it re-keys every row
+KEY_NAMESPACE = uuid.UUID('43940c0c-e70c-4494-86cf-dd226495ba74')
+
+HASH_TABLE = 'etl_record_hashes'
+
+# Surrogate keys and run-dated values do not count as content changes
+VOLATILE_COLUMNS = {'location_id', 'property_id', 'hoa_id', 'valuation_id', 'estimate_id',
+                    'valuation_date', 'estimate_date'}
+
+PRIMARY_KEYS = {
+    'locations': 'location_id',
+    'properties': 'property_id',
+    'hoa_details': 'hoa_id',
+    'valuations': 'valuation_id',
+    'rehab_estimates': 'estimate_id'
+}
+
+CHILD_TABLES = ['hoa_details', 'valuations', 'rehab_estimates']
+
+# Rows per IN (...) list when querying or deleting by property_id
+KEY_CHUNK_SIZE = 1000
+
+def stable_id(*parts: Any) -> Any:
+    """Deterministic UUID (version 5) for a natural key, in the configured key format"""
+    key = uuid.uuid5(KEY_NAMESPACE, ':'.join(part.hex() if isinstance(part, bytes) else part for part in parts))
+    return key.bytes if binary_keys() else str(key)
+
+def content_hash(rows: List[Dict[str, Any]]) -> str:
+    """Hash of the non-volatile column values of a group of rows"""
+    digest = hashlib.blake2b(digest_size=16)
+    for row in rows:
+        digest.update(repr([(k, v) for k, v in row.items() if k not in VOLATILE_COLUMNS]).encode('utf-8'))
+    return digest.hexdigest()
+
+def assign_stable_keys(transformed_data: Dict[str, List[Dict[str, Any]]]) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, str]]:
+    """Replace random ids with ids derived from natural keys
+
+    Properties are keyed on mls_number, then on the normalized address and,
+    failing both, on their content. Locations are keyed on the normalized
+    address and child rows on (property, type). When a batch contains the
+    same property twice the last occurrence wins.
+
+    Returns the re-keyed tables and the content hash of every property.
+    """
+    locations = {row.location_id: row for row in transformed_data['locations']}
+    children = {table_key: defaultdict(list) for table_key in CHILD_TABLES}
+    for table_key in CHILD_TABLES:
+        for row in transformed_data[table_key]:
+            children[table_key][row.property_id].append(row)
+
+    keyed_locations = {}
+    keyed_properties = {}
+    keyed_children = {table_key: {} for table_key in CHILD_TABLES}
+    hashes = {}
+
+    for prop in transformed_data['properties']:
+        location = locations.get(prop.location_id)
+        address = normalize_address(location) if location else None
+        prop_children = {table_key: children[table_key].get(prop.property_id, []) for table_key in CHILD_TABLES}
+
+        record_rows = ([location] if location else []) + [prop] + [
+            row for table_key in CHILD_TABLES for row in prop_children[table_key]
+        ]
+        record_hash = content_hash(record_rows)
+
+        if prop.mls_number:
+            property_id = stable_id('property', 'mls', prop.mls_number)
+        elif address:
+            property_id = stable_id('property', 'address', address)
+        else:
+            property_id = stable_id('property', 'content', record_hash)
+
+        location_id = None
+        if location:
+            location_id = stable_id('location', address or content_hash([location]))
+            keyed_locations[location_id] = location._replace(location_id=location_id)
+
+        keyed_properties[property_id] = prop._replace(property_id=property_id, location_id=location_id)
+        hashes[property_id] = record_hash
+
+        keyed_children['hoa_details'][property_id] = [
+            row._replace(hoa_id=stable_id(property_id, 'hoa'), property_id=property_id)
+            for row in prop_children['hoa_details']
+        ]
+        keyed_children['valuations'][property_id] = [
+            row._replace(valuation_id=stable_id(property_id, 'valuation', row.valuation_type), property_id=property_id)
+            for row in prop_children['valuations']
+        ]
+        keyed_children['rehab_estimates'][property_id] = [
+            row._replace(estimate_id=stable_id(property_id, 'rehab', row.estimate_type), property_id=property_id)
+            for row in prop_children['rehab_estimates']
+        ]
+
+    keyed = {
+        'locations': list(keyed_locations.values()),
+        'properties': list(keyed_properties.values())
+    }
+    for table_key in CHILD_TABLES:
+        keyed[table_key] = [row for rows in keyed_children[table_key].values() for row in rows]
+
+    return keyed, hashes
+
+class IncrementalLoader:
+    """Upserts only the properties whose content hash is new or has changed"""
+
+    def __init__(self, db_manager: DatabaseManager, dimensions: Optional['DimensionIndex'] = None):
+        self.db_manager = db_manager
+        # Encodes categorical columns as lookup ids when the schema has dimension tables
+        self.dimensions = dimensions
+        self.totals = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        # Property ids written by the last call to load
+        self.last_changed: List[Any] = []
+
+    def fetch_hashes(self, property_ids: List[str]) -> Dict[str, str]:
+        """Stored content hashes for the given property ids"""
+        existing = {}
+        for i in range(0, len(property_ids), KEY_CHUNK_SIZE):
+            chunk = property_ids[i:i + KEY_CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            rows = self.db_manager.execute_query(
+                f"SELECT property_id, content_hash FROM {HASH_TABLE} WHERE property_id IN ({placeholders})",
+                tuple(chunk),
+                commit=False
+            )
+            # BINARY columns may come back as bytearray
+            existing.update((bytes(pid) if isinstance(pid, bytearray) else pid, digest) for pid, digest in rows)
+        return existing
+
+    def delete_children(self, property_ids: List[str]):
+        """Remove child rows of changed properties so dropped valuations or estimates disappear"""
+        for table_key in CHILD_TABLES:
+            for i in range(0, len(property_ids), KEY_CHUNK_SIZE):
+                chunk = property_ids[i:i + KEY_CHUNK_SIZE]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                self.db_manager.execute_query(
+                    f"DELETE FROM {TABLES.get(table_key, table_key)} WHERE property_id IN ({placeholders})",
+                    tuple(chunk),
+                    commit=False,
+                    fetch=False
+                )
+
+    def encode(self, table_key: str, rows: List[Any]) -> List[Any]:
+        """Rows as written: with lookup ids in place of the categorical values, if so configured"""
+        return self.dimensions.encode(table_key, rows) if self.dimensions else rows
+
+    def load(self, transformed_data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, int]:
+        """Write the delta of one batch without committing; returns inserted/updated/unchanged counts"""
+        keyed, hashes = assign_stable_keys(transformed_data)
+        existing = self.fetch_hashes(list(hashes))
+
+        inserted = {pid for pid in hashes if pid not in existing}
+        updated = {pid for pid, digest in hashes.items() if pid in existing and existing[pid] != digest}
+        changed: Set[str] = inserted | updated
+        self.last_changed = sorted(changed)
+
+        counts = {'inserted': len(inserted), 'updated': len(updated), 'unchanged': len(hashes) - len(changed)}
+        for key, value in counts.items():
+            self.totals[key] += value
+
+        if not changed:
+            logger.info("Incremental batch: no new or changed records")
+            return counts
+
+        properties = [row for row in keyed['properties'] if row.property_id in changed]
+        location_ids = {row.location_id for row in properties}
+        locations = [row for row in keyed['locations'] if row.location_id in location_ids]
+
+        self.db_manager.upsert_batch(TABLES['locations'], locations, [PRIMARY_KEYS['locations']], commit=False)
+        self.db_manager.upsert_batch(TABLES['properties'], self.encode('properties', properties),
+                                     [PRIMARY_KEYS['properties']], commit=False)
+
+        if updated:
+            self.delete_children(sorted(updated))
+
+        for table_key in CHILD_TABLES:
+            rows = [row for row in keyed[table_key] if row.property_id in changed]
+            self.db_manager.upsert_batch(TABLES.get(table_key, table_key), self.encode(table_key, rows),
+                                         [PRIMARY_KEYS[table_key]], commit=False)
+
+        hash_rows = [{'property_id': pid, 'content_hash': hashes[pid]} for pid in sorted(changed)]
+        self.db_manager.upsert_batch(HASH_TABLE, hash_rows, ['property_id'], commit=False)
+
+        logger.info(f"Incremental batch: {counts['inserted']} inserted, {counts['updated']} updated, "
+                    f"{counts['unchanged']} unchanged")
+        return counts
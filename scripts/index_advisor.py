@@ -0,0 +1,581 @@
+"""
+Index advisor
+Runs EXPLAIN FORMAT=JSON on the queries the project itself runs against a
+loaded database: the validation scans, the summary report queries of
+validate_data.py and the property_summary refresh. Compares the plans with
+the secondary indexes that exist, then reports:
+- the indexes no query uses
+- composite or covering indexes that would serve a query better
+- what each index costs on every insert
+It can also write the proposed indexes file.
+"""
+
+import argparse
+import json
+import logging
+import re
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+
+from config import *
+from summary import summary_select
+from utils import DatabaseManager, setup_logging, split_statements
+from validate_data import summary_queries
+from validation_rules import compile_rules, save_report
+
+logger = logging.getLogger(__name__)
+
+# Tables read by dashboards rather than by the project's queries; their
+# indexes are reported but never proposed for removal
+SERVING_TABLES = {'property_summary'}
+
+# Widest covering index proposed, in columns (the primary key comes for free)
+COVERING_MAX_COLUMNS = 3
+
+# Rows sampled per VARCHAR column to estimate how wide its index entries are
+WIDTH_SAMPLE_ROWS = 10000
+
+# InnoDB record header of every index entry
+ENTRY_OVERHEAD_BYTES = 5
+
+FIXED_WIDTHS = {
+    'tinyint': 1, 'smallint': 2, 'mediumint': 3, 'int': 4, 'bigint': 8,
+    'float': 4, 'double': 8, 'year': 1, 'date': 3, 'time': 3, 'timestamp': 4, 'datetime': 5
+}
+
+# Column types that cannot be indexed whole
+UNINDEXABLE_TYPES = {'tinytext', 'text', 'mediumtext', 'longtext', 'tinyblob', 'blob', 'mediumblob', 'longblob',
+                     'json'}
+
+# Accesses that already read at most one row per lookup
+SINGLE_ROW_ACCESSES = {'system', 'const', 'eq_ref'}
+
+# `db`.`alias`.`column` in an EXPLAIN attached_condition, and an equality on one
+COLUMN_REF = r"(?:`\w+`\.)?`(\w+)`\.`(\w+)`"
+EQUALITY = re.compile(rf"{COLUMN_REF}\s*=\s*(?:{COLUMN_REF})?")
+
+# Table and optional alias after FROM or JOIN
+TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+SQL_KEYWORDS = {'ON', 'USING', 'WHERE', 'LEFT', 'RIGHT', 'INNER', 'OUTER', 'CROSS', 'STRAIGHT_JOIN', 'JOIN',
+                'GROUP', 'ORDER', 'HAVING', 'WINDOW', 'LIMIT', 'UNION'}
+
+# Indexes and foreign keys in the SQL scripts
+ALTER_TABLE = re.compile(r"ALTER\s+TABLE\s+(\w+)", re.IGNORECASE)
+ADD_INDEX = re.compile(r"ADD\s+INDEX\s+(\w+)\s*\(([^)]*)\)", re.IGNORECASE)
+FOREIGN_KEY = re.compile(r"FOREIGN\s+KEY\s*\((\w+)\)", re.IGNORECASE)
+
+def collect_workload(db_manager: DatabaseManager, query_files: Optional[List[Path]] = None) -> List[Dict[str, Any]]:
+    """The project's queries, each with a name, its source and its parameters
+
+    The property_summary refresh is explained for one loaded property.
+    query_files add statements of other readers, such as dashboards.
+    """
+    workload = [
+        {'name': f"Validation scan of {table}", 'source': 'DataValidator', 'query': query}
+        for table, (query, _) in compile_rules().items()
+    ]
+    workload += [
+        {'name': query_info['name'], 'source': 'generate_summary_report', 'query': query_info['query']}
+        for query_info in summary_queries()
+    ]
+    workload.append({'name': 'property_summary rebuild', 'source': 'property_summary', 'query': summary_select()})
+
+    sample = db_manager.execute_query("SELECT property_id FROM properties LIMIT 1", commit=False)
+    if sample:
+        # BINARY keys may come back as bytearray; the id list appears once per table
+        property_id = bytes(sample[0][0]) if isinstance(sample[0][0], bytearray) else sample[0][0]
+        workload.append({'name': 'property_summary refresh', 'source': 'property_summary',
+                         'query': summary_select('property_id IN (%s)'), 'params': (property_id,) * 4})
+
+    for path in query_files or []:
+        for number, statement in enumerate(split_statements(Path(path).read_text()), 1):
+            workload.append({'name': f"{Path(path).name} #{number}", 'source': str(path), 'query': statement})
+    return workload
+
+def table_accesses(plan: Any) -> Iterator[Dict[str, Any]]:
+    """Every table access of an EXPLAIN FORMAT=JSON plan, including derived tables and subqueries"""
+    if isinstance(plan, dict):
+        table = plan.get('table')
+        if isinstance(table, dict) and 'table_name' in table:
+            yield table
+        for value in plan.values():
+            yield from table_accesses(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from table_accesses(item)
+
+def plan_flags(plan: Any, flags: Optional[Set[str]] = None) -> Set[str]:
+    """using_filesort / using_temporary_table anywhere in a plan"""
+    flags = set() if flags is None else flags
+    if isinstance(plan, dict):
+        for key, value in plan.items():
+            if key in ('using_filesort', 'using_temporary_table') and value is True:
+                flags.add(key)
+            else:
+                plan_flags(value, flags)
+    elif isinstance(plan, list):
+        for item in plan:
+            plan_flags(item, flags)
+    return flags
+
+def table_aliases(query: str, tables: Set[str]) -> Dict[str, str]:
+    """alias -> table of every schema table a query reads; a reused alias keeps its first table"""
+    aliases = {}
+    for table, alias in TABLE_REF.findall(query):
+        if table not in tables:
+            continue
+        aliases.setdefault(table, table)
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            aliases.setdefault(alias, table)
+    return aliases
+
+def equality_columns(condition: str, alias: str) -> Tuple[List[str], List[str]]:
+    """(join columns, constant columns) of alias compared with = in an attached condition"""
+    joins, constants = [], []
+    for left_alias, left_column, right_alias, right_column in EQUALITY.findall(condition or ''):
+        if not right_alias:
+            # A literal or a scalar subquery
+            if left_alias == alias and left_column not in constants:
+                constants.append(left_column)
+        elif left_alias == alias and right_alias != alias:
+            if left_column not in joins:
+                joins.append(left_column)
+        elif right_alias == alias and left_alias != alias:
+            if right_column not in joins:
+                joins.append(right_column)
+    return joins, constants
+
+def decimal_bytes(precision: int, scale: int) -> int:
+    """Storage of DECIMAL(precision, scale): 4 bytes per 9 digits on each side of the point"""
+    leftover = [0, 1, 1, 2, 2, 3, 3, 4, 4, 4]
+    return sum(digits // 9 * 4 + leftover[digits % 9] for digits in (precision - scale, scale))
+
+def script_statements(path: Path) -> List[str]:
+    """Statements of a SQL file without their comment lines"""
+    return ['\n'.join(line for line in statement.splitlines() if not line.strip().startswith('--'))
+            for statement in split_statements(path.read_text())]
+
+def script_indexes(path: Path) -> List[Tuple[str, List[Tuple[str, List[str]]]]]:
+    """(table, [(index, columns)]) of every ALTER TABLE in an indexes file, in file order"""
+    tables = []
+    for statement in script_statements(path):
+        table = ALTER_TABLE.search(statement)
+        if table:
+            indexes = [(name, [column.strip() for column in columns.split(',')])
+                       for name, columns in ADD_INDEX.findall(statement)]
+            tables.append((table.group(1), indexes))
+    return tables
+
+def script_foreign_keys(paths: List[Path]) -> Set[Tuple[str, str]]:
+    """(table, column) of every foreign key the constraint files add"""
+    foreign_keys = set()
+    for path in paths:
+        for statement in script_statements(path):
+            table = ALTER_TABLE.search(statement)
+            if table:
+                foreign_keys.update((table.group(1), column) for column in FOREIGN_KEY.findall(statement))
+    return foreign_keys
+
+class SchemaCatalog:
+    """Tables, columns and indexes of the loaded schema, read from information_schema"""
+
+    def __init__(self, db_manager: DatabaseManager, database: str = SCHEMA_DATABASE):
+        self.db_manager = db_manager
+        self.database = database
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self.columns: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # table -> index -> {'columns': [...], 'unique': bool}, PRIMARY included
+        self.indexes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # (table, index) -> bytes on disk, when mysql.innodb_index_stats is readable
+        self.sizes: Dict[Tuple[str, str], int] = {}
+        self.widths: Dict[Tuple[str, str], float] = {}
+
+    def load(self):
+        """Read the catalog of the schema"""
+        for table, rows, avg_row_length in self.db_manager.execute_query(
+                "SELECT TABLE_NAME, TABLE_ROWS, AVG_ROW_LENGTH FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'", (self.database,), commit=False):
+            self.tables[table] = {'rows': int(rows or 0), 'avg_row_length': int(avg_row_length or 0)}
+
+        for table, column, data_type, octets, precision, scale in self.db_manager.execute_query(
+                "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_OCTET_LENGTH, NUMERIC_PRECISION, NUMERIC_SCALE "
+                "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s", (self.database,), commit=False):
+            self.columns.setdefault(table, {})[column] = {
+                'type': data_type.lower(), 'octets': octets, 'precision': precision, 'scale': scale
+            }
+
+        for table, index, column, non_unique in self.db_manager.execute_query(
+                "SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME, NON_UNIQUE FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX", (self.database,),
+                commit=False):
+            entry = self.indexes.setdefault(table, {}).setdefault(index, {'columns': [], 'unique': not non_unique})
+            entry['columns'].append(column)
+
+        try:
+            for table, index, size in self.db_manager.execute_query(
+                    "SELECT table_name, index_name, stat_value * @@innodb_page_size FROM mysql.innodb_index_stats "
+                    "WHERE database_name = %s AND stat_name = 'size'", (self.database,), commit=False):
+                self.sizes[(table, index)] = int(size)
+        except Exception as e:
+            logger.warning(f"Index sizes unavailable (needs SELECT on mysql.innodb_index_stats): {e}")
+
+    def analyze(self):
+        """Refresh the optimizer statistics and row estimates of every table"""
+        for table in self.tables:
+            self.db_manager.execute_query(f"ANALYZE TABLE {table}", commit=False)
+
+    def secondary_indexes(self, table: str) -> Dict[str, Dict[str, Any]]:
+        """Non-unique indexes of a table other than its primary key"""
+        return {name: index for name, index in self.indexes.get(table, {}).items()
+                if name != 'PRIMARY' and not index['unique']}
+
+    def primary_key(self, table: str) -> List[str]:
+        """Primary key columns of a table"""
+        return self.indexes.get(table, {}).get('PRIMARY', {}).get('columns', [])
+
+    def indexable(self, table: str, column: str) -> bool:
+        """Whether a column can be part of an index without a prefix length"""
+        info = self.columns.get(table, {}).get(column)
+        return info is not None and info['type'] not in UNINDEXABLE_TYPES
+
+    def index_starting_with(self, table: str, columns: List[str]) -> Optional[str]:
+        """An existing index whose leading columns are columns, if any"""
+        for name, index in self.indexes.get(table, {}).items():
+            if index['columns'][:len(columns)] == columns:
+                return name
+        return None
+
+    def width(self, table: str, column: str) -> float:
+        """Estimated bytes of a column in an index entry"""
+        key = (table, column)
+        if key not in self.widths:
+            info = self.columns[table][column]
+            data_type = info['type']
+            if data_type in FIXED_WIDTHS:
+                width = FIXED_WIDTHS[data_type]
+            elif data_type == 'decimal':
+                width = decimal_bytes(int(info['precision']), int(info['scale']))
+            elif data_type in ('char', 'binary'):
+                width = int(info['octets'])
+            else:
+                # VARCHAR/VARBINARY entries hold the actual value plus a length byte
+                result = self.db_manager.execute_query(
+                    f"SELECT AVG(LENGTH({column})) FROM (SELECT {column} FROM {table} LIMIT {WIDTH_SAMPLE_ROWS}) s",
+                    commit=False
+                )
+                average = result[0][0] if result and result[0][0] is not None else (info['octets'] or 0) / 2
+                width = float(average) + 1
+            self.widths[key] = width
+        return self.widths[key]
+
+    def entry_bytes(self, table: str, columns: List[str]) -> float:
+        """Estimated bytes of one entry of a secondary index: its columns, the primary key and the header"""
+        key_columns = columns + [column for column in self.primary_key(table) if column not in columns]
+        return sum(self.width(table, column) for column in key_columns) + ENTRY_OVERHEAD_BYTES
+
+class IndexAdvisor:
+    """EXPLAINs a query workload and compares the plans with the schema's secondary indexes"""
+
+    def __init__(self, db_manager: DatabaseManager, catalog: SchemaCatalog):
+        self.db_manager = db_manager
+        self.catalog = catalog
+        self.foreign_keys = script_foreign_keys(self.constraint_files())
+
+    @staticmethod
+    def indexes_file() -> Path:
+        """The indexes file the ETL builds"""
+        return DIMENSION_INDEXES_FILE if ETL_CONFIG['dimension_tables'] else INDEXES_FILE
+
+    @staticmethod
+    def constraint_files() -> List[Path]:
+        """The constraint files the ETL applies"""
+        return [CONSTRAINTS_FILE, DIMENSION_CONSTRAINTS_FILE] if ETL_CONFIG['dimension_tables'] else [CONSTRAINTS_FILE]
+
+    def explain(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Plan of one workload query: its table accesses, cost, sorts and temporary tables"""
+        result = {'name': entry['name'], 'source': entry['source']}
+        try:
+            rows = self.db_manager.execute_query(f"EXPLAIN FORMAT=JSON {entry['query']}", entry.get('params'),
+                                                 commit=False)
+            plan = json.loads(rows[0][0])
+        except Exception as e:
+            logger.error(f"Error explaining {entry['name']}: {e}")
+            result['error'] = str(e)
+            return result
+
+        aliases = table_aliases(entry['query'], set(self.catalog.tables))
+        result['cost'] = float(plan.get('query_block', {}).get('cost_info', {}).get('query_cost', 0) or 0)
+        result['flags'] = sorted(plan_flags(plan))
+        result['accesses'] = []
+        for access in table_accesses(plan):
+            alias = access['table_name']
+            result['accesses'].append({
+                'table': aliases.get(alias),
+                'alias': alias,
+                'access_type': access.get('access_type'),
+                'key': access.get('key'),
+                'used_key_parts': access.get('used_key_parts', []),
+                'rows_examined': access.get('rows_examined_per_scan'),
+                'filtered': float(access.get('filtered', 100) or 100),
+                'covering': bool(access.get('using_index')),
+                'used_columns': access.get('used_columns', []),
+                'condition': access.get('attached_condition')
+            })
+        return result
+
+    def propose(self, access: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """A composite or covering index for one table access, if it needs one
+
+        The columns the access already looks up come first, then the
+        columns it joins on, then the ones it compares with constants; with
+        at most COVERING_MAX_COLUMNS columns in all, the other columns it
+        reads are appended so the table itself is not read.
+        """
+        table = access['table']
+        if table is None or access['access_type'] in SINGLE_ROW_ACCESSES:
+            return None
+        joins, constants = equality_columns(access['condition'], access['alias'])
+        columns = list(access['used_key_parts'])
+        columns += [column for column in joins + constants if column not in columns]
+        columns = [column for column in columns if self.catalog.indexable(table, column)]
+
+        kind = 'composite'
+        if columns == access['used_key_parts'] or self.catalog.index_starting_with(table, columns):
+            # Equality lookups are covered; the index could still spare the table read
+            if access['covering'] or not columns:
+                return None
+            kind = None
+
+        primary_key = self.catalog.primary_key(table)
+        extra = [column for column in access['used_columns'] if column not in columns and column not in primary_key]
+        if (not access['covering'] and len(columns) + len(extra) <= COVERING_MAX_COLUMNS
+                and all(self.catalog.indexable(table, column) for column in extra)):
+            columns = columns + extra
+            kind = 'covering'
+        if kind is None or self.catalog.index_starting_with(table, columns):
+            return None
+
+        reason = f"{access['access_type']} on {access['key']}" if access['key'] else f"{access['access_type']} scan"
+        if joins or constants:
+            reason += f" filtering on {', '.join(joins + constants)}"
+        if kind == 'covering':
+            reason += f" then reading {', '.join(extra) or 'nothing else'} from the table"
+        return {'table': table, 'columns': columns, 'kind': kind, 'reason': reason}
+
+    def run(self, workload: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Explain every query and build the report"""
+        queries = [self.explain(entry) for entry in workload]
+
+        used: Dict[Tuple[str, str], List[str]] = {}
+        proposals: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]] = {}
+        for query in queries:
+            for access in query.get('accesses', []):
+                if access['table'] and access['key']:
+                    # index_merge lists several keys
+                    for key in access['key'].split(','):
+                        used.setdefault((access['table'], key), []).append(query['name'])
+                proposal = self.propose(access)
+                if proposal:
+                    key = (proposal['table'], tuple(proposal['columns']))
+                    merged = proposals.setdefault(key, dict(proposal, queries=[]))
+                    if query['name'] not in merged['queries']:
+                        merged['queries'].append(query['name'])
+
+        return {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'database': self.catalog.database,
+            'indexes_file': str(self.indexes_file()),
+            'queries': queries,
+            'proposals': self.merge_proposals(list(proposals.values())),
+            'indexes': self.index_report(used)
+        }
+
+    @staticmethod
+    def merge_proposals(proposals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fold each proposal into a longer one on the same table that starts with its columns"""
+        proposals.sort(key=lambda proposal: -len(proposal['columns']))
+        merged = []
+        for proposal in proposals:
+            for longer in merged:
+                if (longer['table'] == proposal['table']
+                        and longer['columns'][:len(proposal['columns'])] == proposal['columns']):
+                    longer['queries'] += [name for name in proposal['queries'] if name not in longer['queries']]
+                    break
+            else:
+                merged.append(proposal)
+        return sorted(merged, key=lambda proposal: (proposal['table'], proposal['columns']))
+
+    def index_report(self, used: Dict[Tuple[str, str], List[str]]) -> List[Dict[str, Any]]:
+        """Usage, role and estimated write cost of every secondary index"""
+        report = []
+        for table in sorted(self.catalog.indexes):
+            indexes = self.catalog.secondary_indexes(table)
+            if not indexes:
+                continue
+            stats = self.catalog.tables.get(table, {'rows': 0, 'avg_row_length': 0})
+            entries = {name: self.catalog.entry_bytes(table, index['columns']) for name, index in indexes.items()}
+            # Bytes written per inserted row: the clustered row plus one entry per secondary index
+            row_bytes = stats['avg_row_length'] + sum(entries.values())
+            for name, index in indexes.items():
+                used_by = used.get((table, name), [])
+                if used_by:
+                    status = 'used'
+                elif (table, index['columns'][0]) in self.foreign_keys:
+                    status = 'foreign key'
+                elif table in SERVING_TABLES:
+                    status = 'serving'
+                else:
+                    status = 'unused'
+                size = self.catalog.sizes.get((table, name))
+                report.append({
+                    'table': table,
+                    'index': name,
+                    'columns': index['columns'],
+                    'status': status,
+                    'used_by': used_by,
+                    'entry_bytes': round(entries[name], 1),
+                    'insert_share': round(entries[name] / row_bytes, 3) if row_bytes else None,
+                    'load_mb': round(entries[name] * stats['rows'] / 2 ** 20, 2),
+                    'size_mb': round(size / 2 ** 20, 2) if size is not None else None
+                })
+        return report
+
+def index_name(table: str, columns: List[str], current: List[Tuple[str, List[str]]], taken: Set[str]) -> str:
+    """Name in the style of the indexes file: idx_<table>_<column>_..., reusing the file's short names"""
+    prefix = next((name.split('_')[1] for name, _ in current if name.startswith('idx_')), table)
+    short = {cols[0]: name[len(f"idx_{prefix}_"):] for name, cols in current
+             if len(cols) == 1 and name.startswith(f"idx_{prefix}_")}
+    parts = [short.get(column, column[:-3] if column.endswith('_id') else column) for column in columns]
+    name = base = f"idx_{prefix}_{'_'.join(parts)}"
+    suffix = 2
+    while name in taken:
+        name, suffix = f"{base}_{suffix}", suffix + 1
+    return name
+
+def proposed_indexes_sql(report: Dict[str, Any], indexes_file: Path) -> str:
+    """The indexes file with unused and superseded indexes dropped and the proposals added
+
+    Indexes that back a foreign key, serve dashboards or that the analysed
+    database does not have are kept as they are.
+    """
+    status = {(index['table'], index['index']): index for index in report['indexes']}
+    current = script_indexes(indexes_file)
+    proposals: Dict[str, List[Dict[str, Any]]] = {}
+    for proposal in report['proposals']:
+        proposals.setdefault(proposal['table'], []).append(proposal)
+    tables = [table for table, _ in current] + sorted(set(proposals) - {table for table, _ in current})
+    current_indexes = dict(current)
+
+    notes = []
+    statements = []
+    for table in tables:
+        indexes = current_indexes.get(table, [])
+        taken = {name for name, _ in indexes}
+        # A proposal the file already has is kept under its name
+        added = [proposal for proposal in proposals.get(table, [])
+                 if proposal['columns'] not in [columns for _, columns in indexes]]
+        kept = []
+        for name, columns in indexes:
+            entry = status.get((table, name))
+            superseding = next((proposal for proposal in added
+                                if proposal['columns'][:len(columns)] == columns), None)
+            if superseding:
+                notes.append(f"replaced {name} ({', '.join(columns)}) by the {superseding['kind']} index below")
+            elif entry and entry['status'] == 'unused':
+                notes.append(f"dropped {name} ({', '.join(columns)}): no query uses it, "
+                             f"{entry['insert_share']:.0%} of the bytes written per {table} row")
+            else:
+                kept.append((name, columns))
+        for proposal in added:
+            name = index_name(table, proposal['columns'], indexes, taken)
+            taken.add(name)
+            kept.append((name, proposal['columns']))
+            notes.append(f"added {name} ({', '.join(proposal['columns'])}), {proposal['kind']}: "
+                         f"{'; '.join(proposal['queries'])}")
+        if kept:
+            lines = [f"    ADD INDEX {name} ({', '.join(columns)})" for name, columns in kept]
+            statements.append(f"ALTER TABLE {table}\n" + ',\n'.join(lines) + ';')
+
+    header = [line for line in indexes_file.read_text().splitlines() if line.startswith('--')]
+    # The file's own header, without the notes of an earlier proposal
+    header = header[:next((i for i, line in enumerate(header)
+                           if not line.strip('- ') or line.startswith('-- Proposed by')), len(header))]
+    header.append(f"-- Proposed by index_advisor.py on {report['generated_at'][:10]} from EXPLAIN of the")
+    header.append("-- project's queries against a loaded database:")
+    header += [f"--   {note}" for note in notes] or ["--   no changes"]
+    return '\n'.join(header) + '\n\n' + '\n\n'.join(statements) + '\n'
+
+def print_report(report: Dict[str, Any]):
+    """Plans, index usage and proposals in brief"""
+    print(f"{len(report['queries'])} queries explained")
+    for query in report['queries']:
+        if 'error' in query:
+            print(f"  {query['name']:<44} EXPLAIN failed: {query['error']}")
+            continue
+        scans = [f"{access['alias']}:{access['access_type']}{'/' + access['key'] if access['key'] else ''}"
+                 for access in query['accesses']]
+        flags = f" ({', '.join(query['flags'])})" if query['flags'] else ''
+        print(f"  {query['name']:<44}{query['cost']:>12,.1f}  {' '.join(scans)}{flags}")
+
+    print("Secondary indexes (entry bytes, share of bytes written per insert):")
+    for index in report['indexes']:
+        share = f"{index['insert_share']:.0%}" if index['insert_share'] is not None else '-'
+        print(f"  {index['table'] + '.' + index['index']:<48}{index['status']:<13}"
+              f"{index['entry_bytes']:>8.1f} B{share:>6}")
+
+    counts = Counter(index['status'] for index in report['indexes'])
+    print(f"{counts['used']} used, {counts['foreign key']} kept for foreign keys, "
+          f"{counts['serving']} serving dashboards, {counts['unused']} unused")
+    for proposal in report['proposals']:
+        print(f"Proposed {proposal['kind']} index on {proposal['table']} ({', '.join(proposal['columns'])}): "
+              f"{proposal['reason']}; for {', '.join(proposal['queries'])}")
+
+def main(argv: Optional[List[str]] = None):
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=Path, action='append', default=[],
+                        help='also explain the statements of this .sql file, e.g. dashboard queries (repeatable)')
+    parser.add_argument('--analyze', action='store_true',
+                        help='run ANALYZE TABLE first so the row estimates are current')
+    parser.add_argument('--output', type=Path, default=None, help='write the proposed indexes file here')
+    parser.add_argument('--write', action='store_true',
+                        help='replace the indexes file the ETL builds (sql/indexes.sql, or '
+                             'sql/indexes_dimensions.sql with dimension tables) with the proposal')
+    parser.add_argument('--report', type=Path, default=INDEX_REPORT_FILE)
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    db_manager = DatabaseManager(pool_size=1)
+    try:
+        db_manager.connect()
+        db_manager.use_database(SCHEMA_DATABASE)
+        catalog = SchemaCatalog(db_manager)
+        catalog.load()
+        if not catalog.tables.get('properties', {}).get('rows') and not args.analyze:
+            logger.warning("properties looks empty; plans of an empty database say little (try --analyze)")
+        if args.analyze:
+            catalog.analyze()
+            catalog = SchemaCatalog(db_manager)
+            catalog.load()
+
+        advisor = IndexAdvisor(db_manager, catalog)
+        report = advisor.run(collect_workload(db_manager, args.queries))
+        save_report(report, args.report)
+        print_report(report)
+
+        output = advisor.indexes_file() if args.write else args.output
+        if output:
+            output.write_text(proposed_indexes_sql(report, advisor.indexes_file()))
+            print(f"Proposed indexes written to {output}")
+    except Exception as e:
+        print(f"Index advice failed: {e}")
+        return 1
+    finally:
+        db_manager.disconnect()
+
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
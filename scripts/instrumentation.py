@@ -0,0 +1,470 @@
+"""
+Pipeline instrumentation
+Per-stage wall time, CPU time, row counts, memory growth and database round
+trips plus the run's peak memory, written as JSON and Prometheus text, plus
+opt-in stage profiling
+"""
+
+import cProfile
+import io
+import json
+import logging
+import pstats
+import resource
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILERS = ['cprofile', 'tracemalloc']
+
+# Lines of profiler output kept in the text dumps
+PROFILE_TOP = 40
+
+_db_local = threading.local()
+
+def db_counters() -> Dict[str, float]:
+    """Round trips and seconds spent in the database by the current thread"""
+    counters = getattr(_db_local, 'counters', None)
+    if counters is None:
+        counters = _db_local.counters = {'round_trips': 0, 'seconds': 0.0}
+    return counters
+
+def _record_db_call(seconds: float, round_trip: bool = True):
+    counters = db_counters()
+    if round_trip:
+        counters['round_trips'] += 1
+    counters['seconds'] += seconds
+
+class InstrumentedCursor:
+    """Cursor proxy that counts statements and times execute and fetch calls"""
+
+    def __init__(self, cursor: Any):
+        self._cursor = cursor
+
+    def execute(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(*args, **kwargs)
+        finally:
+            _record_db_call(time.perf_counter() - start)
+
+    def executemany(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(*args, **kwargs)
+        finally:
+            _record_db_call(time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return self._cursor.fetchall()
+        finally:
+            _record_db_call(time.perf_counter() - start, round_trip=False)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are instrumented and whose commits are counted"""
+
+    def __init__(self, connection: Any):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs) -> InstrumentedCursor:
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs))
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            self._connection.commit()
+        finally:
+            _record_db_call(time.perf_counter() - start)
+
+    def rollback(self):
+        start = time.perf_counter()
+        try:
+            self._connection.rollback()
+        finally:
+            _record_db_call(time.perf_counter() - start)
+
+    @property
+    def database(self) -> str:
+        return self._connection.database
+
+    @database.setter
+    def database(self, value: str):
+        # Issues USE on the server
+        start = time.perf_counter()
+        try:
+            self._connection.database = value
+        finally:
+            _record_db_call(time.perf_counter() - start)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of the process so far"""
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class MetricsRecorder:
+    """Accumulates per-stage measurements over a run
+
+    A stage may be entered many times (once per batch); its numbers add up.
+    A stage nested in another one is subtracted from it unless its name
+    starts with the outer stage's name and a dot: extract time spent while
+    the transform pulls records is not transform time, but load.properties
+    is part of load. CPU time is that of the thread running the stage, so
+    work done in worker processes is not included.
+
+    Stages entered in other threads (concurrent table loads) are recorded
+    on their own; their database calls are also added to whatever stage
+    the main thread is in.
+
+    Peak RSS is a process-wide high-water mark, so it is reported once for
+    the run; each stage gets rss_growth_bytes, how far it raised that mark.
+    Every rise is counted once, for the innermost stage open in the thread
+    that notices it, so the stages add up to at most the run's peak; with
+    stages running concurrently, the rise may be charged to a stage that
+    did not cause it.
+
+    The profiled stage is profiled in whichever thread runs it: cProfile
+    gets one profiler per thread, merged in the report, and tracemalloc
+    traces while any thread is in the stage.
+    """
+
+    def __init__(self, profile_stage: Optional[str] = None, profiler: str = 'cprofile'):
+        self.stages: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+            'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'rows_in': 0, 'rows_out': 0,
+            'db_round_trips': 0, 'db_seconds': 0.0, 'rss_growth_bytes': 0
+        })
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # Database calls made by stages running outside the main thread
+        self.thread_db = {'round_trips': 0, 'seconds': 0.0}
+        self.profile_stage = profile_stage
+        self.profiler = profiler
+        # cProfile profilers of the threads that ran the profiled stage
+        self.profiles: List[cProfile.Profile] = []
+        # Threads in the profiled stage, for tracemalloc, which traces the whole process
+        self.tracing = 0
+        self.tracemalloc_peak = 0
+        # Peak RSS already charged to a stage
+        self.rss_charged = peak_rss_bytes()
+        self.tracemalloc_snapshot = None
+        # Stall report of a pipelined run (pipeline.Pipeline.report)
+        self.pipeline: Optional[Dict[str, Any]] = None
+        # Per-file read stats of the input (sources.InputSource.report)
+        self.inputs: Optional[Dict[str, Any]] = None
+        # Memoized 'category' cleaners (field_mapping.FieldMapping.cache_report)
+        self.caches: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def frames(self) -> list:
+        """Stack of the stages open in the calling thread"""
+        frames = getattr(self.local, 'frames', None)
+        if frames is None:
+            frames = self.local.frames = []
+        return frames
+
+    def db_snapshot(self, main_thread: bool) -> tuple:
+        """(round trips, seconds) so far; the main thread also counts other threads' stages"""
+        counters = db_counters()
+        round_trips, seconds = counters['round_trips'], counters['seconds']
+        if main_thread:
+            with self.lock:
+                round_trips += self.thread_db['round_trips']
+                seconds += self.thread_db['seconds']
+        return round_trips, seconds
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int = 0, rows_out: int = 0) -> Iterator[Dict[str, int]]:
+        """Measure a block; the yielded dict's rows_in / rows_out may be updated inside it"""
+        main_thread = threading.current_thread() is threading.main_thread()
+        frames = self.frames()
+        frame = {'name': name, 'rows_in': rows_in, 'rows_out': rows_out,
+                 'child_wall': 0.0, 'child_cpu': 0.0, 'child_trips': 0, 'child_db': 0.0, 'rss_growth': 0}
+        # A rise before the stage starts belongs to the stage it is nested in
+        self.charge_rss_growth()
+        frames.append(frame)
+        profiling = name == self.profile_stage and self.start_profile()
+
+        db_start = self.db_snapshot(main_thread)
+        cpu_start = time.thread_time()
+        wall_start = time.perf_counter()
+        try:
+            yield frame
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            db_end = self.db_snapshot(main_thread)
+            trips, db_seconds = db_end[0] - db_start[0], db_end[1] - db_start[1]
+            self.charge_rss_growth()
+            if profiling:
+                self.stop_profile()
+            frames.pop()
+
+            parent = frames[-1] if frames else None
+            if parent and not name.startswith(parent['name'] + '.'):
+                parent['child_wall'] += wall
+                parent['child_cpu'] += cpu
+                parent['child_trips'] += trips
+                parent['child_db'] += db_seconds
+            elif not parent and not main_thread:
+                with self.lock:
+                    self.thread_db['round_trips'] += trips
+                    self.thread_db['seconds'] += db_seconds
+
+            self.add(name, wall - frame['child_wall'], cpu - frame['child_cpu'], frame['rows_in'], frame['rows_out'],
+                     trips - frame['child_trips'], db_seconds - frame['child_db'], frame['rss_growth'])
+
+    def iterate(self, name: str, iterable: Iterable[Any]) -> Iterator[Any]:
+        """Yield from iterable, recording the time spent producing each item as stage name
+
+        Totals are added to the stage when the iterator is exhausted or closed.
+        """
+        iterator = iter(iterable)
+        frames = self.frames()
+        wall_total = cpu_total = 0.0
+        rss_total = count = 0
+        try:
+            while True:
+                self.charge_rss_growth()
+                cpu_start = time.thread_time()
+                wall_start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    wall = time.perf_counter() - wall_start
+                    cpu = time.thread_time() - cpu_start
+                    rss_total += self.rss_growth()
+                    wall_total += wall
+                    cpu_total += cpu
+                    if frames:
+                        frames[-1]['child_wall'] += wall
+                        frames[-1]['child_cpu'] += cpu
+                count += 1
+                yield item
+        finally:
+            self.add(name, wall_total, cpu_total, 0, count, 0, 0.0, rss_total)
+
+    def rss_growth(self) -> int:
+        """How far the peak RSS rose since it was last charged, marking the rise as charged"""
+        peak = peak_rss_bytes()
+        with self.lock:
+            growth = max(0, peak - self.rss_charged)
+            self.rss_charged = max(peak, self.rss_charged)
+        return growth
+
+    def charge_rss_growth(self):
+        """Charge any rise of the peak RSS to the innermost stage open in the calling thread
+
+        A thread with no open stage leaves the rise to the next thread that has one.
+        """
+        frames = self.frames()
+        if frames:
+            frames[-1]['rss_growth'] += self.rss_growth()
+
+    def idle(self, seconds: float):
+        """Leave time the calling thread spent blocked (on a pipeline queue) out of its open stage"""
+        frames = self.frames()
+        if frames:
+            frames[-1]['child_wall'] += seconds
+
+    def add(self, name: str, wall: float, cpu: float, rows_in: int, rows_out: int,
+            db_round_trips: int, db_seconds: float, rss_growth: int = 0, calls: int = 1):
+        """Add one measurement to a stage's totals"""
+        with self.lock:
+            stage = self.stages[name]
+            stage['calls'] += calls
+            stage['wall_seconds'] += wall
+            stage['cpu_seconds'] += cpu
+            stage['rows_in'] += rows_in
+            stage['rows_out'] += rows_out
+            stage['db_round_trips'] += db_round_trips
+            stage['db_seconds'] += db_seconds
+            stage['rss_growth_bytes'] += rss_growth
+
+    def start_profile(self) -> bool:
+        """Start (or resume) the configured profiler for the calling thread; False if it cannot run"""
+        if self.profiler == 'cprofile':
+            profile = getattr(self.local, 'profile', None) or cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                # Python 3.12+ allows one active cProfile at a time
+                logger.warning(f"Not profiling stage '{self.profile_stage}' in {threading.current_thread().name}: {e}")
+                return False
+            if getattr(self.local, 'profile', None) is None:
+                self.local.profile = profile
+                with self.lock:
+                    self.profiles.append(profile)
+            return True
+        with self.lock:
+            self.tracing += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        return True
+
+    def stop_profile(self):
+        """Pause the calling thread's profiler at the end of the profiled stage"""
+        if self.profiler == 'cprofile':
+            self.local.profile.disable()
+            return
+        with self.lock:
+            self.tracing -= 1
+            if self.tracing:
+                return
+            # Keep the peak and the allocations still alive when the last thread leaves the stage
+            self.tracemalloc_peak = max(self.tracemalloc_peak, tracemalloc.get_traced_memory()[1])
+            self.tracemalloc_snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Stage totals with rows/sec added"""
+        summary = {}
+        for name, stage in self.stages.items():
+            rows = stage['rows_out'] or stage['rows_in']
+            summary[name] = dict(stage, wall_seconds=round(stage['wall_seconds'], 4),
+                                 cpu_seconds=round(stage['cpu_seconds'], 4), db_seconds=round(stage['db_seconds'], 4),
+                                 rows_per_sec=round(rows / stage['wall_seconds']) if stage['wall_seconds'] and rows else None)
+        return summary
+
+    def log_summary(self):
+        """One line per stage"""
+        for name, stage in self.summary().items():
+            logger.info(f"[metrics] {name}: {stage['wall_seconds']:.2f}s wall, {stage['cpu_seconds']:.2f}s cpu, "
+                        f"{stage['rows_in']} in / {stage['rows_out']} out, {stage['rows_per_sec']} rows/s, "
+                        f"{stage['db_round_trips']} db round trips ({stage['db_seconds']:.2f}s), "
+                        f"peak RSS +{stage['rss_growth_bytes'] / 2 ** 20:.0f} MB")
+        logger.info(f"[metrics] peak RSS of the run: {peak_rss_bytes() / 2 ** 20:.0f} MB")
+        for name, cache in (self.caches or {}).items():
+            logger.info(f"[metrics] cache {name}: {cache['hit_rate']:.1%} hits "
+                        f"({cache['hits']} hits, {cache['misses']} misses, {cache['entries']} entries)")
+
+    def prometheus(self) -> str:
+        """Stage totals in the Prometheus text exposition format"""
+        metrics = [
+            ('calls', 'etl_stage_calls', 'Times the stage was entered'),
+            ('wall_seconds', 'etl_stage_wall_seconds', 'Wall time spent in the stage'),
+            ('cpu_seconds', 'etl_stage_cpu_seconds', 'CPU time of the thread running the stage'),
+            ('rows_in', 'etl_stage_rows_in', 'Rows going into the stage'),
+            ('rows_out', 'etl_stage_rows_out', 'Rows coming out of the stage'),
+            ('rows_per_sec', 'etl_stage_rows_per_second', 'Rows per wall-clock second'),
+            ('db_round_trips', 'etl_stage_db_round_trips', 'Statements, commits and rollbacks sent to the database'),
+            ('db_seconds', 'etl_stage_db_seconds', 'Time spent waiting on the database'),
+            ('rss_growth_bytes', 'etl_stage_rss_growth_bytes', 'How far the stage raised the peak resident set size')
+        ]
+        summary = self.summary()
+        lines = []
+        for key, metric, help_text in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for name, stage in summary.items():
+                if stage[key] is not None:
+                    lines.append(f'{metric}{{stage="{name}"}} {stage[key]}')
+        lines.append("# HELP etl_peak_rss_bytes Peak resident set size of the run")
+        lines.append("# TYPE etl_peak_rss_bytes gauge")
+        lines.append(f"etl_peak_rss_bytes {peak_rss_bytes()}")
+
+        if self.pipeline:
+            stage_metrics = [
+                ('input_wait_seconds', 'etl_pipeline_input_wait_seconds', 'Time the stage waited for input'),
+                ('output_wait_seconds', 'etl_pipeline_output_wait_seconds', 'Time the stage was held back by a full queue')
+            ]
+            for key, metric, help_text in stage_metrics:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} gauge")
+                for name, stage in self.pipeline['stages'].items():
+                    lines.append(f'{metric}{{stage="{name}"}} {stage[key]}')
+            queue_metrics = [
+                ('mean_depth', 'etl_pipeline_queue_mean_depth', 'Mean items in the queue when one is taken'),
+                ('max_depth', 'etl_pipeline_queue_max_depth', 'Most items in the queue when one is taken'),
+                ('capacity', 'etl_pipeline_queue_capacity', 'Items the queue holds before blocking its producer')
+            ]
+            for key, metric, help_text in queue_metrics:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} gauge")
+                for name, stats in self.pipeline['queues'].items():
+                    lines.append(f'{metric}{{queue="{name}"}} {stats[key]}')
+
+        if self.caches:
+            cache_metrics = [
+                ('hits', 'etl_category_cache_hits', 'Values of the column cleaned from the cache'),
+                ('misses', 'etl_category_cache_misses', 'Values of the column cleaned and added to the cache'),
+                ('entries', 'etl_category_cache_entries', 'Distinct values held in the cache')
+            ]
+            for key, metric, help_text in cache_metrics:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} gauge")
+                for name, cache in self.caches.items():
+                    lines.append(f'{metric}{{column="{name}"}} {cache[key]}')
+
+        if self.inputs:
+            file_metrics = [
+                ('records', 'etl_input_file_records', 'Records read from the input file'),
+                ('bytes_read', 'etl_input_file_bytes_read', 'Bytes of the input file read from disk'),
+                ('read_seconds', 'etl_input_file_read_seconds', 'Time spent reading and decoding the input file')
+            ]
+            for key, metric, help_text in file_metrics:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} gauge")
+                for stats in self.inputs['files']:
+                    lines.append(f'{metric}{{file="{stats["path"]}"}} {stats[key]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, json_path: Path, prometheus_path: Path):
+        """Write the metrics as JSON and as Prometheus text"""
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(json_path, 'w', encoding='utf-8') as file:
+            document = {'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'peak_rss_bytes': peak_rss_bytes(),
+                        'stages': self.summary()}
+            if self.pipeline:
+                document['pipeline'] = self.pipeline
+            if self.inputs:
+                document['inputs'] = self.inputs
+            if self.caches:
+                document['caches'] = self.caches
+            json.dump(document, file, indent=2)
+        prometheus_path.write_text(self.prometheus(), encoding='utf-8')
+        logger.info(f"Metrics written to {json_path} and {prometheus_path}")
+
+    def write_profile(self, directory: Path) -> Optional[Path]:
+        """Dump the profile of the profiled stage, if any; returns the text report's path"""
+        if not self.profile_stage:
+            return None
+        if not self.profiles and self.tracemalloc_snapshot is None:
+            logger.warning(f"Stage '{self.profile_stage}' did not run in this process; no profile written")
+            return None
+
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = directory / f"profile_{self.profile_stage}_{time.strftime('%Y%m%d_%H%M%S')}"
+        report = io.StringIO()
+        if self.profiles:
+            stats = pstats.Stats(*self.profiles, stream=report)
+            stats.dump_stats(f"{stem}.prof")
+            if len(self.profiles) > 1:
+                report.write(f"Stage '{self.profile_stage}' profiled in {len(self.profiles)} threads\n")
+            stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+        else:
+            report.write(f"Peak traced memory: {self.tracemalloc_peak / 2 ** 20:.1f} MB\n")
+            report.write("Top allocations alive at the end of the stage:\n")
+            for stat in self.tracemalloc_snapshot.statistics('lineno')[:PROFILE_TOP]:
+                report.write(f"{stat}\n")
+
+        text_path = Path(f"{stem}.txt")
+        text_path.write_text(report.getvalue(), encoding='utf-8')
+        logger.info(f"Profile of stage '{self.profile_stage}' written to {text_path}")
+        return text_path
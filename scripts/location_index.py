@@ -0,0 +1,130 @@
+"""
+Location index
+Maps normalized addresses to location ids so that records at the same
+address share one property_locations row, within a run and across runs
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+def normalize_address(location: Dict[str, Any], coordinate_precision: Optional[int] = None) -> Optional[str]:
+    """Case-folded, whitespace-collapsed street|city|state|zip[|unit], or None without a street
+
+    The unit (address_line_2) is appended only when there is one, so
+    separate units at one street address stay apart while keys of addresses
+    without a unit, saved by earlier runs, still match. With
+    coordinate_precision set, latitude and longitude rounded to that many
+    decimals are appended, so identical street strings at different
+    coordinates stay apart.
+    """
+    if not location.get('address_line_1'):
+        return None
+    parts = [location.get(field) for field in ('address_line_1', 'city', 'state', 'zip_code')]
+    key = '|'.join(' '.join(str(part).casefold().split()) if part else '' for part in parts)
+    unit = ' '.join(str(location.get('address_line_2') or '').casefold().split())
+    if unit:
+        key += '|' + unit
+
+    if coordinate_precision is not None:
+        coordinates = [location.get('latitude'), location.get('longitude')]
+        key += '|' + '|'.join('' if value is None else f"{value:.{coordinate_precision}f}" for value in coordinates)
+    return key
+
+class LocationIndex:
+    """In-memory normalized address -> location_id index
+
+    The index can be saved to and reloaded from a JSON file, so a location
+    keeps its id from one run to the next. Each run emits the row of a
+    location the first time it sees it, which keeps the row present after a
+    full reload even if the id came from an earlier run.
+    """
+
+    def __init__(self, key_strategy: str, coordinate_precision: Optional[int] = None):
+        self.key_strategy = key_strategy
+        self.coordinate_precision = coordinate_precision
+        self.locations: Dict[str, Any] = {}
+        self.emitted: Set[Any] = set()
+        self.hits = 0
+        self.misses = 0
+        # Additions since the last take_changes(), for the run checkpoint
+        self.added: Dict[str, Any] = {}
+        self.newly_emitted: List[Any] = []
+
+    def resolve(self, location: Dict[str, Any]) -> Tuple[Any, bool]:
+        """Return (location_id, emit) for a transformed location row
+
+        emit is False when a row with that id was already produced in this run.
+        """
+        key = normalize_address(location, self.coordinate_precision)
+        if key is None:
+            # Nothing to match on; every such record keeps its own location
+            self.misses += 1
+            return location.location_id, True
+
+        location_id = self.locations.get(key)
+        if location_id is None:
+            location_id = self.locations[key] = self.added[key] = location.location_id
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        emit = location_id not in self.emitted
+        if emit:
+            self.emitted.add(location_id)
+            self.newly_emitted.append(location_id)
+        return location_id, emit
+
+    def take_changes(self) -> Dict[str, Any]:
+        """Addresses added and ids emitted since the last call, in a JSON-ready form
+
+        Recorded with each committed batch so a resumed run can rebuild the
+        index as it stood after that batch.
+        """
+        binary = any(isinstance(value, bytes) for value in self.newly_emitted)
+        changes = {
+            'binary': binary,
+            'locations': {key: value.hex() if binary else value for key, value in self.added.items()},
+            'emitted': [value.hex() if binary else value for value in self.newly_emitted]
+        }
+        self.added = {}
+        self.newly_emitted = []
+        return changes
+
+    def apply_changes(self, changes: Dict[str, Any]):
+        """Replay changes returned by take_changes"""
+        decode = bytes.fromhex if changes['binary'] else (lambda value: value)
+        self.locations.update((key, decode(value)) for key, value in changes['locations'].items())
+        self.emitted.update(decode(value) for value in changes['emitted'])
+
+    def load(self, path: Path):
+        """Load a previously saved index; ignored if it was built with another key strategy"""
+        with open(path, 'r', encoding='utf-8') as file:
+            saved = json.load(file)
+
+        if saved.get('key_strategy') != self.key_strategy or saved.get('coordinate_precision') != self.coordinate_precision:
+            logger.warning(f"Ignoring location index {path}: built with different key settings")
+            return
+
+        binary = saved.get('binary', False)
+        self.locations = {key: bytes.fromhex(value) if binary else value for key, value in saved['locations'].items()}
+        logger.info(f"Loaded {len(self.locations)} locations from index {path}")
+
+    def save(self, path: Path):
+        """Write the index to path atomically"""
+        binary = any(isinstance(value, bytes) for value in self.locations.values())
+        saved = {
+            'key_strategy': self.key_strategy,
+            'coordinate_precision': self.coordinate_precision,
+            'binary': binary,
+            'locations': {key: value.hex() if binary else value for key, value in self.locations.items()}
+        }
+
+        temp_path = Path(f"{path}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(saved, file)
+        temp_path.replace(path)
+        logger.info(f"Saved {len(self.locations)} locations to index {path}")
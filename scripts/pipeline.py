@@ -0,0 +1,202 @@
+"""
+Pipelined stage execution
+Runs the stages of a chunked ETL run on their own threads, connected by
+bounded queues, so that extracting, transforming and loading overlap. A
+full queue blocks its producer (backpressure), which caps memory at the
+queue sizes; the time each stage spends blocked shows the bottleneck.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Any, Callable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# How often a blocked stage checks whether the pipeline is shutting down
+POLL_SECONDS = 0.1
+
+# Marks the end of a queue's items
+_END = object()
+
+class PipelineStopped(Exception):
+    """Raised in a stage that is blocked on a queue when another stage failed"""
+
+class StageQueue:
+    """Bounded queue between two stages that records how long each side waited
+
+    Depth is sampled whenever an item is taken: a queue that is usually
+    empty starves its consumer, one that is usually full holds back its
+    producer.
+    """
+
+    def __init__(self, name: str, maxsize: int, pipeline: 'Pipeline'):
+        self.name = name
+        self.maxsize = maxsize
+        self.queue = queue.Queue(maxsize)
+        self.pipeline = pipeline
+        self.items = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self.put_wait = 0.0
+        self.get_wait = 0.0
+
+    def put(self, item: Any):
+        """Add an item, blocking while the queue is full"""
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    self.queue.put(item, timeout=POLL_SECONDS)
+                    return
+                except queue.Full:
+                    if self.pipeline.stopping.is_set():
+                        raise PipelineStopped(self.name)
+        finally:
+            self.put_wait += time.perf_counter() - start
+
+    def close(self):
+        """Tell the consumer no more items are coming"""
+        self.put(_END)
+
+    def get(self) -> Any:
+        """Take the next item, blocking while the queue is empty"""
+        start = time.perf_counter()
+        try:
+            depth = self.queue.qsize()
+            while True:
+                try:
+                    item = self.queue.get(timeout=POLL_SECONDS)
+                    break
+                except queue.Empty:
+                    if self.pipeline.stopping.is_set():
+                        raise PipelineStopped(self.name)
+        finally:
+            waited = time.perf_counter() - start
+            self.get_wait += waited
+            # Waiting for input is not work of the stage being measured
+            self.pipeline.metrics.idle(waited)
+
+        if item is not _END:
+            self.items += 1
+            self.depth_total += depth
+            self.max_depth = max(self.max_depth, depth)
+        return item
+
+    def __iter__(self) -> Iterator[Any]:
+        while True:
+            item = self.get()
+            if item is _END:
+                return
+            yield item
+
+    def stats(self) -> Dict[str, Any]:
+        """Depth and wait times of the queue so far"""
+        return {
+            'capacity': self.maxsize,
+            'items': self.items,
+            'mean_depth': round(self.depth_total / self.items, 2) if self.items else 0,
+            'max_depth': self.max_depth,
+            'producer_wait_seconds': round(self.put_wait, 4),
+            'consumer_wait_seconds': round(self.get_wait, 4)
+        }
+
+class Pipeline:
+    """Stage threads connected by StageQueues, shut down together
+
+    Used as a context manager. Stages started with start() run on their own
+    threads; the last stage consumes its queue in the calling thread. When
+    any stage fails, the others stop at their next queue operation, every
+    thread is joined, and the first failure is raised in the calling thread.
+    """
+
+    def __init__(self, metrics: Any, queue_size: int):
+        self.metrics = metrics
+        self.queue_size = queue_size
+        self.queues: List[StageQueue] = []
+        self.stages: List[Dict[str, Any]] = []
+        self.threads: List[threading.Thread] = []
+        self.stopping = threading.Event()
+        self.error: Optional[BaseException] = None
+        self.lock = threading.Lock()
+
+    def queue(self, name: str) -> StageQueue:
+        """A new bounded queue between two stages"""
+        stage_queue = StageQueue(name, self.queue_size, self)
+        self.queues.append(stage_queue)
+        return stage_queue
+
+    def start(self, name: str, target: Callable[[], None], inputs: Optional[StageQueue] = None,
+              outputs: Optional[StageQueue] = None):
+        """Run target on its own thread; it must close outputs when it is done"""
+        def run():
+            try:
+                target()
+            except PipelineStopped:
+                pass
+            except BaseException as e:
+                logger.error(f"Pipeline stage {name} failed: {e}")
+                self.fail(e)
+
+        self.stages.append({'name': name, 'inputs': inputs, 'outputs': outputs})
+        thread = threading.Thread(target=run, name=f"etl-{name}", daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def consume(self, name: str, inputs: StageQueue) -> Iterator[Any]:
+        """Items of the last queue, for the stage running in the calling thread"""
+        self.stages.append({'name': name, 'inputs': inputs, 'outputs': None})
+        return iter(inputs)
+
+    def fail(self, error: BaseException):
+        """Record the first failure and stop every stage"""
+        with self.lock:
+            if self.error is None:
+                self.error = error
+        self.stopping.set()
+
+    def __enter__(self) -> 'Pipeline':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        if exc is not None and not isinstance(exc, PipelineStopped):
+            self.fail(exc)
+        # Releases producers still blocked on a queue nobody reads any more
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join()
+        self.log_report()
+
+        if self.error is not None and self.error is not exc:
+            raise self.error
+        return False
+
+    def report(self) -> Dict[str, Any]:
+        """Per stage: time blocked on input (starved) and on output (held back), plus queue stats"""
+        stages = {}
+        for stage in self.stages:
+            stages[stage['name']] = {
+                'input_wait_seconds': round(stage['inputs'].get_wait, 4) if stage['inputs'] else 0.0,
+                'output_wait_seconds': round(stage['outputs'].put_wait, 4) if stage['outputs'] else 0.0
+            }
+        # The busiest stage is the one that waited least on its neighbours
+        bottleneck = min(stages, key=lambda name: sum(stages[name].values())) if stages else None
+        return {
+            'stages': stages,
+            'queues': {stage_queue.name: stage_queue.stats() for stage_queue in self.queues},
+            'bottleneck': bottleneck
+        }
+
+    def log_report(self):
+        """Log and record the stall report"""
+        report = self.report()
+        for name, stage in report['stages'].items():
+            logger.info(f"[pipeline] {name}: {stage['input_wait_seconds']:.2f}s waiting for input, "
+                        f"{stage['output_wait_seconds']:.2f}s held back by a full queue")
+        for name, stats in report['queues'].items():
+            logger.info(f"[pipeline] queue {name}: {stats['items']} items, mean depth {stats['mean_depth']} "
+                        f"of {stats['capacity']}, max {stats['max_depth']}")
+        if report['bottleneck']:
+            logger.info(f"[pipeline] bottleneck: {report['bottleneck']}")
+        self.metrics.pipeline = report
@@ -0,0 +1,215 @@
+"""
+Inline data-quality metrics
+Counts rule violations, nulls and value distributions on transformed rows
+while the pipeline runs, so no table has to be scanned after loading
+"""
+
+import logging
+import math
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from config import TABLES
+from validation_rules import VALIDATION_RULES
+
+logger = logging.getLogger(__name__)
+
+# Violation samples kept per JSON Schema error location
+MAX_SCHEMA_SAMPLES = 3
+
+# JSON Schemas of the transformed rows, derived from the column types in
+# sql/schema.sql. Key and date columns are not listed: they may be bytes or
+# date objects, which JSON Schema cannot describe.
+ROW_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    'locations': {
+        'type': 'object',
+        'properties': {
+            'address_line_1': {'type': ['string', 'null'], 'maxLength': 255},
+            'address_line_2': {'type': ['string', 'null'], 'maxLength': 255},
+            'city': {'type': ['string', 'null'], 'maxLength': 100},
+            'state': {'type': ['string', 'null'], 'maxLength': 50},
+            'zip_code': {'type': ['string', 'null'], 'maxLength': 20},
+            'county': {'type': ['string', 'null'], 'maxLength': 100},
+            'latitude': {'type': ['number', 'null'], 'minimum': -90, 'maximum': 90},
+            'longitude': {'type': ['number', 'null'], 'minimum': -180, 'maximum': 180}
+        }
+    },
+    'properties': {
+        'type': 'object',
+        'properties': {
+            'property_type': {'type': ['string', 'null'], 'maxLength': 50},
+            'bedrooms': {'type': ['integer', 'null'], 'minimum': 0},
+            'bathrooms': {'type': ['number', 'null'], 'minimum': 0, 'maximum': 99.9},
+            'square_footage': {'type': ['integer', 'null']},
+            'lot_size': {'type': ['number', 'null'], 'maximum': 99999999.99},
+            'year_built': {'type': ['integer', 'null']},
+            'garage_spaces': {'type': ['integer', 'null'], 'minimum': 0},
+            'pool': {'type': 'boolean'},
+            'fireplace': {'type': 'boolean'},
+            'basement': {'type': 'boolean'},
+            'property_condition': {'type': ['string', 'null'], 'maxLength': 50},
+            'listing_status': {'type': ['string', 'null'], 'maxLength': 50},
+            'mls_number': {'type': ['string', 'null'], 'maxLength': 50}
+        }
+    },
+    'hoa_details': {
+        'type': 'object',
+        'properties': {
+            'hoa_name': {'type': ['string', 'null'], 'maxLength': 255},
+            'monthly_fee': {'type': ['number', 'null'], 'minimum': 0, 'maximum': 99999999.99},
+            'annual_fee': {'type': ['number', 'null'], 'minimum': 0, 'maximum': 99999999.99}
+        }
+    },
+    'valuations': {
+        'type': 'object',
+        'properties': {
+            'valuation_type': {'type': 'string'},
+            'valuation_amount': {'type': ['number', 'null'], 'maximum': 9999999999999.99},
+            'valuation_source': {'type': ['string', 'null'], 'maxLength': 100},
+            'confidence_level': {'type': ['string', 'null'], 'maxLength': 20}
+        }
+    },
+    'rehab_estimates': {
+        'type': 'object',
+        'properties': {
+            'estimate_type': {'type': 'string'},
+            'estimated_cost': {'type': ['number', 'null'], 'maximum': 9999999999999.99},
+            'contractor_name': {'type': ['string', 'null'], 'maxLength': 255},
+            'timeline_weeks': {'type': ['integer', 'null'], 'minimum': 0}
+        }
+    }
+}
+
+def magnitude_bucket(value: float) -> str:
+    """Power-of-ten histogram bucket of a number: '<0', '0', '[1,10)', '[10,100)', ..."""
+    if value != value:
+        return 'nan'
+    if value < 0:
+        return '<0'
+    if value < 1:
+        return '0' if value == 0 else '(0,1)'
+    if value == math.inf:
+        return 'inf'
+    exponent = int(math.log10(value))
+    return f"[{10 ** exponent},{10 ** (exponent + 1)})"
+
+class QualityCollector:
+    """Accumulates quality counters over the transformed batches of a run
+
+    Rules come from validation_rules.VALIDATION_RULES; every rule with a
+    Python `check` is evaluated on the rows of its table. Per field it keeps
+    the null count and, for numeric fields, a power-of-ten histogram. With
+    json_schema enabled each row is also validated against ROW_SCHEMAS.
+    """
+
+    def __init__(self, json_schema: bool = False, rules: Optional[List[Dict[str, Any]]] = None):
+        rules = VALIDATION_RULES if rules is None else rules
+        # Transformed data is keyed by table key; rules by SQL table name
+        table_keys = {TABLES.get(table_key, table_key): table_key for table_key in ROW_SCHEMAS}
+        self.rules: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for rule in rules:
+            if rule.get('check'):
+                self.rules[table_keys.get(rule['table'], rule['table'])].append(rule)
+
+        self.validators = {}
+        if json_schema:
+            from jsonschema import Draft7Validator
+            self.validators = {table_key: Draft7Validator(schema) for table_key, schema in ROW_SCHEMAS.items()}
+
+        self.rows: Counter = Counter()
+        self.rule_counts: Counter = Counter()
+        self.nulls: Dict[str, Counter] = defaultdict(Counter)
+        self.histograms: Dict[str, Dict[str, Counter]] = defaultdict(lambda: defaultdict(Counter))
+        self.schema_errors: Dict[str, Counter] = defaultdict(Counter)
+        self.schema_samples: Dict[str, Dict[str, List[str]]] = defaultdict(lambda: defaultdict(list))
+
+    def observe(self, transformed_data: Dict[str, List[Dict[str, Any]]]):
+        """Add one batch of transformed tables to the counters"""
+        for table_key, rows in transformed_data.items():
+            if not rows:
+                continue
+            self.rows[table_key] += len(rows)
+            rules = self.rules.get(table_key, [])
+            nulls = self.nulls[table_key]
+            histograms = self.histograms[table_key]
+            validator = self.validators.get(table_key)
+
+            for row in rows:
+                for rule in rules:
+                    if rule['check'](row):
+                        self.rule_counts[rule['name']] += 1
+                for field, value in zip(row._fields, row):
+                    if value is None:
+                        nulls[field] += 1
+                    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                        histograms[field][magnitude_bucket(value)] += 1
+                if validator:
+                    self.check_schema(table_key, validator, row)
+
+    def check_schema(self, table_key: str, validator: Any, row: Dict[str, Any]):
+        """Count JSON Schema violations of one row by field and keep a few samples"""
+        for error in validator.iter_errors(row._asdict()):
+            location = '.'.join(str(part) for part in error.absolute_path) or '<row>'
+            self.schema_errors[table_key][location] += 1
+            samples = self.schema_samples[table_key][location]
+            if len(samples) < MAX_SCHEMA_SAMPLES:
+                samples.append(error.message)
+
+    def report(self) -> Dict[str, Any]:
+        """Structured report of everything observed so far"""
+        checks = [
+            {
+                'name': rule['name'],
+                'category': rule['category'],
+                'table': rule['table'],
+                'count': self.rule_counts[rule['name']],
+                'status': 'ok' if self.rule_counts[rule['name']] == 0 else 'warning'
+            }
+            for rules in self.rules.values() for rule in rules
+        ]
+        report = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'rows': dict(self.rows),
+            'checks': checks,
+            'warnings': sum(1 for check in checks if check['status'] != 'ok'),
+            'nulls': {table_key: dict(counts) for table_key, counts in self.nulls.items()},
+            'histograms': {
+                table_key: {field: dict(buckets) for field, buckets in fields.items()}
+                for table_key, fields in self.histograms.items()
+            }
+        }
+        if self.validators:
+            report['json_schema'] = {
+                table_key: {
+                    location: {'count': count, 'samples': self.schema_samples[table_key][location]}
+                    for location, count in errors.items()
+                }
+                for table_key, errors in self.schema_errors.items()
+            }
+        return report
+
+    def log_summary(self):
+        """Log rule counts that are not zero and the JSON Schema violation total"""
+        for rules in self.rules.values():
+            for rule in rules:
+                count = self.rule_counts[rule['name']]
+                if count:
+                    logger.warning(f"{rule['name']}: {count} rows")
+        if self.validators:
+            total = sum(sum(errors.values()) for errors in self.schema_errors.values())
+            logger.info(f"JSON Schema: {total} violations")
+
+    def compare(self, sql_report: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Rules whose post-load SQL count differs from the inline count
+
+        Counts only agree when this run loaded the whole table; after an
+        incremental run the SQL counts include rows from earlier runs.
+        """
+        inline = {check['name']: check['count'] for check in self.report()['checks']}
+        return [
+            {'name': check['name'], 'inline': inline[check['name']], 'sql': check['count']}
+            for check in sql_report['checks']
+            if check['name'] in inline and inline[check['name']] != check['count']
+        ]
+
@@ -0,0 +1,67 @@
+"""
+Fixed row schemas
+One tuple type per table, with the table's insert columns in a fixed order
+and missing values held as explicit NULLs. Rows are built by the transform
+and written by the loaders as they are, so every batch of a table shares
+one column list and no per-row dicts are created along the way.
+"""
+
+from collections import namedtuple
+from typing import Dict, Any, Iterable, List, Tuple
+
+from config import *
+
+# Insert columns of each table, in the order they are sent to MySQL
+ROW_COLUMNS: Dict[str, List[str]] = {
+    'locations': ['location_id', *FIELD_MAPPINGS['locations']],
+    'properties': ['property_id', 'location_id', *FIELD_MAPPINGS['properties']],
+    'hoa_details': ['hoa_id', 'property_id', *FIELD_MAPPINGS['hoa_details']],
+    'valuations': ['valuation_id', 'property_id', 'valuation_type', 'valuation_amount', 'valuation_date',
+                   'valuation_source', 'confidence_level', 'notes'],
+    'rehab_estimates': ['estimate_id', 'property_id', 'estimate_type', 'estimated_cost', 'estimate_date',
+                        'contractor_name', 'work_description', 'timeline_weeks', 'materials_cost', 'labor_cost',
+                        'permit_cost', 'contingency_percentage', 'status']
+}
+
+class RowAccess:
+    """Read access by column name, so a row also works where a dict row was expected
+
+    row['city'], row.get('city') and row.items() behave as on a dict;
+    row.city is the faster spelling. Rows are immutable: use
+    row._replace(city=...) for a changed copy.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, str):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._fields
+
+    def items(self) -> Iterable[Tuple[str, Any]]:
+        return zip(self._fields, self)
+
+def _row_type(table_key: str, columns: List[str]) -> type:
+    """Named tuple type of one table, defined in this module so rows pickle across processes"""
+    name = ''.join(part.title() for part in table_key.split('_')) + 'Row'
+    row_type = type(name, (RowAccess, namedtuple(f"{name}Base", columns)), {'__slots__': ()})
+    row_type.__module__ = __name__
+    return row_type
+
+ROW_TYPES: Dict[str, type] = {table_key: _row_type(table_key, columns) for table_key, columns in ROW_COLUMNS.items()}
+
+# Module attributes, which is where pickle looks the types up
+LocationsRow = ROW_TYPES['locations']
+PropertiesRow = ROW_TYPES['properties']
+HoaDetailsRow = ROW_TYPES['hoa_details']
+ValuationsRow = ROW_TYPES['valuations']
+RehabEstimatesRow = ROW_TYPES['rehab_estimates']
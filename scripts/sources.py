@@ -0,0 +1,322 @@
+"""
+Input sources
+Resolves the input of a run (one file, a directory of shards, a glob or a
+manifest listing files) and streams its records, decompressing gzip, bz2,
+xz and zstd files on the fly without temporary files. Several files are
+read at once on reader threads; records still come out in file order, so
+batch numbers and checkpoint offsets do not depend on which reader is
+fastest.
+"""
+
+import bz2
+import glob
+import gzip
+import io
+import logging
+import lzma
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Any, BinaryIO, Callable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from config import *
+from utils import DataProcessor
+
+logger = logging.getLogger(__name__)
+
+# File suffix -> compression; zstd needs the zstandard package
+COMPRESSIONS = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+    '.zst': 'zstd'
+}
+
+# Files picked up from a directory (each optionally compressed)
+INPUT_SUFFIXES = ['.json', '.ndjson', '.jsonl']
+
+# A source with one of these suffixes lists the input files, one path per line
+MANIFEST_SUFFIXES = ['.txt', '.lst', '.manifest']
+
+# Records a reader thread hands over at a time, and chunks it reads ahead per file
+READ_CHUNK_RECORDS = 500
+READ_AHEAD_CHUNKS = 4
+
+# Marks the end of a file's chunks
+_END = object()
+
+class ReadStopped(Exception):
+    """Raised in a reader thread when the records are no longer wanted"""
+
+def _zstandard():
+    """Import zstandard, failing with an actionable message when it is missing"""
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("Reading .zst input needs zstandard (pip install zstandard)") from e
+    return zstandard
+
+def compression_of(path: Path) -> Optional[str]:
+    """Compression of a file, from its suffix; None when it is plain text"""
+    return COMPRESSIONS.get(path.suffix.lower())
+
+def is_input_file(path: Path) -> bool:
+    """Whether a directory entry is a JSON or NDJSON file, compressed or not"""
+    name = path.name.lower()
+    for suffix in COMPRESSIONS:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return path.is_file() and any(name.endswith(suffix) for suffix in INPUT_SUFFIXES)
+
+@contextmanager
+def open_input(path: Path) -> Iterator[Tuple[TextIO, BinaryIO]]:
+    """(decompressed text stream, raw file) of an input file
+
+    The raw file's position is how many bytes of the file on disk have
+    been read so far, compressed or not.
+    """
+    compression = compression_of(path)
+    with open(path, 'rb') as raw:
+        if compression == 'gzip':
+            binary = gzip.GzipFile(fileobj=raw, mode='rb')
+        elif compression == 'bz2':
+            binary = bz2.BZ2File(raw, mode='rb')
+        elif compression == 'xz':
+            binary = lzma.LZMAFile(raw, mode='rb')
+        elif compression == 'zstd':
+            # Concatenated shards and pzstd output hold several frames; read them all
+            binary = io.BufferedReader(_zstandard().ZstdDecompressor().stream_reader(raw, read_across_frames=True))
+        else:
+            binary = raw
+        with io.TextIOWrapper(binary, encoding='utf-8') as text:
+            yield text, raw
+
+class InputSource:
+    """The input files of a run and their records
+
+    source is a JSON or NDJSON file, a directory (every .json, .ndjson and
+    .jsonl file in it, optionally compressed), a glob such as
+    'drops/2024-06-*/*.ndjson.gz', or a manifest (.txt, .lst, .manifest)
+    with one path per line, relative to the manifest; blank lines and
+    lines starting with # are ignored. Files are read in name order
+    (manifest order for a manifest).
+
+    Per file, stats records where its records start in the stream, how
+    many it has, and how many bytes of it have been read.
+    """
+
+    def __init__(self, source: Union[str, Path] = INPUT_SOURCE, readers: Optional[int] = None,
+                 chunk_size: Optional[int] = None):
+        self.source = str(source)
+        self.readers = max(1, readers or ETL_CONFIG['read_workers'])
+        self.chunk_size = chunk_size or ETL_CONFIG['read_chunk_size']
+        self._files: Optional[List[Path]] = None
+        self.stats: List[Dict[str, Any]] = []
+        # Called with a file's stats once all of its records have been taken
+        self.on_file: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    @property
+    def files(self) -> List[Path]:
+        """The input files, resolved on first use"""
+        if self._files is None:
+            self._files = self.resolve()
+            self.stats = [{
+                'path': str(path),
+                'compression': compression_of(path),
+                'bytes': path.stat().st_size,
+                'first_record': None,
+                'records': 0,
+                'bytes_read': 0,
+                'read_seconds': 0.0,
+                'done': False
+            } for path in self._files]
+        return self._files
+
+    def resolve(self) -> List[Path]:
+        """Expand the source into its list of files; raises if it matches none"""
+        path = Path(self.source)
+        if glob.has_magic(self.source):
+            files = [Path(name) for name in sorted(glob.glob(self.source, recursive=True))]
+            files = [file for file in files if file.is_file()]
+        elif path.is_dir():
+            files = sorted(file for file in path.iterdir() if is_input_file(file))
+        elif path.suffix.lower() in MANIFEST_SUFFIXES and path.is_file():
+            files = self.read_manifest(path)
+        elif path.is_file():
+            files = [path]
+        else:
+            raise FileNotFoundError(f"Input not found: {self.source}")
+
+        if not files:
+            raise FileNotFoundError(f"No input files in {self.source}")
+        return files
+
+    @staticmethod
+    def read_manifest(path: Path) -> List[Path]:
+        """Files listed in a manifest, relative to its directory"""
+        files = []
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                listed = Path(line) if Path(line).is_absolute() else path.parent / line
+                if not listed.is_file():
+                    raise FileNotFoundError(f"Input file {listed} listed in {path} not found")
+                files.append(listed)
+        return files
+
+    def fingerprint(self) -> Dict[str, Any]:
+        """Identity of the input: the source and the name, size and mtime of every file"""
+        return {
+            'input': self.source,
+            'input_files': [[str(path), path.stat().st_size, path.stat().st_mtime_ns] for path in self.files]
+        }
+
+    def records(self, skip: int = 0, known_records: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+        """Records of every file in order, after the first skip of them
+
+        Leading files whose record counts are in known_records (from an
+        earlier read of the same files) and that lie entirely within skip
+        are not opened at all.
+        """
+        files = self.files
+        known_records = known_records or {}
+        first, offset = 0, 0
+        while first < len(files):
+            count = known_records.get(str(files[first]))
+            if count is None or offset + count > skip:
+                break
+            offset += count
+            first += 1
+        if first:
+            logger.info(f"Skipping {first} input files ({offset} records) without reading them")
+
+        indexes = list(range(first, len(files)))
+        readers = min(self.readers, len(indexes))
+        logger.info(f"Reading {len(indexes)} input files from {self.source} with {readers} readers")
+        chunks = self.read_parallel(indexes, readers) if readers > 1 else self.read_serial(indexes)
+        records = self.count(chunks, offset)
+        return islice(records, skip - offset, None)
+
+    def count(self, chunks: Iterator[Tuple[int, Optional[List[Dict[str, Any]]]]], offset: int) -> Iterator[Dict[str, Any]]:
+        """Flatten (file index, chunk) pairs, recording where each file starts and finishes
+
+        A None chunk ends its file, so files without records are finished too.
+        """
+        current = None
+        for index, chunk in chunks:
+            if index != current:
+                current = index
+                self.stats[index]['first_record'] = offset
+            if chunk is None:
+                self.file_done(index)
+                continue
+            offset += len(chunk)
+            yield from chunk
+
+    def file_done(self, index: int):
+        """Every record of a file has been taken"""
+        stats = self.stats[index]
+        stats['done'] = True
+        logger.info(f"Read {stats['records']} records from {stats['path']} "
+                    f"({stats['bytes_read'] / 2 ** 20:.1f} MB{', ' + stats['compression'] if stats['compression'] else ''}) "
+                    f"in {stats['read_seconds']:.2f}s")
+        if self.on_file:
+            self.on_file(stats)
+
+    def read_file(self, index: int) -> Iterator[List[Dict[str, Any]]]:
+        """Records of one file in chunks of READ_CHUNK_RECORDS, updating its stats"""
+        path = self.files[index]
+        stats = self.stats[index]
+        try:
+            with open_input(path) as (text, raw):
+                records = DataProcessor.iter_json(text, self.chunk_size, name=str(path))
+                while True:
+                    start = time.perf_counter()
+                    chunk = list(islice(records, READ_CHUNK_RECORDS))
+                    stats['read_seconds'] += time.perf_counter() - start
+                    if not chunk:
+                        return
+                    stats['records'] += len(chunk)
+                    stats['bytes_read'] = raw.tell()
+                    yield chunk
+        except ReadStopped:
+            raise
+        except Exception as e:
+            logger.error(f"Error reading input file {path}: {e}")
+            raise
+
+    def read_serial(self, indexes: List[int]) -> Iterator[Tuple[int, Optional[List[Dict[str, Any]]]]]:
+        """Chunks of the files one after another, in the calling thread, each file ended by None"""
+        for index in indexes:
+            for chunk in self.read_file(index):
+                yield index, chunk
+            yield index, None
+
+    def read_parallel(self, indexes: List[int], readers: int) -> Iterator[Tuple[int, Optional[List[Dict[str, Any]]]]]:
+        """Chunks of the files in order, read ahead by readers threads, each file ended by None
+
+        Each file has its own bounded queue. Files are handed to the threads
+        in order, so the file being consumed is always being read; the
+        others read at most READ_AHEAD_CHUNKS chunks ahead. Decompression
+        and file reads release the GIL and overlap with the rest of the run.
+        """
+        stop = threading.Event()
+        queues = {index: queue.Queue(READ_AHEAD_CHUNKS) for index in indexes}
+
+        def put(chunks: queue.Queue, item: Any):
+            while True:
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    if stop.is_set():
+                        raise ReadStopped()
+
+        def read(index: int):
+            if stop.is_set():
+                return
+            try:
+                for chunk in self.read_file(index):
+                    put(queues[index], chunk)
+                put(queues[index], _END)
+            except ReadStopped:
+                pass
+            except BaseException as e:
+                try:
+                    put(queues[index], e)
+                except ReadStopped:
+                    pass
+
+        with ThreadPoolExecutor(readers, thread_name_prefix='etl-read') as pool:
+            try:
+                for index in indexes:
+                    pool.submit(read, index)
+                for index in indexes:
+                    while True:
+                        item = queues[index].get()
+                        if item is _END:
+                            yield index, None
+                            break
+                        if isinstance(item, BaseException):
+                            raise item
+                        yield index, item
+            finally:
+                # Readers still running give up at their next full queue
+                stop.set()
+
+    def report(self) -> Dict[str, Any]:
+        """Per-file stats and totals of what has been read"""
+        return {
+            'source': self.source,
+            'readers': self.readers,
+            'files': [dict(stats, read_seconds=round(stats['read_seconds'], 4)) for stats in self.stats],
+            'records': sum(stats['records'] for stats in self.stats),
+            'bytes_read': sum(stats['bytes_read'] for stats in self.stats)
+        }
@@ -0,0 +1,176 @@
+"""
+Columnar staging
+Writes the transformed tables to Arrow IPC or Parquet files, one file per
+table and batch, so a load can be replayed (or pointed at another
+environment) without extracting and transforming the input again. Needs
+pyarrow, which is imported only when staging is used.
+"""
+
+import json
+import logging
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Optional, Tuple
+
+from config import *
+from rows import ROW_TYPES
+
+if TYPE_CHECKING:
+    from quality_metrics import QualityCollector
+
+logger = logging.getLogger(__name__)
+
+STAGING_FORMATS = {
+    'arrow': '.arrow',  # Arrow IPC file, read back zero-copy from a memory map
+    'parquet': '.parquet'  # compressed, smaller on disk, decoded when read
+}
+
+MANIFEST_NAME = 'staging.json'
+
+# Bump when the file layout changes
+STAGING_VERSION = 1
+
+def _pyarrow():
+    """Import pyarrow, failing with an actionable message when it is missing"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Columnar staging needs pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+class StagingWriter:
+    """Writes transformed batches to a staging directory
+
+    Each table of a batch becomes <table_key>/part-<batch>.<format>, in
+    the table's row column order, with the column types inferred from the
+    values. staging.json is written last,
+    by finish(), so an interrupted write never looks like a complete one.
+    """
+
+    def __init__(self, directory: Path = STAGING_DIR, staging_format: str = 'arrow'):
+        if staging_format not in STAGING_FORMATS:
+            raise ValueError(f"Unknown staging format: {staging_format}")
+        self.pa = _pyarrow()
+        self.directory = Path(directory)
+        self.format = staging_format
+        self.batches: List[Dict[str, Any]] = []
+        self.rows = {table_key: 0 for table_key in LOAD_ORDER}
+        self.bytes = 0
+
+    def start(self):
+        """Empty the staging directory"""
+        if self.directory.exists():
+            shutil.rmtree(self.directory)
+        for table_key in LOAD_ORDER:
+            (self.directory / table_key).mkdir(parents=True)
+        logger.info(f"Staging transformed tables as {self.format} in {self.directory}")
+
+    def part_path(self, table_key: str, batch_number: int) -> Path:
+        """File of one table of one batch"""
+        return self.directory / table_key / f"part-{batch_number:06d}{STAGING_FORMATS[self.format]}"
+
+    def write_batch(self, batch_number: int, record_count: int, transformed_data: Dict[str, List[Dict[str, Any]]]):
+        """Write every non-empty table of one batch"""
+        pa = self.pa
+        rows = {}
+        for table_key in LOAD_ORDER:
+            table_rows = transformed_data.get(table_key, [])
+            rows[table_key] = len(table_rows)
+            if not table_rows:
+                continue
+            columns = list(zip(*table_rows))
+            table = pa.Table.from_arrays([pa.array(column) for column in columns], names=list(table_rows[0]._fields))
+            path = self.part_path(table_key, batch_number)
+            try:
+                if self.format == 'arrow':
+                    with pa.OSFile(str(path), 'wb') as sink:
+                        with pa.ipc.new_file(sink, table.schema) as writer:
+                            writer.write_table(table)
+                else:
+                    pa.parquet.write_table(table, str(path))
+            except Exception as e:
+                logger.error(f"Error staging {table_key} of batch {batch_number}: {e}")
+                raise
+            self.rows[table_key] += len(table_rows)
+            self.bytes += path.stat().st_size
+        self.batches.append({'batch': batch_number, 'records': record_count, 'rows': rows})
+
+    def finish(self, input_file: Optional[Path] = None) -> Dict[str, Any]:
+        """Write staging.json; returns it"""
+        manifest = {
+            'version': STAGING_VERSION,
+            'format': self.format,
+            'key_strategy': ETL_CONFIG['key_strategy'],
+            'input': str(input_file) if input_file else None,
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'records': sum(batch['records'] for batch in self.batches),
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'batches': self.batches
+        }
+        temp_path = self.directory / f"{MANIFEST_NAME}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2)
+        temp_path.replace(self.directory / MANIFEST_NAME)
+        logger.info(f"Staged {manifest['records']} records in {len(self.batches)} batches "
+                    f"({self.bytes / 2 ** 20:.1f} MB) to {self.directory}")
+        return manifest
+
+class StagingReader:
+    """Reads a complete staging directory back, batch by batch"""
+
+    def __init__(self, directory: Path = STAGING_DIR):
+        self.pa = _pyarrow()
+        self.directory = Path(directory)
+        manifest_path = self.directory / MANIFEST_NAME
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"No complete staging in {self.directory} ({MANIFEST_NAME} missing)")
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            self.manifest = json.load(file)
+        if self.manifest.get('version') != STAGING_VERSION:
+            raise ValueError(f"Staging in {self.directory} has version {self.manifest.get('version')}, "
+                             f"expected {STAGING_VERSION}")
+        self.format = self.manifest['format']
+
+    def check_key_strategy(self):
+        """Fail if the staged keys do not fit the configured schema"""
+        if self.manifest['key_strategy'] != ETL_CONFIG['key_strategy']:
+            raise ValueError(f"Staged keys use {self.manifest['key_strategy']}, "
+                             f"but ETL_CONFIG['key_strategy'] is {ETL_CONFIG['key_strategy']}")
+
+    def read_table(self, path: Path) -> Any:
+        """One staged file as a pyarrow Table, memory-mapped rather than read into memory"""
+        pa = self.pa
+        if self.format == 'arrow':
+            # Buffers point into the mapping; pages are read only when touched
+            return pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+        return pa.parquet.read_table(str(path), memory_map=True)
+
+    def tables(self, batch: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+        """(table_key, pyarrow Table) of every non-empty table of a staged batch"""
+        suffix = STAGING_FORMATS[self.format]
+        for table_key in LOAD_ORDER:
+            if batch['rows'].get(table_key):
+                yield table_key, self.read_table(self.directory / table_key / f"part-{batch['batch']:06d}{suffix}")
+
+    def batches(self) -> Iterator[Tuple[int, int, Dict[str, List[Dict[str, Any]]]]]:
+        """(batch number, record count, transformed tables) in the order they were staged"""
+        for batch in self.manifest['batches']:
+            transformed_data = {table_key: [] for table_key in LOAD_ORDER}
+            for table_key, table in self.tables(batch):
+                row_type = ROW_TYPES[table_key]
+                columns = [table.column(name).to_pylist() for name in row_type._fields]
+                transformed_data[table_key] = list(map(row_type._make, zip(*columns)))
+            yield batch['batch'], batch['records'], transformed_data
+
+def check_staged(directory: Path = STAGING_DIR, json_schema: bool = False) -> 'QualityCollector':
+    """Run the inline quality rules over staged files, without a database"""
+    from quality_metrics import QualityCollector
+
+    quality = QualityCollector(json_schema)
+    for _, _, transformed_data in StagingReader(directory).batches():
+        quality.observe(transformed_data)
+    return quality
@@ -0,0 +1,156 @@
+"""
+Property summary maintenance
+Materializes property_summary, one row per property, and refreshes it either
+for the properties changed by a run or in full
+"""
+
+import argparse
+import logging
+import time
+from typing import Any, List, Optional
+
+from config import *
+from dimensions import equals_sql, value_sql
+from incremental import KEY_CHUNK_SIZE
+from utils import DatabaseManager, setup_logging
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TABLE = 'property_summary'
+
+SUMMARY_COLUMNS = [
+    'property_id', 'property_type', 'bedrooms', 'bathrooms', 'square_footage', 'year_built',
+    'full_address', 'city', 'state', 'zip_code', 'hoa_name', 'hoa_monthly_fee',
+    'current_market_value', 'valuation_date', 'rehab_estimate', 'rehab_estimate_date'
+]
+
+# Each child table is ranked per property in a derived table and only its
+# first row joined, so a property never produces more than one summary row.
+# {properties}, {hoa}, {valuations} and {rehab} are WHERE clauses that limit
+# each table to the properties being refreshed. {property_type} reads the
+# type's text, from its lookup table when dimension tables are enabled.
+SUMMARY_SELECT = '''
+    SELECT
+        p.property_id,
+        {property_type},
+        p.bedrooms,
+        p.bathrooms,
+        p.square_footage,
+        p.year_built,
+        CONCAT(pl.address_line_1, ', ', pl.city, ', ', pl.state, ' ', pl.zip_code),
+        pl.city,
+        pl.state,
+        pl.zip_code,
+        h.hoa_name,
+        h.monthly_fee,
+        pv.valuation_amount,
+        pv.valuation_date,
+        re.estimated_cost,
+        re.estimate_date
+    FROM properties p
+    LEFT JOIN property_locations pl ON p.location_id = pl.location_id
+    LEFT JOIN (
+        SELECT property_id, hoa_name, monthly_fee,
+               ROW_NUMBER() OVER (PARTITION BY property_id ORDER BY created_at DESC, hoa_id DESC) AS rn
+        FROM hoa_details {hoa}
+    ) h ON p.property_id = h.property_id AND h.rn = 1
+    LEFT JOIN (
+        SELECT property_id, valuation_amount, valuation_date,
+               ROW_NUMBER() OVER (PARTITION BY property_id
+                                  ORDER BY valuation_date DESC, created_at DESC, valuation_id DESC) AS rn
+        FROM property_valuations {valuations}
+    ) pv ON p.property_id = pv.property_id AND pv.rn = 1
+    LEFT JOIN (
+        SELECT property_id, estimated_cost, estimate_date,
+               ROW_NUMBER() OVER (PARTITION BY property_id
+                                  ORDER BY estimate_date DESC, created_at DESC, estimate_id DESC) AS rn
+        FROM rehab_estimates {rehab}
+    ) re ON p.property_id = re.property_id AND re.rn = 1
+    {properties}
+'''
+
+def _where(*conditions: Optional[str]) -> str:
+    """WHERE clause joining the given conditions with AND, or '' if there are none"""
+    conditions = [condition for condition in conditions if condition]
+    return f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+def summary_select(id_filter: Optional[str] = None) -> str:
+    """SELECT of the summary rows of all properties, or of those matching id_filter"""
+    return SUMMARY_SELECT.format(
+        property_type=value_sql('properties', 'property_type', 'p'),
+        properties=_where(id_filter and f"p.{id_filter}"),
+        hoa=_where(id_filter),
+        valuations=_where(equals_sql('valuations', 'valuation_type', 'market'), id_filter),
+        rehab=_where(equals_sql('rehab_estimates', 'status', 'approved'), id_filter)
+    )
+
+def summary_query(id_filter: Optional[str] = None) -> str:
+    """INSERT ... SELECT statement for all properties, or for those matching id_filter"""
+    return f"INSERT INTO {SUMMARY_TABLE} ({', '.join(SUMMARY_COLUMNS)}) {summary_select(id_filter)}"
+
+class SummaryRefresher:
+    """Keeps property_summary in step with the normalized tables"""
+
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+        self.refreshed = 0
+
+    def refresh(self, property_ids: List[Any], commit: bool = False):
+        """Recompute the summary rows of the given properties
+
+        Runs inside the caller's transaction unless commit is set, so the
+        summary changes together with the rows it is derived from.
+        """
+        for i in range(0, len(property_ids), KEY_CHUNK_SIZE):
+            chunk = tuple(property_ids[i:i + KEY_CHUNK_SIZE])
+            id_filter = f"property_id IN ({', '.join(['%s'] * len(chunk))})"
+            self.db_manager.execute_query(
+                f"DELETE FROM {SUMMARY_TABLE} WHERE {id_filter}", chunk, commit=False, fetch=False
+            )
+            # The id list appears once per table in the SELECT
+            self.db_manager.execute_query(summary_query(id_filter), chunk * 4, commit=False, fetch=False)
+        self.refreshed += len(property_ids)
+
+        if commit:
+            self.db_manager.commit()
+
+    def rebuild(self):
+        """Recompute every summary row in one pass"""
+        logger.info("Rebuilding property summary...")
+        start = time.perf_counter()
+        try:
+            self.db_manager.execute_query(f"DELETE FROM {SUMMARY_TABLE}", commit=False, fetch=False)
+            self.db_manager.execute_query(summary_query(), commit=False, fetch=False)
+            self.db_manager.commit()
+        except Exception as e:
+            logger.error(f"Error rebuilding property summary: {e}")
+            self.db_manager.rollback()
+            raise
+
+        result = self.db_manager.execute_query(f"SELECT COUNT(*) FROM {SUMMARY_TABLE}", commit=False)
+        rows = result[0][0] if result else 0
+        logger.info(f"Property summary rebuilt: {rows} rows in {time.perf_counter() - start:.1f}s")
+        return rows
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+    setup_logging()
+
+    db_manager = DatabaseManager(pool_size=1)
+    try:
+        db_manager.connect()
+        db_manager.use_database(SCHEMA_DATABASE)
+        rows = SummaryRefresher(db_manager).rebuild()
+        print(f"Property summary rebuilt with {rows} rows")
+    except Exception as e:
+        print(f"Property summary rebuild failed: {e}")
+        return 1
+    finally:
+        db_manager.disconnect()
+
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -4,61 +4,306 @@ Utility functions for the ETL pipeline
 
 import json
 import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
 import mysql.connector
-from mysql.connector import Error
-from typing import Dict, Any, List, Optional
-import pandas as pd
+from mysql.connector import Error, pooling
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Any, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 from datetime import datetime
 import uuid
 
-from config import DB_CONFIG, LOG_CONFIG
+from config import COLUMN_DEFAULTS, DB_CONFIG, DIMENSION_ID_COLUMNS, KEY_COLUMN_TYPES, LOG_CONFIG, ETL_CONFIG
+from instrumentation import InstrumentedConnection
 
-# Set up logging
-logging.basicConfig(
-    level=getattr(logging, LOG_CONFIG['level']),
-    format=LOG_CONFIG['format'],
-    handlers=[
-        logging.FileHandler(LOG_CONFIG['file']),
-        logging.StreamHandler()
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+def setup_logging():
+    """Log to LOG_CONFIG['file'] and the console; called by each script's main()
+
+    Importing a module never configures logging, so library use and quick
+    commands do not open the log file.
+    """
+    LOG_CONFIG['file'].parent.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(
+        level=getattr(logging, LOG_CONFIG['level']),
+        format=LOG_CONFIG['format'],
+        handlers=[
+            logging.FileHandler(LOG_CONFIG['file']),
+            logging.StreamHandler()
+        ]
+    )
+
+# MySQL errors worth retrying: deadlock, lock wait timeout and lost connections
+TRANSIENT_ERRNOS = {1213, 1205, 2006, 2013, 2055}
+CONNECTION_LOST_ERRNOS = {2006, 2013, 2055}
+
+# Strings that clean to FALSE in a BOOLEAN column (compared stripped and lower-cased)
+FALSE_STRINGS = {'', 'no', 'n', 'false', 'f', 'off', 'none', 'null'}
+
+# A JSON value cut at the end of a read chunk fails this close to the end
+# at most (a partial '-Infinity'); errors further back are malformed input
+TRUNCATED_TOKEN_CHARS = len('-Infinity')
+
+def is_transient(error: Exception) -> bool:
+    """Whether a database error is likely to succeed when retried"""
+    return getattr(error, 'errno', None) in TRANSIENT_ERRNOS
+
+def retry_transient(operation: Callable[[], Any], description: str,
+                    on_retry: Optional[Callable[[Exception], None]] = None) -> Any:
+    """Run operation, retrying transient MySQL errors with exponential backoff
+
+    Makes up to ETL_CONFIG['max_retries'] retries, waiting retry_delay
+    seconds before the first and doubling the wait each time, with up to
+    50% jitter so concurrent writers do not retry in lockstep. on_retry runs
+    before each wait, to roll back or reconnect. Other errors, and the last
+    transient one, are raised.
+    """
+    retries = ETL_CONFIG['max_retries']
+    for attempt in range(retries + 1):
+        try:
+            return operation()
+        except Exception as e:
+            if not is_transient(e) or attempt == retries:
+                raise
+            delay = ETL_CONFIG['retry_delay'] * 2 ** attempt * (1 + random.random() / 2)
+            logger.warning(f"{description} failed with transient error {e.errno}: {e}; "
+                           f"retry {attempt + 1}/{retries} in {delay:.1f}s")
+            if on_retry:
+                on_retry(e)
+            time.sleep(delay)
+
+def split_statements(script: str) -> List[str]:
+    """Split a SQL script on semicolons into statements, skipping comment-only chunks"""
+    return [
+        stmt.strip() for stmt in script.split(';')
+        if any(line.strip() and not line.strip().startswith('--') for line in stmt.splitlines())
     ]
-)
-logger = logging.getLogger(_name_)
+
+# Key column definitions in sql/schema.sql: an *_id column typed VARCHAR(36)
+KEY_COLUMN_PATTERN = re.compile(r'^(\s+\w+_id) VARCHAR\(36\)', re.MULTILINE)
+
+def schema_script(schema_file: Union[str, Path], key_strategy: str) -> str:
+    """The schema script with its key columns typed for key_strategy
+
+    sql/schema.sql is the only copy of the schema; the BINARY(16) variant
+    differs in nothing but the type of the *_id columns.
+    """
+    with open(schema_file, 'r') as file:
+        script = file.read()
+    return KEY_COLUMN_PATTERN.sub(rf'\1 {KEY_COLUMN_TYPES[key_strategy]}', script)
+
+def row_values(data: List[Any], table: Optional[str] = None) -> Tuple[List[str], List[tuple]]:
+    """Column list and value tuples of a batch of rows
+
+    Fixed-schema rows (rows.ROW_TYPES) already are value tuples in column
+    order and are used as they are. Dict rows are read with the first row's
+    keys, missing keys becoming NULL. A None in a column of
+    COLUMN_DEFAULTS[table] becomes that column's default instead.
+    """
+    first = data[0]
+    if isinstance(first, tuple):
+        columns, rows = list(first._fields), data
+    else:
+        columns = list(first.keys())
+        rows = [tuple(record.get(col) for col in columns) for record in data]
+
+    defaults = [(i, COLUMN_DEFAULTS[table][col]) for i, col in enumerate(columns)
+                if col in COLUMN_DEFAULTS.get(table, {})]
+    if not defaults or not any(row[i] is None for row in rows for i, _ in defaults):
+        return columns, rows
+
+    def with_defaults(row: tuple) -> tuple:
+        values = list(row)
+        for i, default in defaults:
+            if values[i] is None:
+                values[i] = default
+        return tuple(values)
+
+    return columns, [with_defaults(row) for row in rows]
+
+def connection_params() -> Dict[str, Any]:
+    """Keyword arguments for mysql.connector.connect derived from DB_CONFIG"""
+    params = {k: v for k, v in DB_CONFIG.items() if k != 'pool_size'}
+    # LOAD DATA LOCAL INFILE must be enabled on the client side as well
+    params['allow_local_infile'] = ETL_CONFIG['load_data_infile']
+    return params
+
+class UUID7Generator:
+    """Monotonic, time-ordered UUIDs in the version 7 layout, as 16-byte keys
+
+    The first 48 bits are a millisecond timestamp, followed by a 42-bit
+    counter that starts at a random value each millisecond and 32 random
+    bits. Keys produced by one process therefore always increase, which
+    keeps InnoDB inserts appending to the right-most page.
+    """
+    
+    COUNTER_BITS = 42
+    
+    def __init__(self):
+        self.last_ms = -1
+        self.counter = 0
+        self.lock = threading.Lock()
+    
+    def reserve(self, count: int) -> tuple:
+        """Reserve count consecutive counter values; returns (timestamp_ms, first_counter)"""
+        with self.lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self.last_ms:
+                self.last_ms = now_ms
+                # Leave the top bit clear so the counter has room to grow
+                self.counter = random.getrandbits(self.COUNTER_BITS - 1)
+            if self.counter + count >= 1 << self.COUNTER_BITS:
+                self.last_ms += 1
+                self.counter = 0
+            first = self.counter
+            self.counter += count
+            return self.last_ms, first
+    
+    @staticmethod
+    def compose(timestamp_ms: int, counter: int, random_bits: int) -> bytes:
+        """Pack the fields into the 16-byte version 7 layout"""
+        value = ((timestamp_ms & 0xFFFFFFFFFFFF) << 80
+                 | 0x7 << 76
+                 | (counter >> 30 & 0xFFF) << 64
+                 | 0b10 << 62
+                 | (counter & 0x3FFFFFFF) << 32
+                 | random_bits & 0xFFFFFFFF)
+        return value.to_bytes(16, 'big')
+    
+    def generate(self) -> bytes:
+        """One new key"""
+        timestamp_ms, counter = self.reserve(1)
+        return self.compose(timestamp_ms, counter, random.getrandbits(32))
+
+uuid7_generator = UUID7Generator()
+
+def binary_keys() -> bool:
+    """Whether keys are 16-byte BINARY values rather than VARCHAR(36) strings"""
+    return ETL_CONFIG['key_strategy'] == 'uuid7_binary'
 
 class DatabaseManager:
     """Handles database connections and operations"""
     
-    def _init_(self):
+    def __init__(self, pool_size: Optional[int] = None):
         self.connection = None
         self.cursor = None
+        self.max_allowed_packet = None
+        self.pool_size = DB_CONFIG.get('pool_size', 1) if pool_size is None else pool_size
+        self.pool = None
+        self.database = None
+        self.session_variables: Dict[str, Any] = {}
     
     def connect(self):
-        """Establish database connection"""
+        """Establish database connection, plus a connection pool when pool_size > 1"""
         try:
-            self.connection = mysql.connector.connect(**DB_CONFIG)
+            self.connection = InstrumentedConnection(mysql.connector.connect(**connection_params()))
             self.cursor = self.connection.cursor()
             logger.info("Database connection established")
+            
+            if self.pool_size > 1:
+                self.pool = pooling.MySQLConnectionPool(
+                    pool_name=f"etl_pool_{id(self)}",
+                    pool_size=self.pool_size,
+                    **connection_params()
+                )
+                logger.info(f"Connection pool of {self.pool_size} connections established")
         except Error as e:
             logger.error(f"Error connecting to database: {e}")
             raise
     
+    def reconnect(self):
+        """Replace a lost primary connection, restoring the database and session variables"""
+        try:
+            self.connection.close()
+        except Error:
+            pass
+        try:
+            self.connection = InstrumentedConnection(mysql.connector.connect(**connection_params()))
+            self.cursor = self.connection.cursor()
+            logger.info("Database connection re-established")
+        except Error as e:
+            logger.error(f"Error reconnecting to database: {e}")
+            raise
+        
+        if self.database:
+            self.execute_query(f"USE {self.database}", fetch=False)
+        if self.session_variables:
+            self.set_session(dict(self.session_variables))
+    
     def disconnect(self):
         """Close database connection"""
         if self.cursor:
             self.cursor.close()
         if self.connection:
             self.connection.close()
+        if self.pool:
+            self.pool._remove_connections()
+            self.pool = None
         logger.info("Database connection closed")
     
-    def execute_script(self, script_path: str):
-        """Execute SQL script from file"""
+    @contextmanager
+    def acquire(self) -> Iterator['DatabaseManager']:
+        """Borrow a pooled connection wrapped in its own DatabaseManager
+
+        The borrowed manager has the same methods as this one but runs on a
+        separate connection, so it can be used from another thread. The
+        connection goes back to the pool when the block exits.
+        """
+        if not self.pool:
+            raise RuntimeError("No connection pool; set DB_CONFIG['pool_size'] above 1")
+        
+        worker = DatabaseManager(pool_size=1)
+        worker.connection = InstrumentedConnection(self.pool.get_connection())
+        worker.cursor = worker.connection.cursor()
         try:
-            with open(script_path, 'r') as file:
-                script = file.read()
-            
-            # Split script into individual statements
-            statements = [stmt.strip() for stmt in script.split(';') if stmt.strip()]
+            # Pooled connections open on DB_CONFIG['database']
+            if self.database:
+                worker.connection.database = self.database
+            if self.session_variables:
+                worker.set_session(self.session_variables)
+            yield worker
+        finally:
+            worker.cursor.close()
+            worker.connection.close()
+    
+    def use_database(self, database: str):
+        """Switch to database; connections borrowed with acquire() follow it"""
+        self.execute_query(f"USE {database}", fetch=False)
+        self.database = database
+    
+    def set_session(self, variables: Dict[str, Any]):
+        """SET SESSION variables; connections borrowed with acquire() get them too"""
+        assignments = ', '.join(f"{name} = {value}" for name, value in variables.items())
+        self.execute_query(f"SET SESSION {assignments}", fetch=False)
+        self.session_variables.update(variables)
+    
+    def reset_session(self):
+        """Return the variables changed by set_session to their server defaults"""
+        if self.session_variables:
+            self.set_session({name: 'DEFAULT' for name in self.session_variables})
+            self.session_variables = {}
+    
+    def execute_script(self, script_path: str, script: Optional[str] = None):
+        """Execute SQL script from file
+
+        script, when given, is run instead of the file's contents (such as
+        the schema from schema_script); script_path then names it in the log.
+        """
+        try:
+            if script is None:
+                with open(script_path, 'r') as file:
+                    script = file.read()
             
-            for statement in statements:
+            for statement in split_statements(script):
                 self.cursor.execute(statement)
             
             self.connection.commit()
@@ -69,35 +314,52 @@ class DatabaseManager:
             self.connection.rollback()
             raise
     
-    def execute_query(self, query: str, params: Optional[tuple] = None):
-        """Execute a single query"""
+    def execute_query(self, query: str, params: Optional[tuple] = None, commit: bool = True, fetch: bool = True):
+        """Execute a single query
+
+        commit=False leaves the statement in the open transaction and
+        fetch=False skips reading a result set (for DML statements).
+        """
         try:
             self.cursor.execute(query, params)
-            self.connection.commit()
-            return self.cursor.fetchall()
+            result = self.cursor.fetchall() if fetch else None
+            if commit:
+                self.connection.commit()
+            return result
         except Error as e:
             logger.error(f"Error executing query: {e}")
             self.connection.rollback()
             raise
     
-    def insert_batch(self, table: str, data: List[Dict[str, Any]]):
-        """Insert batch of data into table"""
+    def commit(self):
+        """Commit the current transaction"""
+        self.connection.commit()
+    
+    def rollback(self):
+        """Roll back the current transaction"""
+        self.connection.rollback()
+    
+    def insert_batch(self, table: str, data: List[Dict[str, Any]], commit: bool = True):
+        """Insert batch of data into table
+
+        Every row is written with the same column list (see row_values), with
+        None sent as NULL or as the column's COLUMN_DEFAULTS value. With
+        commit=False the rows join the caller's open transaction so that
+        several tables can be committed together.
+        """
         if not data:
             return
         
-        # Get column names from first record
-        columns = list(data[0].keys())
+        columns, values = row_values(data, table)
         placeholders = ', '.join(['%s'] * len(columns))
         columns_str = ', '.join(columns)
         
         query = f"INSERT INTO {table} ({columns_str}) VALUES ({placeholders})"
         
         try:
-            # Convert data to tuples
-            values = [tuple(record[col] for col in columns) for record in data]
-            
             self.cursor.executemany(query, values)
-            self.connection.commit()
+            if commit:
+                self.connection.commit()
             logger.info(f"Inserted {len(data)} records into {table}")
             
         except Error as e:
@@ -105,6 +367,169 @@ class DatabaseManager:
             self.connection.rollback()
             raise
 
+    def get_max_allowed_packet(self) -> int:
+        """Server max_allowed_packet in bytes (cached per connection)"""
+        if self.max_allowed_packet is None:
+            self.cursor.execute("SELECT @@max_allowed_packet")
+            self.max_allowed_packet = int(self.cursor.fetchall()[0][0])
+        return self.max_allowed_packet
+    
+    def bulk_insert(self, table: str, data: List[Dict[str, Any]], commit: bool = True) -> int:
+        """Bulk-load rows using LOAD DATA LOCAL INFILE or packet-sized multi-row INSERTs
+
+        Every row is written with the same column list (see row_values), with
+        None sent as NULL or as the column's COLUMN_DEFAULTS value. LOAD DATA
+        is used when ETL_CONFIG['load_data_infile'] is enabled, otherwise rows
+        are sent as multi-row INSERT statements that fit max_allowed_packet.
+        With commit=True the multi-row path commits every ETL_CONFIG['commit_every']
+        rows instead of holding the whole table in one transaction.
+        """
+        if not data:
+            return 0
+        
+        columns, rows = row_values(data, table)
+        
+        start = time.perf_counter()
+        try:
+            if ETL_CONFIG['load_data_infile']:
+                self.load_data_infile(table, columns, rows)
+                if commit:
+                    self.connection.commit()
+                method = 'LOAD DATA'
+            else:
+                self.insert_multirow(table, columns, rows, commit)
+                method = 'multi-row INSERT'
+        except Error as e:
+            logger.error(f"Error bulk loading {table}: {e}")
+            self.connection.rollback()
+            raise
+        
+        elapsed = time.perf_counter() - start
+        rate = len(rows) / elapsed if elapsed > 0 else float('inf')
+        logger.info(f"Bulk loaded {len(rows)} rows into {table} via {method} in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+        return len(rows)
+    
+    def load_data_infile(self, table: str, columns: List[str], rows: List[tuple]):
+        """Stream rows to a temporary TSV file and load it with LOAD DATA LOCAL INFILE"""
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8', newline='', delete=False) as tsv:
+            path = tsv.name
+            for row in rows:
+                tsv.write('\t'.join(_tsv_field(value) for value in row))
+                tsv.write('\n')
+        
+        # Binary keys are written as hex and decoded by the server
+        binary_columns = ({col for col in columns if col.endswith('_id') and col not in DIMENSION_ID_COLUMNS}
+                          if binary_keys() else set())
+        targets = ', '.join(f"@{col}" if col in binary_columns else col for col in columns)
+        assignments = ', '.join(f"{col} = UNHEX(@{col})" for col in columns if col in binary_columns)
+        
+        try:
+            escaped_path = path.replace('\\', '\\\\').replace("'", "\\'")
+            self.cursor.execute(
+                f"LOAD DATA LOCAL INFILE '{escaped_path}' INTO TABLE {table} "
+                f"CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+                f"LINES TERMINATED BY '\\n' ({targets})"
+                + (f" SET {assignments}" if assignments else "")
+            )
+            if self.cursor.warning_count:
+                logger.warning(f"LOAD DATA into {table} reported {self.cursor.warning_count} warnings")
+        finally:
+            os.remove(path)
+    
+    def upsert_batch(self, table: str, data: List[Dict[str, Any]], key_columns: List[str], commit: bool = True) -> int:
+        """Insert rows, updating every non-key column of rows whose key already exists
+
+        The new values are read through the row alias of MySQL 8.0.19+
+        (INSERT ... AS new ON DUPLICATE KEY UPDATE col = new.col) rather than
+        the deprecated VALUES(col).
+        """
+        if not data:
+            return 0
+        
+        columns, rows = row_values(data, table)
+        updates = ', '.join(f"{col} = new.{col}" for col in columns if col not in key_columns)
+        
+        try:
+            self.insert_multirow(table, columns, rows, commit, suffix=f" AS new ON DUPLICATE KEY UPDATE {updates}")
+        except Error as e:
+            logger.error(f"Error upserting batch into {table}: {e}")
+            self.connection.rollback()
+            raise
+        
+        logger.info(f"Upserted {len(rows)} records into {table}")
+        return len(rows)
+    
+    def insert_multirow(self, table: str, columns: List[str], rows: List[tuple], commit: bool = True,
+                        suffix: str = ''):
+        """Insert rows as INSERT ... VALUES (...),(...) statements sized to max_allowed_packet
+
+        suffix is appended to every statement, e.g. a row alias and ON DUPLICATE KEY UPDATE clause.
+        """
+        prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+        row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        # Leave headroom for the protocol header and escaping estimates
+        budget = int(self.get_max_allowed_packet() * 0.9) - len(prefix) - len(suffix)
+        commit_every = ETL_CONFIG['commit_every']
+        
+        chunk = []
+        chunk_bytes = 0
+        uncommitted = 0
+        for row in rows:
+            row_bytes = _estimate_row_bytes(row)
+            if chunk and chunk_bytes + row_bytes > budget:
+                self._execute_multirow(prefix, row_placeholder, chunk, suffix)
+                uncommitted += len(chunk)
+                chunk, chunk_bytes = [], 0
+                if commit and uncommitted >= commit_every:
+                    self.connection.commit()
+                    uncommitted = 0
+            chunk.append(row)
+            chunk_bytes += row_bytes
+        
+        if chunk:
+            self._execute_multirow(prefix, row_placeholder, chunk, suffix)
+        if commit:
+            self.connection.commit()
+    
+    def _execute_multirow(self, prefix: str, row_placeholder: str, chunk: List[tuple], suffix: str = ''):
+        query = prefix + ', '.join([row_placeholder] * len(chunk)) + suffix
+        self.cursor.execute(query, [value for row in chunk for value in row])
+
+def _may_be_truncated(err: json.JSONDecodeError) -> bool:
+    """Whether a decode error may just mean the value continues in the next chunk
+
+    A value cut short fails as an unterminated string or within its last
+    token (a number, literal or \\uXXXX escape) at the end of the buffer.
+    Any other error is malformed input, raised without reading further.
+    """
+    return err.msg.startswith('Unterminated string') or len(err.doc) - err.pos <= TRUNCATED_TOKEN_CHARS
+
+def _tsv_field(value: Any) -> str:
+    """Format a value for LOAD DATA with the default escape rules"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, bytes):
+        return value.hex()
+    text = str(value)
+    if any(ch in text for ch in '\\\t\n\r\0'):
+        text = (text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+                .replace('\r', '\\r').replace('\0', '\\0'))
+    return text
+
+def _estimate_row_bytes(row: tuple) -> int:
+    """Upper bound on the size of a row once escaped into an INSERT statement"""
+    size = 2
+    for value in row:
+        if isinstance(value, str):
+            # Every byte may need an escape, plus quotes and the separator
+            size += 2 * len(value.encode('utf-8')) + 4
+        else:
+            size += 32
+    return size
+
 class DataProcessor:
     """Handles data processing and transformation"""
     
@@ -125,7 +550,130 @@ class DataProcessor:
         except Exception as e:
             logger.error(f"Error loading JSON file {file_path}: {e}")
             raise
-    
+
+    @staticmethod
+    def iter_json(file_path: Union[str, Path, TextIO], chunk_size: int = 1 << 20,
+                  name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream records from a top-level JSON array, a single object or NDJSON
+
+        Only one read chunk plus the record currently being decoded is held in
+        memory, so the footprint does not grow with the size of the file.
+        file_path may also be an open text stream (such as a decompressing
+        one from sources.open_input), which is read but not closed; name is
+        then what the log messages call it. Malformed input (a bad record, a
+        missing or repeated ',' between array elements, anything after the
+        closing ']') raises ValueError with its character offset as soon as
+        it is reached.
+        """
+        decoder = json.JSONDecoder()
+        count = 0
+        if hasattr(file_path, 'read'):
+            opened = nullcontext(file_path)
+            file_path = name or getattr(file_path, 'name', 'stream')
+        else:
+            opened = open(file_path, 'r', encoding='utf-8')
+
+        try:
+            with opened as file:
+                buffer = ''
+                # Characters of the file before buffer[0]
+                offset = 0
+                pos = 0
+                eof = False
+                in_array = None
+                # Inside an array: whether a value or a ',' was the last thing read
+                after_value = False
+                after_comma = False
+                closed = False
+
+                while True:
+                    while True:
+                        while pos < len(buffer) and buffer[pos].isspace():
+                            pos += 1
+                        if pos < len(buffer) or eof:
+                            break
+                        offset += len(buffer)
+                        buffer = file.read(chunk_size)
+                        pos = 0
+                        eof = not buffer
+
+                    if pos >= len(buffer):
+                        if in_array and not closed:
+                            raise ValueError("Unexpected end of file inside JSON array")
+                        break
+
+                    char = buffer[pos]
+                    if closed:
+                        raise ValueError(f"Unexpected data after the closing ']' at character {offset + pos}")
+
+                    if in_array is None:
+                        in_array = char == '['
+                        if in_array:
+                            pos += 1
+                        continue
+
+                    if in_array:
+                        if char == ']' and not after_comma:
+                            closed = True
+                            pos += 1
+                            continue
+                        if after_value:
+                            if char != ',':
+                                raise ValueError(f"Expected ',' or ']' after array element at character {offset + pos}")
+                            after_value = False
+                            after_comma = True
+                            pos += 1
+                            continue
+                        if char in ',]':
+                            raise ValueError(f"Expected an array element at character {offset + pos}")
+
+                    try:
+                        value, end = decoder.raw_decode(buffer, pos)
+                        # A value ending exactly at the buffer edge may be truncated
+                        truncated = end == len(buffer) and not eof
+                    except json.JSONDecodeError as err:
+                        if eof or not _may_be_truncated(err):
+                            raise ValueError(
+                                f"Invalid JSON in the record at character {offset + pos}: "
+                                f"{err.msg} at character {offset + err.pos}"
+                            ) from err
+                        truncated = True
+
+                    if truncated:
+                        chunk = file.read(chunk_size)
+                        eof = not chunk
+                        offset += pos
+                        buffer = buffer[pos:] + chunk
+                        pos = 0
+                        continue
+
+                    pos = end
+                    after_value = True
+                    after_comma = False
+                    if isinstance(value, dict):
+                        count += 1
+                        yield value
+                    else:
+                        logger.warning(f"Skipping non-object JSON value in {file_path}")
+
+            logger.info(f"Streamed {count} records from {file_path}")
+
+        except Exception as e:
+            logger.error(f"Error streaming JSON file {file_path}: {e}")
+            raise
+
+    @staticmethod
+    def batched(records: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        """Group a stream of records into lists of at most batch_size"""
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
     @staticmethod
     def clean_string(value: Any) -> Optional[str]:
         """Clean and normalize string values"""
@@ -133,6 +681,27 @@ class DataProcessor:
             return None
         return str(value).strip()
     
+    @staticmethod
+    def clean_boolean(value: Any) -> bool:
+        """Clean a flag value: Yes/No, true/false and numeric strings as well as real booleans and numbers
+
+        Missing values are False, like the column DEFAULT. Any other
+        non-empty string (such as 'In Ground' for a pool) is True.
+        """
+        if value is None:
+            return False
+        if isinstance(value, str):
+            text = value.strip().lower()
+            if text in FALSE_STRINGS:
+                return False
+            try:
+                return float(text) != 0
+            except ValueError:
+                return True
+        if isinstance(value, float) and value != value:
+            return False
+        return bool(value)
+    
     @staticmethod
     def clean_numeric(value: Any) -> Optional[float]:
         """Clean and convert numeric values"""
@@ -159,8 +728,10 @@ class DataProcessor:
             return None
     
     @staticmethod
-    def generate_uuid() -> str:
-        """Generate UUID for primary keys"""
+    def generate_uuid():
+        """Generate UUID for primary keys in the format of ETL_CONFIG['key_strategy']"""
+        if binary_keys():
+            return uuid7_generator.generate()
         return str(uuid.uuid4())
     
     @staticmethod
@@ -181,8 +752,11 @@ def create_directories():
     
     logger.info("Created necessary directories")
 
-def read_field_config(file_path: str) -> pd.DataFrame:
+def read_field_config(file_path: str) -> 'pd.DataFrame':
     """Read field configuration from Excel file"""
+    # pandas and openpyxl take a while to import and are only needed here
+    import pandas as pd
+    
     try:
         df = pd.read_excel(file_path)
         logger.info(f"Loaded field configuration from {file_path}")
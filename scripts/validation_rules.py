@@ -0,0 +1,278 @@
+"""
+Validation rule registry
+Declares every post-load check once and compiles the checks of each table
+into a single aggregated scan, run concurrently across tables
+"""
+
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import DIMENSIONS, ETL_CONFIG, TABLES
+from utils import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Tables in report order; every one gets a row count even without rules
+VALIDATED_TABLES = [
+    'property_locations',
+    'properties',
+    'hoa_details',
+    'property_valuations',
+    'rehab_estimates'
+]
+
+# Joins a rule may need, by alias. Each joins a parent on its primary key,
+# so it never multiplies the rows of the scanned table.
+RULE_JOINS = {
+    'pl': 'LEFT JOIN property_locations pl ON t.location_id = pl.location_id',
+    'p': 'LEFT JOIN properties p ON t.property_id = p.property_id'
+}
+
+# Lookup tables, joined on their id by the dimension rules below
+RULE_JOINS.update({
+    name: f"LEFT JOIN {name} ON t.{column}_id = {name}.{column}_id" for name, (_, column, _) in DIMENSIONS.items()
+})
+
+# Evaluated once per run, like YEAR(CURDATE()) in the SQL conditions
+CURRENT_YEAR = datetime.now().year
+
+# Each rule counts the rows of `table` (aliased t) matching the SQL
+# `condition`. Rules with a `check` predicate can also be evaluated on
+# transformed rows before loading (see quality_metrics.py); it must match
+# the same rows, with None standing in for NULL. Rows are rows.ROW_TYPES
+# tuples, so checks read columns as attributes. With dimension tables a
+# rule's `dimension_condition`, if it has one, is used in place of its
+# condition, for tables whose categorical columns are stored as ids.
+VALIDATION_RULES: List[Dict[str, Any]] = [
+    # Foreign keys
+    {
+        'name': 'Properties without locations',
+        'table': 'properties',
+        'category': 'foreign_keys',
+        'join': 'pl',
+        'condition': 'pl.location_id IS NULL'
+    },
+    {
+        'name': 'HOA details without properties',
+        'table': 'hoa_details',
+        'category': 'foreign_keys',
+        'join': 'p',
+        'condition': 'p.property_id IS NULL'
+    },
+    {
+        'name': 'Valuations without properties',
+        'table': 'property_valuations',
+        'category': 'foreign_keys',
+        'join': 'p',
+        'condition': 'p.property_id IS NULL'
+    },
+    {
+        'name': 'Rehab estimates without properties',
+        'table': 'rehab_estimates',
+        'category': 'foreign_keys',
+        'join': 'p',
+        'condition': 'p.property_id IS NULL'
+    },
+    # Data quality
+    {
+        'name': 'Properties with missing required fields',
+        'table': 'properties',
+        'category': 'data_quality',
+        'condition': 't.property_type IS NULL OR t.bedrooms IS NULL OR t.bathrooms IS NULL',
+        'dimension_condition': 't.property_type_id IS NULL OR t.bedrooms IS NULL OR t.bathrooms IS NULL',
+        'check': lambda row: row.property_type is None or row.bedrooms is None or row.bathrooms is None
+    },
+    {
+        'name': 'Locations with missing address',
+        'table': 'property_locations',
+        'category': 'data_quality',
+        'condition': 't.address_line_1 IS NULL OR t.city IS NULL OR t.state IS NULL',
+        'check': lambda row: row.address_line_1 is None or row.city is None or row.state is None
+    },
+    {
+        'name': 'Valuations with zero or negative amounts',
+        'table': 'property_valuations',
+        'category': 'data_quality',
+        'condition': 't.valuation_amount <= 0',
+        'check': lambda row: row.valuation_amount is not None and row.valuation_amount <= 0
+    },
+    {
+        'name': 'Properties with unrealistic year built',
+        'table': 'properties',
+        'category': 'data_quality',
+        'condition': 't.year_built < 1800 OR t.year_built > YEAR(CURDATE())',
+        'check': lambda row: row.year_built is not None and not 1800 <= row.year_built <= CURRENT_YEAR
+    },
+    {
+        'name': 'Properties with negative square footage',
+        'table': 'properties',
+        'category': 'data_quality',
+        'condition': 't.square_footage < 0',
+        'check': lambda row: row.square_footage is not None and row.square_footage < 0
+    },
+    # Business rules
+    {
+        'name': 'Properties with more than 20 bedrooms',
+        'table': 'properties',
+        'category': 'business_rules',
+        'condition': 't.bedrooms > 20',
+        'check': lambda row: row.bedrooms is not None and row.bedrooms > 20
+    },
+    {
+        'name': 'Properties with more than 15 bathrooms',
+        'table': 'properties',
+        'category': 'business_rules',
+        'condition': 't.bathrooms > 15',
+        'check': lambda row: row.bathrooms is not None and row.bathrooms > 15
+    },
+    {
+        'name': 'Properties with square footage > 50000',
+        'table': 'properties',
+        'category': 'business_rules',
+        'condition': 't.square_footage > 50000',
+        'check': lambda row: row.square_footage is not None and row.square_footage > 50000
+    },
+    {
+        'name': 'HOA monthly fees > $5000',
+        'table': 'hoa_details',
+        'category': 'business_rules',
+        'condition': 't.monthly_fee > 5000',
+        'check': lambda row: row.monthly_fee is not None and row.monthly_fee > 5000
+    },
+    {
+        'name': 'Property valuations > $50M',
+        'table': 'property_valuations',
+        'category': 'business_rules',
+        'condition': 't.valuation_amount > 50000000',
+        'check': lambda row: row.valuation_amount is not None and row.valuation_amount > 50000000
+    }
+]
+
+# Rows referencing a missing lookup row; checked only with dimension tables
+DIMENSION_RULES: List[Dict[str, Any]] = [
+    {
+        'name': f"{TABLES.get(table_key, table_key)} with unknown {column} ids",
+        'table': TABLES.get(table_key, table_key),
+        'category': 'foreign_keys',
+        'join': name,
+        'condition': f"t.{column}_id IS NOT NULL AND {name}.{column}_id IS NULL"
+    }
+    for name, (table_key, column, _) in DIMENSIONS.items()
+]
+
+def active_rules() -> List[Dict[str, Any]]:
+    """The rules that apply to the configured schema"""
+    return VALIDATION_RULES + DIMENSION_RULES if ETL_CONFIG['dimension_tables'] else VALIDATION_RULES
+
+def rule_condition(rule: Dict[str, Any]) -> str:
+    """SQL condition of a rule for the configured schema"""
+    if ETL_CONFIG['dimension_tables']:
+        return rule.get('dimension_condition', rule['condition'])
+    return rule['condition']
+
+def compile_table_scan(table: str, rules: List[Dict[str, Any]]) -> str:
+    """One SELECT returning COUNT(*) followed by one match count per rule"""
+    columns = ['COUNT(*)'] + [f"SUM(CASE WHEN {rule_condition(rule)} THEN 1 ELSE 0 END)" for rule in rules]
+    joins = []
+    for rule in rules:
+        if rule.get('join') and RULE_JOINS[rule['join']] not in joins:
+            joins.append(RULE_JOINS[rule['join']])
+    return f"SELECT {', '.join(columns)} FROM {table} t {' '.join(joins)}".rstrip()
+
+def compile_rules(rules: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Tuple[str, List[Dict[str, Any]]]]:
+    """Group rules by table and compile each group; returns table -> (query, rules)
+
+    With the default rules every table in VALIDATED_TABLES is scanned, for its
+    row count; with a custom list only the tables it has rules for.
+    """
+    tables = VALIDATED_TABLES if rules is None else []
+    rules = active_rules() if rules is None else rules
+    compiled = {}
+    for table in tables + sorted({rule['table'] for rule in rules} - set(tables)):
+        table_rules = [rule for rule in rules if rule['table'] == table]
+        compiled[table] = (compile_table_scan(table, table_rules), table_rules)
+    return compiled
+
+class ValidationEngine:
+    """Runs the compiled scans, one per table, and builds a structured report"""
+
+    def __init__(self, db_manager: DatabaseManager, rules: Optional[List[Dict[str, Any]]] = None):
+        self.db_manager = db_manager
+        self.compiled = compile_rules(rules)
+
+    def scan_table(self, db_manager: DatabaseManager, table: str) -> Dict[str, Any]:
+        """Run the scan of one table and return its row count and rule results"""
+        query, rules = self.compiled[table]
+        start = time.perf_counter()
+        try:
+            result = db_manager.execute_query(query, commit=False)
+        except Exception as e:
+            return {'table': table, 'error': str(e), 'checks': []}
+
+        counts = [int(value or 0) for value in result[0]] if result else [0] * (len(rules) + 1)
+        checks = [
+            {
+                'name': rule['name'],
+                'category': rule['category'],
+                'table': table,
+                'count': count,
+                'status': 'ok' if count == 0 else 'warning'
+            }
+            for rule, count in zip(rules, counts[1:])
+        ]
+        return {
+            'table': table,
+            'rows': counts[0],
+            'seconds': round(time.perf_counter() - start, 3),
+            'checks': checks
+        }
+
+    def run(self) -> Dict[str, Any]:
+        """Scan every table, concurrently on pooled connections when a pool exists"""
+        start = time.perf_counter()
+        tables = list(self.compiled)
+
+        if self.db_manager.pool:
+            def scan(table: str) -> Dict[str, Any]:
+                with self.db_manager.acquire() as worker:
+                    return self.scan_table(worker, table)
+
+            with ThreadPoolExecutor(max_workers=min(len(tables), self.db_manager.pool_size)) as executor:
+                scans = list(executor.map(scan, tables))
+        else:
+            scans = [self.scan_table(self.db_manager, table) for table in tables]
+
+        report = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - start, 3),
+            'tables': {},
+            'checks': [],
+            'errors': {}
+        }
+        for scan in scans:
+            if 'error' in scan:
+                report['errors'][scan['table']] = scan['error']
+            else:
+                report['tables'][scan['table']] = {'rows': scan['rows'], 'seconds': scan['seconds']}
+            report['checks'].extend(scan['checks'])
+
+        report['warnings'] = sum(1 for check in report['checks'] if check['status'] != 'ok')
+        report['passed'] = not report['errors']
+
+        logger.info(f"Validation: {len(tables)} table scans, {len(report['checks'])} checks, "
+                    f"{report['warnings']} warnings, {len(report['errors'])} errors in {report['seconds']}s")
+        for table, error in report['errors'].items():
+            logger.error(f"Validation scan of {table} failed: {error}")
+        return report
+
+def save_report(report: Dict[str, Any], path: Path):
+    """Write a validation or quality report as JSON"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    logger.info(f"Report written to {path}")
@@ -0,0 +1,16 @@
+-- Foreign key constraints for the property database
+-- Applied after indexes.sql, so every constraint finds its index already
+-- built. When added with foreign_key_checks = 0 MySQL does not re-check
+-- existing rows, so the ETL verifies integrity with one scan per table.
+
+ALTER TABLE properties
+    ADD CONSTRAINT fk_properties_location FOREIGN KEY (location_id) REFERENCES property_locations(location_id);
+
+ALTER TABLE hoa_details
+    ADD CONSTRAINT fk_hoa_property FOREIGN KEY (property_id) REFERENCES properties(property_id);
+
+ALTER TABLE property_valuations
+    ADD CONSTRAINT fk_valuations_property FOREIGN KEY (property_id) REFERENCES properties(property_id);
+
+ALTER TABLE rehab_estimates
+    ADD CONSTRAINT fk_rehab_property FOREIGN KEY (property_id) REFERENCES properties(property_id);
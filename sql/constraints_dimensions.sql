@@ -0,0 +1,18 @@
+-- Foreign keys from the fact tables to their lookup tables
+-- Applied after constraints.sql when ETL_CONFIG['dimension_tables'] is
+-- enabled. Columns without an index in indexes_dimensions.sql get one
+-- from MySQL when the constraint is added.
+
+ALTER TABLE properties
+    ADD CONSTRAINT fk_properties_type FOREIGN KEY (property_type_id) REFERENCES property_types(property_type_id),
+    ADD CONSTRAINT fk_properties_condition FOREIGN KEY (property_condition_id) REFERENCES property_conditions(property_condition_id),
+    ADD CONSTRAINT fk_properties_listing_status FOREIGN KEY (listing_status_id) REFERENCES listing_statuses(listing_status_id);
+
+ALTER TABLE property_valuations
+    ADD CONSTRAINT fk_valuations_type FOREIGN KEY (valuation_type_id) REFERENCES valuation_types(valuation_type_id),
+    ADD CONSTRAINT fk_valuations_source FOREIGN KEY (valuation_source_id) REFERENCES valuation_sources(valuation_source_id),
+    ADD CONSTRAINT fk_valuations_confidence FOREIGN KEY (confidence_level_id) REFERENCES confidence_levels(confidence_level_id);
+
+ALTER TABLE rehab_estimates
+    ADD CONSTRAINT fk_rehab_type FOREIGN KEY (estimate_type_id) REFERENCES estimate_types(estimate_type_id),
+    ADD CONSTRAINT fk_rehab_status FOREIGN KEY (status_id) REFERENCES estimate_statuses(status_id);
@@ -0,0 +1,88 @@
+-- Lookup tables for low-cardinality columns
+-- Applied after schema.sql (with either key type) when
+-- ETL_CONFIG['dimension_tables'] is enabled (see DIMENSIONS in config.py).
+-- Each categorical text column of a fact table is replaced by a TINYINT or
+-- SMALLINT id into a lookup table holding every distinct value once, which
+-- makes the fact rows and the indexes on those columns narrower. Values use
+-- a binary collation so the lookup is exact, like the ETL's own dictionary.
+
+DROP TABLE IF EXISTS property_types;
+DROP TABLE IF EXISTS property_conditions;
+DROP TABLE IF EXISTS listing_statuses;
+DROP TABLE IF EXISTS valuation_types;
+DROP TABLE IF EXISTS valuation_sources;
+DROP TABLE IF EXISTS confidence_levels;
+DROP TABLE IF EXISTS estimate_types;
+DROP TABLE IF EXISTS estimate_statuses;
+
+CREATE TABLE property_types (
+    property_type_id SMALLINT UNSIGNED PRIMARY KEY,
+    property_type VARCHAR(50) COLLATE utf8mb4_bin NOT NULL,
+    UNIQUE KEY uq_property_types (property_type)
+);
+
+CREATE TABLE property_conditions (
+    property_condition_id SMALLINT UNSIGNED PRIMARY KEY,
+    property_condition VARCHAR(50) COLLATE utf8mb4_bin NOT NULL,
+    UNIQUE KEY uq_property_conditions (property_condition)
+);
+
+CREATE TABLE listing_statuses (
+    listing_status_id SMALLINT UNSIGNED PRIMARY KEY,
+    listing_status VARCHAR(50) COLLATE utf8mb4_bin NOT NULL,
+    UNIQUE KEY uq_listing_statuses (listing_status)
+);
+
+CREATE TABLE valuation_types (
+    valuation_type_id TINYINT UNSIGNED PRIMARY KEY,
+    valuation_type VARCHAR(50) COLLATE utf8mb4_bin NOT NULL,
+    UNIQUE KEY uq_valuation_types (valuation_type)
+);
+
+CREATE TABLE valuation_sources (
+    valuation_source_id TINYINT UNSIGNED PRIMARY KEY,
+    valuation_source VARCHAR(100) COLLATE utf8mb4_bin NOT NULL,
+    UNIQUE KEY uq_valuation_sources (valuation_source)
+);
+
+CREATE TABLE confidence_levels (
+    confidence_level_id TINYINT UNSIGNED PRIMARY KEY,
+    confidence_level VARCHAR(20) COLLATE utf8mb4_bin NOT NULL,
+    UNIQUE KEY uq_confidence_levels (confidence_level)
+);
+
+CREATE TABLE estimate_types (
+    estimate_type_id TINYINT UNSIGNED PRIMARY KEY,
+    estimate_type VARCHAR(50) COLLATE utf8mb4_bin NOT NULL,
+    UNIQUE KEY uq_estimate_types (estimate_type)
+);
+
+CREATE TABLE estimate_statuses (
+    status_id TINYINT UNSIGNED PRIMARY KEY,
+    status VARCHAR(50) COLLATE utf8mb4_bin NOT NULL,
+    UNIQUE KEY uq_estimate_statuses (status)
+);
+
+-- The fact tables are still empty here, so the ALTERs only change metadata
+
+ALTER TABLE properties
+    DROP COLUMN property_type,
+    DROP COLUMN property_condition,
+    DROP COLUMN listing_status,
+    ADD COLUMN property_type_id SMALLINT UNSIGNED AFTER location_id,
+    ADD COLUMN property_condition_id SMALLINT UNSIGNED AFTER basement,
+    ADD COLUMN listing_status_id SMALLINT UNSIGNED AFTER property_condition_id;
+
+ALTER TABLE property_valuations
+    DROP COLUMN valuation_type,
+    DROP COLUMN valuation_source,
+    DROP COLUMN confidence_level,
+    ADD COLUMN valuation_type_id TINYINT UNSIGNED AFTER property_id,
+    ADD COLUMN valuation_source_id TINYINT UNSIGNED AFTER valuation_date,
+    ADD COLUMN confidence_level_id TINYINT UNSIGNED AFTER valuation_source_id;
+
+ALTER TABLE rehab_estimates
+    DROP COLUMN estimate_type,
+    DROP COLUMN status,
+    ADD COLUMN estimate_type_id TINYINT UNSIGNED AFTER property_id,
+    ADD COLUMN status_id TINYINT UNSIGNED AFTER contingency_percentage;
@@ -0,0 +1,38 @@
+-- Secondary indexes for the property database
+-- Applied after schema.sql (with either key type). With
+-- ETL_CONFIG['defer_indexes'] enabled they are built once the data is loaded.
+-- One ALTER TABLE per table, so each table is read once to build all of its
+-- indexes, and the statements can run in parallel.
+
+ALTER TABLE property_locations
+    ADD INDEX idx_locations_city (city),
+    ADD INDEX idx_locations_state (state),
+    ADD INDEX idx_locations_zip (zip_code);
+
+ALTER TABLE properties
+    ADD INDEX idx_properties_location (location_id),
+    ADD INDEX idx_properties_type (property_type),
+    ADD INDEX idx_properties_bedrooms (bedrooms),
+    ADD INDEX idx_properties_bathrooms (bathrooms),
+    ADD INDEX idx_properties_year_built (year_built);
+
+ALTER TABLE hoa_details
+    ADD INDEX idx_hoa_property (property_id),
+    ADD INDEX idx_hoa_monthly_fee (monthly_fee);
+
+ALTER TABLE property_valuations
+    ADD INDEX idx_valuations_property (property_id),
+    ADD INDEX idx_valuations_type (valuation_type),
+    ADD INDEX idx_valuations_date (valuation_date),
+    ADD INDEX idx_valuations_amount (valuation_amount);
+
+ALTER TABLE rehab_estimates
+    ADD INDEX idx_rehab_property (property_id),
+    ADD INDEX idx_rehab_type (estimate_type),
+    ADD INDEX idx_rehab_cost (estimated_cost),
+    ADD INDEX idx_rehab_status (status);
+
+ALTER TABLE property_summary
+    ADD INDEX idx_summary_state_city (state, city),
+    ADD INDEX idx_summary_zip (zip_code),
+    ADD INDEX idx_summary_type (property_type);
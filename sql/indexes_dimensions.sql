@@ -0,0 +1,37 @@
+-- Secondary indexes for the property database with dimension tables
+-- Used instead of indexes.sql when ETL_CONFIG['dimension_tables'] is enabled.
+-- The same indexes, with the categorical columns indexed by their
+-- TINYINT/SMALLINT ids (1-2 bytes per entry instead of up to 200).
+
+ALTER TABLE property_locations
+    ADD INDEX idx_locations_city (city),
+    ADD INDEX idx_locations_state (state),
+    ADD INDEX idx_locations_zip (zip_code);
+
+ALTER TABLE properties
+    ADD INDEX idx_properties_location (location_id),
+    ADD INDEX idx_properties_type (property_type_id),
+    ADD INDEX idx_properties_bedrooms (bedrooms),
+    ADD INDEX idx_properties_bathrooms (bathrooms),
+    ADD INDEX idx_properties_year_built (year_built);
+
+ALTER TABLE hoa_details
+    ADD INDEX idx_hoa_property (property_id),
+    ADD INDEX idx_hoa_monthly_fee (monthly_fee);
+
+ALTER TABLE property_valuations
+    ADD INDEX idx_valuations_property (property_id),
+    ADD INDEX idx_valuations_type (valuation_type_id),
+    ADD INDEX idx_valuations_date (valuation_date),
+    ADD INDEX idx_valuations_amount (valuation_amount);
+
+ALTER TABLE rehab_estimates
+    ADD INDEX idx_rehab_property (property_id),
+    ADD INDEX idx_rehab_type (estimate_type_id),
+    ADD INDEX idx_rehab_cost (estimated_cost),
+    ADD INDEX idx_rehab_status (status_id);
+
+ALTER TABLE property_summary
+    ADD INDEX idx_summary_state_city (state, city),
+    ADD INDEX idx_summary_zip (zip_code),
+    ADD INDEX idx_summary_type (property_type);
@@ -1,11 +1,17 @@
 -- Database Schema for Property Management System
 -- This schema normalizes property data into related tables
+-- Key columns are written as <name>_id VARCHAR(36); with
+-- ETL_CONFIG['key_strategy'] = 'uuid7_binary' they become BINARY(16) when the
+-- schema is created (utils.schema_script), so this is the only copy
 
 -- Create database if it doesn't exist
 CREATE DATABASE IF NOT EXISTS property_db;
 USE property_db;
 
 -- Drop tables if they exist (for development)
+DROP VIEW IF EXISTS property_summary;
+DROP TABLE IF EXISTS property_summary;
+DROP TABLE IF EXISTS etl_record_hashes;
 DROP TABLE IF EXISTS rehab_estimates;
 DROP TABLE IF EXISTS property_valuations;
 DROP TABLE IF EXISTS hoa_details;
@@ -47,9 +53,7 @@ CREATE TABLE properties (
     listing_status VARCHAR(50),
     mls_number VARCHAR(50),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    
-    FOREIGN KEY (location_id) REFERENCES property_locations(location_id)
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 -- 3. HOA Details Table
@@ -64,9 +68,7 @@ CREATE TABLE hoa_details (
     amenities TEXT,
     restrictions TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    
-    FOREIGN KEY (property_id) REFERENCES properties(property_id)
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 -- 4. Property Valuations Table
@@ -81,9 +83,7 @@ CREATE TABLE property_valuations (
     confidence_level VARCHAR(20),
     notes TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    
-    FOREIGN KEY (property_id) REFERENCES properties(property_id)
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 -- 5. Rehab Estimates Table
@@ -103,58 +103,41 @@ CREATE TABLE rehab_estimates (
     contingency_percentage DECIMAL(5,2),
     status VARCHAR(50), -- 'draft', 'approved', 'completed', etc.
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    
-    FOREIGN KEY (property_id) REFERENCES properties(property_id)
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
--- Add indexes for better performance
-CREATE INDEX idx_properties_location ON properties(location_id);
-CREATE INDEX idx_properties_type ON properties(property_type);
-CREATE INDEX idx_properties_bedrooms ON properties(bedrooms);
-CREATE INDEX idx_properties_bathrooms ON properties(bathrooms);
-CREATE INDEX idx_properties_year_built ON properties(year_built);
-
-CREATE INDEX idx_hoa_property ON hoa_details(property_id);
-CREATE INDEX idx_hoa_monthly_fee ON hoa_details(monthly_fee);
-
-CREATE INDEX idx_valuations_property ON property_valuations(property_id);
-CREATE INDEX idx_valuations_type ON property_valuations(valuation_type);
-CREATE INDEX idx_valuations_date ON property_valuations(valuation_date);
-CREATE INDEX idx_valuations_amount ON property_valuations(valuation_amount);
-
-CREATE INDEX idx_rehab_property ON rehab_estimates(property_id);
-CREATE INDEX idx_rehab_type ON rehab_estimates(estimate_type);
-CREATE INDEX idx_rehab_cost ON rehab_estimates(estimated_cost);
-CREATE INDEX idx_rehab_status ON rehab_estimates(status);
+-- 6. ETL Record Hashes Table
+-- Content hash per property, used by incremental loads to skip unchanged records
+CREATE TABLE etl_record_hashes (
+    property_id VARCHAR(36) PRIMARY KEY,
+    content_hash CHAR(32) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
 
-CREATE INDEX idx_locations_city ON property_locations(city);
-CREATE INDEX idx_locations_state ON property_locations(state);
-CREATE INDEX idx_locations_zip ON property_locations(zip_code);
+-- Secondary indexes and foreign keys are kept in indexes.sql and
+-- constraints.sql so that bulk loads can build them after the data is in
 
--- Create a view for easy property data retrieval
-CREATE VIEW property_summary AS
-SELECT 
-    p.property_id,
-    p.property_type,
-    p.bedrooms,
-    p.bathrooms,
-    p.square_footage,
-    p.year_built,
-    CONCAT(pl.address_line_1, ', ', pl.city, ', ', pl.state, ' ', pl.zip_code) as full_address,
-    pl.city,
-    pl.state,
-    pl.zip_code,
-    h.hoa_name,
-    h.monthly_fee as hoa_monthly_fee,
-    pv.valuation_amount as current_market_value,
-    pv.valuation_date as valuation_date,
-    re.estimated_cost as rehab_estimate,
-    re.estimate_date as rehab_estimate_date
-FROM properties p
-LEFT JOIN property_locations pl ON p.location_id = pl.location_id
-LEFT JOIN hoa_details h ON p.property_id = h.property_id
-LEFT JOIN property_valuations pv ON p.property_id = pv.property_id 
-    AND pv.valuation_type = 'market'
-LEFT JOIN rehab_estimates re ON p.property_id = re.property_id 
-    AND re.status = 'approved';
\ No newline at end of file
+-- 7. Property Summary Table
+-- One row per property, materialized from the tables above by
+-- scripts/summary.py: the latest market valuation, the latest approved
+-- rehab estimate and the latest HOA record. Refreshed by the ETL for the
+-- properties each run touches; `python3 summary.py` rebuilds it in full.
+CREATE TABLE property_summary (
+    property_id VARCHAR(36) PRIMARY KEY,
+    property_type VARCHAR(50),
+    bedrooms INT,
+    bathrooms DECIMAL(3,1),
+    square_footage INT,
+    year_built INT,
+    full_address VARCHAR(700),
+    city VARCHAR(100),
+    state VARCHAR(50),
+    zip_code VARCHAR(20),
+    hoa_name VARCHAR(255),
+    hoa_monthly_fee DECIMAL(10,2),
+    current_market_value DECIMAL(15,2),
+    valuation_date DATE,
+    rehab_estimate DECIMAL(15,2),
+    rehab_estimate_date DATE,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
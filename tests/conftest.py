@@ -0,0 +1,10 @@
+"""
+Shared pytest setup
+The pipeline modules are flat scripts importing each other by name, so the
+scripts directory goes on sys.path
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
@@ -0,0 +1,218 @@
+"""
+Checkpointed chunked runs resumed after a failure
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pytest
+
+from checkpoint import RunCheckpoint
+from config import ETL_CONFIG, LOAD_ORDER
+from etl import PropertyETL
+from generate_data import SyntheticDataGenerator
+from sources import InputSource
+
+BATCH_SIZE = 10
+
+# Records per input file; the first file ends exactly at a batch boundary
+FILE_RECORDS = {'part-1.ndjson': 20, 'part-2.ndjson': 30}
+
+LOCATION_FIELDS = ['street_address', 'city', 'state', 'zip_code', 'county', 'latitude', 'longitude']
+
+class FakeDatabase:
+    """Stands in for DatabaseManager: the schema exists and every statement succeeds"""
+
+    def __init__(self, pool: bool):
+        self.pool = object() if pool else None
+
+    def execute_query(self, query: str, params: Optional[tuple] = None, commit: bool = True, fetch: bool = True):
+        return [(1,)]
+
+    def use_database(self, database: str):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+class FakeLoader:
+    """Stands in for PropertyETL.load_data, keeping the rows of every committed table
+
+    The load call numbered fail_call fails after committing the tables in
+    commit_before_failing, as a crash part way through a batch would.
+    """
+
+    def __init__(self, pool: bool, fail_call: Optional[int] = None, commit_before_failing: List[str] = ()):
+        self.pool = pool
+        self.fail_call = fail_call
+        self.commit_before_failing = commit_before_failing
+        self.calls: List[Dict[str, Any]] = []
+        self.committed: Dict[str, List[Any]] = {table_key: [] for table_key in LOAD_ORDER}
+
+    def __call__(self, transformed_data: Dict[str, List[Any]], commit_per_table: bool = True,
+                 tables: Optional[List[str]] = None, on_commit: Optional[Callable[[str, int], None]] = None):
+        self.calls.append({'tables': list(tables), 'data': transformed_data})
+        failing = len(self.calls) == self.fail_call
+        for table_key in (self.commit_before_failing if failing else tables):
+            self.committed[table_key] += transformed_data[table_key]
+            if self.pool:
+                on_commit(table_key, len(transformed_data[table_key]))
+        if failing:
+            raise RuntimeError('Lost the database mid-batch')
+
+@pytest.fixture(autouse=True)
+def chunked_settings(monkeypatch):
+    for key, value in {'batch_size': BATCH_SIZE, 'chunked': True, 'pipelined': False, 'workers': 1,
+                       'checkpoint': True, 'incremental': False, 'staging': False,
+                       'dimension_tables': False, 'dedupe_locations': True}.items():
+        monkeypatch.setitem(ETL_CONFIG, key, value)
+
+@pytest.fixture
+def input_dir(tmp_path) -> Path:
+    directory = tmp_path / 'input'
+    directory.mkdir()
+    records = list(SyntheticDataGenerator(seed=21).iter_records(sum(FILE_RECORDS.values())))
+    for number, record in enumerate(records):
+        record['mls_number'] = f"MLS{number:05d}"
+    # Addresses of the first batch seen again after the failure point
+    for number in (25, 45):
+        records[number].update((field, records[3].get(field)) for field in LOCATION_FIELDS)
+    start = 0
+    for name, count in FILE_RECORDS.items():
+        (directory / name).write_text(''.join(json.dumps(record) + '\n' for record in records[start:start + count]))
+        start += count
+    return directory
+
+def make_etl(input_dir: Path, loader: FakeLoader, resume: bool = False) -> PropertyETL:
+    etl = PropertyETL(resume=resume, input_source=str(input_dir))
+    etl.checkpoint = RunCheckpoint(input_dir.parent / 'checkpoint')
+    etl.input_source.on_file = etl.checkpoint.file_read
+    etl.db_manager = FakeDatabase(loader.pool)
+    etl.load_data = loader
+    return etl
+
+def run(input_dir: Path, loader: FakeLoader) -> PropertyETL:
+    etl = make_etl(input_dir, loader)
+    etl.checkpoint.start(etl.input_source)
+    etl.checkpoint.update_manifest(bulk_session=False)
+    etl.run_batches()
+    return etl
+
+def resume(input_dir: Path, loader: FakeLoader) -> PropertyETL:
+    etl = make_etl(input_dir, loader, resume=True)
+    assert etl.resume_checkpoint()
+    etl.resume_schema()
+    etl.run_batches()
+    return etl
+
+def mls_numbers(rows: List[Any]) -> List[str]:
+    return [row.mls_number for row in rows]
+
+@pytest.fixture
+def uninterrupted(input_dir) -> FakeLoader:
+    loader = FakeLoader(pool=False)
+    run(input_dir, loader)
+    return loader
+
+def test_resume_loads_every_record_once(input_dir, uninterrupted):
+    loader = FakeLoader(pool=False, fail_call=3)
+    with pytest.raises(RuntimeError):
+        run(input_dir, loader)
+    assert len(mls_numbers(loader.committed['properties'])) == 2 * BATCH_SIZE
+
+    resumed = FakeLoader(pool=False)
+    etl = resume(input_dir, resumed)
+
+    loaded = {table_key: loader.committed[table_key] + resumed.committed[table_key] for table_key in LOAD_ORDER}
+    assert mls_numbers(loaded['properties']) == mls_numbers(uninterrupted.committed['properties'])
+    for table_key in LOAD_ORDER:
+        # Locations de-duplicated before the failure are not emitted again
+        assert len(loaded[table_key]) == len(uninterrupted.committed[table_key]), table_key
+    assert len(loaded['locations']) == len(loaded['properties']) - 2
+    assert sorted(etl.checkpoint.batches) == [1, 2, 3, 4, 5]
+
+def test_truncated_journal_entry_is_ignored(input_dir, uninterrupted):
+    loader = FakeLoader(pool=False, fail_call=4)
+    with pytest.raises(RuntimeError):
+        run(input_dir, loader)
+    journal = input_dir.parent / 'checkpoint' / 'journal.jsonl'
+    with open(journal, 'a', encoding='utf-8') as file:
+        file.write('{"event": "batch", "batch": 4, "st')
+
+    resumed = FakeLoader(pool=False)
+    etl = resume(input_dir, resumed)
+
+    assert etl.checkpoint.records_done == sum(FILE_RECORDS.values())
+    assert mls_numbers(loader.committed['properties'] + resumed.committed['properties']) == \
+        mls_numbers(uninterrupted.committed['properties'])
+
+def test_files_read_to_the_end_are_not_opened_again(input_dir):
+    with pytest.raises(RuntimeError):
+        run(input_dir, FakeLoader(pool=False, fail_call=3))
+
+    etl = resume(input_dir, FakeLoader(pool=False))
+
+    assert etl.checkpoint.file_records[str(input_dir / 'part-1.ndjson')] == FILE_RECORDS['part-1.ndjson']
+    assert [stats['first_record'] for stats in etl.input_source.stats] == [None, FILE_RECORDS['part-1.ndjson']]
+
+def test_changed_input_is_refused(input_dir):
+    with pytest.raises(RuntimeError):
+        run(input_dir, FakeLoader(pool=False, fail_call=2))
+
+    with open(input_dir / 'part-2.ndjson', 'a', encoding='utf-8') as file:
+        file.write(json.dumps({'mls_number': 'MLS99999', 'address': '1 New St'}) + '\n')
+    with pytest.raises(RuntimeError, match='input_files changed'):
+        make_etl(input_dir, FakeLoader(pool=False), resume=True).resume_checkpoint()
+
+    (input_dir / 'part-2.ndjson').unlink()
+    with pytest.raises(RuntimeError, match='input_files changed'):
+        make_etl(input_dir, FakeLoader(pool=False), resume=True).resume_checkpoint()
+
+def test_changed_settings_are_refused(input_dir, monkeypatch):
+    with pytest.raises(RuntimeError):
+        run(input_dir, FakeLoader(pool=False, fail_call=2))
+
+    monkeypatch.setitem(ETL_CONFIG, 'key_strategy', 'uuid7_binary')
+    with pytest.raises(RuntimeError, match='settings changed'):
+        make_etl(input_dir, FakeLoader(pool=False), resume=True).resume_checkpoint()
+
+def test_half_committed_batch_is_completed_from_its_spill(input_dir, uninterrupted):
+    loader = FakeLoader(pool=True, fail_call=3, commit_before_failing=['locations', 'properties'])
+    with pytest.raises(RuntimeError):
+        run(input_dir, loader)
+    checkpoint_dir = input_dir.parent / 'checkpoint'
+    assert [path.name for path in checkpoint_dir.glob('batch_*.pickle')] == ['batch_3.pickle']
+
+    resumed = FakeLoader(pool=True)
+    etl = resume(input_dir, resumed)
+
+    # The spilled batch is finished first, with only its uncommitted tables
+    # and the keys its committed properties were written with
+    spilled = resumed.calls[0]
+    assert spilled['tables'] == [table_key for table_key in LOAD_ORDER if table_key not in ('locations', 'properties')]
+    written = {row.property_id for row in loader.calls[2]['data']['properties']}
+    assert spilled['data']['properties'] == loader.calls[2]['data']['properties']
+    assert all(row.property_id in written for row in spilled['data']['valuations'])
+
+    assert not list(checkpoint_dir.glob('batch_*.pickle'))
+    assert sorted(etl.checkpoint.batches) == [1, 2, 3, 4, 5]
+    for table_key in LOAD_ORDER:
+        assert len(loader.committed[table_key] + resumed.committed[table_key]) == \
+            len(uninterrupted.committed[table_key]), table_key
+
+def test_known_leading_files_are_skipped_unopened(tmp_path):
+    first, second = tmp_path / 'a.ndjson', tmp_path / 'b.ndjson'
+    # Opening the first file would fail
+    first.write_text('not json\n')
+    second.write_text(''.join(json.dumps({'id': number}) + '\n' for number in range(10)))
+    source = InputSource(tmp_path / '*.ndjson', readers=1)
+
+    records = list(source.records(skip=12, known_records={str(first): 10}))
+
+    assert records == [{'id': number} for number in range(2, 10)]
+    assert source.stats[0]['first_record'] is None
+    assert source.stats[1]['first_record'] == 10
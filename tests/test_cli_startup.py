@@ -0,0 +1,15 @@
+"""
+Import-time budget of the quick cli.py commands
+"""
+
+import pytest
+
+from cli import HEAVY_MODULES, STARTUP_BUDGET_MS, STARTUP_COMMANDS, measure_startup
+
+@pytest.mark.parametrize('command', sorted(STARTUP_COMMANDS))
+def test_quick_command_starts_within_budget(command):
+    result = measure_startup(STARTUP_COMMANDS[command])
+
+    # Checked first: a heavy import is the usual reason for a blown budget
+    assert result['heavy'] == [], f"{command} imports {', '.join(result['heavy'])} (never allowed: {HEAVY_MODULES})"
+    assert result['ms'] < STARTUP_BUDGET_MS, f"{command} imports in {result['ms']:.1f} ms"
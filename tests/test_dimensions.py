@@ -0,0 +1,105 @@
+"""
+Lookup ids of categorical columns and the SQL that reads them
+"""
+
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from config import DIMENSIONS, ETL_CONFIG
+from dimensions import DimensionIndex, equals_sql, value_sql
+from etl import PropertyETL
+from generate_data import SyntheticDataGenerator
+
+class FakeDatabase:
+    """Stands in for DatabaseManager: canned lookup tables, writes recorded"""
+
+    def __init__(self, stored: Optional[Dict[str, List[tuple]]] = None):
+        self.stored = stored or {}
+        self.upserts: Dict[str, List[Dict[str, Any]]] = {}
+        self.commits = 0
+
+    def execute_query(self, query: str, params: Optional[tuple] = None, commit: bool = True, fetch: bool = True):
+        return self.stored.get(query.split(' FROM ')[1], [])
+
+    def upsert_batch(self, table: str, data: List[Dict[str, Any]], key_columns: List[str], commit: bool = True) -> int:
+        self.upserts.setdefault(table, []).extend(data)
+        return len(data)
+
+    def commit(self):
+        self.commits += 1
+
+@pytest.fixture
+def dimension_tables(monkeypatch):
+    monkeypatch.setitem(ETL_CONFIG, 'dimension_tables', True)
+
+def test_sql_reads_text_columns_directly_without_dimension_tables(monkeypatch):
+    monkeypatch.setitem(ETL_CONFIG, 'dimension_tables', False)
+    assert value_sql('properties', 'property_type', 'p') == 'p.property_type'
+    assert equals_sql('properties', 'listing_status', 'Active') == "listing_status = 'Active'"
+
+def test_sql_goes_through_the_lookup_table(dimension_tables):
+    assert value_sql('properties', 'property_type', 'p') == \
+        '(SELECT d.property_type FROM property_types d WHERE d.property_type_id = p.property_type_id)'
+    assert equals_sql('properties', 'listing_status', 'Active') == \
+        "listing_status_id = (SELECT listing_status_id FROM listing_statuses WHERE listing_status = 'Active')"
+    # Columns without a lookup table are unchanged
+    assert value_sql('properties', 'city', 'p') == 'p.city'
+    assert equals_sql('properties', 'mls_number', 'X1') == "mls_number = 'X1'"
+
+def test_ids_are_numbered_from_one_in_first_seen_order():
+    index = DimensionIndex()
+    assert [index.id_of('property_types', value) for value in ('Condo', 'Ranch', 'Condo', 'Townhouse')] == [1, 2, 1, 3]
+    assert index.id_of('listing_statuses', 'Sold') == 1
+    assert index.report()['property_types'] == {'values': 3, 'limit': 65535}
+
+def test_numbering_continues_after_stored_values():
+    database = FakeDatabase({'property_types': [(1, 'Condo'), (4, 'Ranch')]})
+    index = DimensionIndex()
+    index.load(database)
+
+    assert index.id_of('property_types', 'Ranch') == 4
+    assert index.id_of('property_types', 'Duplex') == 5
+    assert index.size() == 3
+
+def test_full_lookup_table_is_refused():
+    index = DimensionIndex()
+    index.limits['estimate_statuses'] = 2
+    index.id_of('estimate_statuses', 'draft')
+    index.id_of('estimate_statuses', 'final')
+    with pytest.raises(ValueError, match='estimate_statuses is full'):
+        index.id_of('estimate_statuses', 'approved')
+
+def test_encoded_rows_hold_the_ids_of_their_values():
+    tables = PropertyETL().transform_data(list(SyntheticDataGenerator(seed=9).iter_records(200)))
+    index = DimensionIndex()
+    index.observe(tables)
+
+    for name, (table_key, column, _) in DIMENSIONS.items():
+        values = [getattr(row, column) for row in tables[table_key]]
+        encoded = index.encode(table_key, tables[table_key])
+        ids = [getattr(row, f"{column}_id") for row in encoded]
+        assert ids == [None if value is None else index.ids[name][value] for value in values], name
+        assert sorted(index.ids[name].values()) == list(range(1, len(index.ids[name]) + 1))
+
+    # Tables without dimension columns pass through unchanged
+    assert index.encode('locations', tables['locations']) is tables['locations']
+
+def test_lookup_rows_are_written_until_a_commit_includes_them():
+    database = FakeDatabase()
+    index = DimensionIndex()
+    index.id_of('property_types', 'Condo')
+
+    index.write(database, commit=False)
+    index.write(database, commit=False)
+    assert database.upserts['property_types'] == [{'property_type_id': 1, 'property_type': 'Condo'}] * 2
+
+    index.committed()
+    index.id_of('property_types', 'Ranch')
+    index.write(database, commit=True)
+    assert database.upserts['property_types'][-1] == {'property_type_id': 2, 'property_type': 'Ranch'}
+    assert database.commits == 1
+
+    database.upserts.clear()
+    index.write(database, commit=True)
+    assert database.upserts == {} and database.commits == 1
@@ -0,0 +1,49 @@
+"""
+Compiled field mappings against the hand-written lookups they replaced
+"""
+
+from typing import Any, Dict
+
+import pytest
+
+from field_mapping import get_field_mapping
+
+RECORDS = [
+    {'bedrooms': 0, 'beds': 3},
+    {'bedrooms': None, 'beds': 3},
+    {'bedrooms': '', 'beds': '2'},
+    {'bedrooms': '0', 'beds': 2},
+    {'bedrooms': 2, 'beds': 5},
+    {'beds': '4'},
+    {'bedrooms': 0},
+    {'beds': None},
+    {},
+    {'square_footage': 0, 'sqft': 1800},
+    {'square_footage': None, 'sqft': 1800},
+    {'sqft': '1500'}
+]
+
+def original_lookups(record: Dict[str, Any]) -> Dict[str, Any]:
+    """The integer columns as the transform computed them before the mappings were compiled"""
+    return {
+        'bedrooms': int(record.get('bedrooms', record.get('beds', 0))) if record.get('bedrooms') or record.get('beds') else None,
+        'square_footage': int(record.get('square_footage', record.get('sqft', 0))) if record.get('square_footage') or record.get('sqft') else None
+    }
+
+@pytest.mark.parametrize('record', RECORDS, ids=repr)
+def test_integer_aliases_fall_back_like_the_original_lookups(record):
+    build = get_field_mapping().builders['properties']
+    try:
+        expected = original_lookups(record)
+    except (TypeError, ValueError) as e:
+        # The record was skipped as a transform error, and still is
+        with pytest.raises(type(e)):
+            build(record, 'property', 'location')
+        return
+
+    row = build(record, 'property', 'location')
+    assert {'bedrooms': row.bedrooms, 'square_footage': row.square_footage} == expected
+
+def test_falsy_first_alias_is_converted_when_another_is_truthy():
+    row = get_field_mapping().builders['properties']({'bedrooms': 0, 'beds': 3}, 'property', 'location')
+    assert row.bedrooms == 0
@@ -0,0 +1,71 @@
+"""
+Stable keys, content hashes and the delta written by incremental loads
+"""
+
+from typing import Any, Dict, List, Optional
+
+from etl import PropertyETL
+from generate_data import SyntheticDataGenerator
+from incremental import HASH_TABLE, IncrementalLoader, assign_stable_keys
+
+RECORDS = list(SyntheticDataGenerator(seed=5).iter_records(50))
+
+class FakeDatabase:
+    """Stands in for DatabaseManager: the hash table in memory, writes recorded"""
+
+    def __init__(self):
+        self.hashes: Dict[Any, str] = {}
+        self.upserts: Dict[str, int] = {}
+        self.deleted = set()
+
+    def execute_query(self, query: str, params: Optional[tuple] = None, commit: bool = True, fetch: bool = True):
+        if query.startswith('SELECT'):
+            return [(pid, self.hashes[pid]) for pid in params if pid in self.hashes]
+        if query.startswith('DELETE'):
+            self.deleted.update(params)
+
+    def upsert_batch(self, table: str, data: List[Any], key_columns: List[str], commit: bool = True) -> int:
+        self.upserts[table] = self.upserts.get(table, 0) + len(data)
+        if table == HASH_TABLE:
+            self.hashes.update((row['property_id'], row['content_hash']) for row in data)
+        return len(data)
+
+def transform(records: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    return PropertyETL().transform_data(records)
+
+def test_same_records_get_the_same_keys_in_every_run():
+    first, first_hashes = assign_stable_keys(transform(RECORDS))
+    second, second_hashes = assign_stable_keys(transform(RECORDS))
+
+    assert first == second
+    assert first_hashes == second_hashes
+    assert [row.property_id for row in first['properties']] == list(first_hashes)
+
+def test_changed_field_changes_only_that_propertys_hash():
+    changed = [dict(record) for record in RECORDS]
+    changed[3]['sqft'] = 9999
+
+    _, before = assign_stable_keys(transform(RECORDS))
+    _, after = assign_stable_keys(transform(changed))
+
+    assert before.keys() == after.keys()
+    assert [pid for pid in before if before[pid] != after[pid]] == [list(before)[3]]
+
+def test_unchanged_properties_are_not_written_again():
+    database = FakeDatabase()
+    loader = IncrementalLoader(database)
+
+    assert loader.load(transform(RECORDS)) == {'inserted': 50, 'updated': 0, 'unchanged': 0}
+    assert database.upserts['properties'] == 50
+
+    database.upserts.clear()
+    assert loader.load(transform(RECORDS)) == {'inserted': 0, 'updated': 0, 'unchanged': 50}
+    assert database.upserts == {}
+    assert loader.last_changed == []
+
+    changed = [dict(record) for record in RECORDS]
+    changed[3]['sqft'] = 9999
+    assert loader.load(transform(changed)) == {'inserted': 0, 'updated': 1, 'unchanged': 49}
+    assert database.upserts['properties'] == 1
+    assert database.deleted == set(loader.last_changed)
+    assert loader.totals == {'inserted': 50, 'updated': 1, 'unchanged': 99}
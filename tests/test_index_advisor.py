@@ -0,0 +1,142 @@
+"""
+Index advice from canned EXPLAIN plans, and the proposed indexes file
+"""
+
+import json
+import shutil
+from typing import Any, Dict, List, Optional
+
+from config import INDEXES_FILE
+from index_advisor import (IndexAdvisor, SchemaCatalog, equality_columns, proposed_indexes_sql, script_indexes,
+                           table_accesses)
+
+QUERY = "SELECT SUM(t.valuation_amount) FROM property_valuations t WHERE t.valuation_type = 'market'"
+
+CONDITION = "(`property_db`.`t`.`valuation_type` = 'market')"
+
+def plan(access_type: str, key: Optional[str] = None, used_key_parts: Optional[List[str]] = None) -> str:
+    """EXPLAIN FORMAT=JSON of QUERY as MySQL 8 writes it"""
+    return json.dumps({'query_block': {
+        'select_id': 1,
+        'cost_info': {'query_cost': '1520.25'},
+        'table': {
+            'table_name': 't',
+            'access_type': access_type,
+            'key': key,
+            'used_key_parts': used_key_parts or [],
+            'rows_examined_per_scan': 14800,
+            'filtered': '10.00',
+            'used_columns': ['valuation_id', 'valuation_type', 'valuation_amount'],
+            'attached_condition': CONDITION
+        }
+    }})
+
+class FakeDatabase:
+    """Stands in for DatabaseManager: answers EXPLAIN with a canned plan"""
+
+    def __init__(self, explained: str):
+        self.explained = explained
+
+    def execute_query(self, query: str, params: Optional[tuple] = None, commit: bool = True, fetch: bool = True):
+        assert query == f"EXPLAIN FORMAT=JSON {QUERY}"
+        return [(self.explained,)]
+
+def catalog() -> SchemaCatalog:
+    schema = SchemaCatalog(None)
+    schema.tables = {'property_valuations': {'rows': 148000, 'avg_row_length': 120}}
+    schema.columns = {'property_valuations': {
+        'valuation_id': {'type': 'varchar'}, 'property_id': {'type': 'varchar'},
+        'valuation_type': {'type': 'varchar'}, 'valuation_amount': {'type': 'decimal'},
+        'notes': {'type': 'text'}
+    }}
+    schema.indexes = {'property_valuations': {
+        'PRIMARY': {'columns': ['valuation_id'], 'unique': True},
+        'idx_valuations_type': {'columns': ['valuation_type'], 'unique': False}
+    }}
+    # Sampled VARCHAR widths, as SchemaCatalog.width would measure them
+    schema.widths = {('property_valuations', 'valuation_id'): 37.0, ('property_valuations', 'valuation_type'): 7.5}
+    return schema
+
+def index(table: str, name: str, status: str) -> Dict[str, Any]:
+    return {'table': table, 'index': name, 'status': status, 'insert_share': 0.05}
+
+def test_equality_columns_split_joins_from_constants():
+    condition = ("((`property_db`.`t`.`property_id` = `property_db`.`p`.`property_id`) "
+                 "and (`property_db`.`t`.`valuation_type` = 'market') and (`property_db`.`t`.`notes` like 'x%'))")
+    assert equality_columns(condition, 't') == (['property_id'], ['valuation_type'])
+    assert equality_columns(condition, 'p') == (['property_id'], [])
+    assert equality_columns(None, 't') == ([], [])
+
+def test_accesses_are_found_in_nested_plans():
+    nested = {'query_block': {'nested_loop': [{'table': {'table_name': 't'}},
+                                              {'table': {'table_name': 'p', 'subqueries': [
+                                                  {'query_block': {'table': {'table_name': 'd'}}}]}}]}}
+    assert [access['table_name'] for access in table_accesses(nested)] == ['t', 'p', 'd']
+
+def test_scans_of_a_filtered_column_get_one_covering_index():
+    proposals = []
+    for explained in (plan('ALL'), plan('ref', 'idx_valuations_type', ['valuation_type'])):
+        advisor = IndexAdvisor(FakeDatabase(explained), catalog())
+        report = advisor.run([{'name': 'Market total', 'source': 'test', 'query': QUERY}])
+        assert report['queries'][0]['cost'] == 1520.25
+        proposals.append([(proposal['table'], proposal['columns'], proposal['kind'])
+                          for proposal in report['proposals']])
+
+    assert proposals == [[('property_valuations', ['valuation_type', 'valuation_amount'], 'covering')]] * 2
+
+def test_proposals_fold_into_longer_ones_on_the_same_table():
+    proposals = [
+        {'table': 'properties', 'columns': ['state'], 'queries': ['a']},
+        {'table': 'properties', 'columns': ['state', 'city'], 'queries': ['b']},
+        {'table': 'hoa_details', 'columns': ['state'], 'queries': ['c']}
+    ]
+    merged = IndexAdvisor.merge_proposals(proposals)
+    assert [(proposal['table'], proposal['columns'], proposal['queries']) for proposal in merged] == [
+        ('hoa_details', ['state'], ['c']),
+        ('properties', ['state', 'city'], ['b', 'a'])
+    ]
+
+def test_proposed_file_keeps_foreign_key_and_serving_indexes(tmp_path):
+    indexes_file = tmp_path / 'indexes.sql'
+    shutil.copy(INDEXES_FILE, indexes_file)
+    report = {
+        'generated_at': '2026-10-16T12:00:00',
+        'indexes': [
+            index('properties', 'idx_properties_location', 'foreign key'),
+            index('properties', 'idx_properties_bedrooms', 'unused'),
+            index('properties', 'idx_properties_type', 'used'),
+            index('property_summary', 'idx_summary_zip', 'serving'),
+            index('property_valuations', 'idx_valuations_type', 'used')
+        ],
+        'proposals': [{'table': 'property_valuations', 'columns': ['valuation_type', 'valuation_amount'],
+                       'kind': 'covering', 'queries': ['Market total']}]
+    }
+
+    proposed = proposed_indexes_sql(report, indexes_file)
+    indexes_file.write_text(proposed)
+    before = dict(script_indexes(INDEXES_FILE))
+    after = dict(script_indexes(indexes_file))
+
+    assert list(after) == list(before)
+    assert after['properties'] == [entry for entry in before['properties'] if entry[0] != 'idx_properties_bedrooms']
+    assert after['property_summary'] == before['property_summary']
+    assert ('idx_valuations_type_amount', ['valuation_type', 'valuation_amount']) in after['property_valuations']
+    assert 'idx_valuations_type' not in dict(after['property_valuations'])
+    assert after['hoa_details'] == before['hoa_details']
+
+def test_running_twice_does_not_stack_headers(tmp_path):
+    indexes_file = tmp_path / 'indexes.sql'
+    shutil.copy(INDEXES_FILE, indexes_file)
+    report = {'generated_at': '2026-10-16T12:00:00',
+              'indexes': [index('properties', 'idx_properties_bedrooms', 'unused')], 'proposals': []}
+
+    first = proposed_indexes_sql(report, indexes_file)
+    indexes_file.write_text(first)
+    second = proposed_indexes_sql(report, indexes_file)
+
+    original_header = [line for line in INDEXES_FILE.read_text().splitlines() if line.startswith('--')]
+    header = [line for line in second.splitlines() if line.startswith('--')]
+    assert header[:len(original_header)] == original_header
+    assert sum(line.startswith('-- Proposed by') for line in header) == 1
+    assert header[-1] == '--   no changes'
+    assert second.split('\n\n', 1)[1] == first.split('\n\n', 1)[1]
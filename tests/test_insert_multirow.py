@@ -0,0 +1,97 @@
+"""
+Packet-sized multi-row INSERT statements
+"""
+
+import random
+from typing import Any, List, Optional
+
+import pytest
+
+from config import ETL_CONFIG
+from utils import DatabaseManager
+
+PACKET_BYTES = 4096
+
+COLUMNS = ['property_id', 'address', 'amount', 'notes']
+
+class FakeCursor:
+    """Records each statement with its parameters"""
+
+    def __init__(self):
+        self.statements: List[tuple] = []
+
+    def execute(self, query: str, params: Optional[list] = None):
+        self.statements.append((query, params))
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+def literal(value: Any) -> str:
+    """A parameter as the client sends it in the statement"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, str):
+        return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+    return str(value)
+
+def rendered(query: str, params: list) -> bytes:
+    parts = query.split('%s')
+    assert len(parts) == len(params) + 1
+    return (''.join(part + literal(value) for part, value in zip(parts, params)) + parts[-1]).encode('utf-8')
+
+def database() -> DatabaseManager:
+    manager = DatabaseManager()
+    manager.cursor = FakeCursor()
+    manager.connection = FakeConnection()
+    manager.max_allowed_packet = PACKET_BYTES
+    return manager
+
+def make_rows(count: int) -> List[tuple]:
+    rng = random.Random(3)
+    return [
+        (f"id-{i}", "O'Brien St \\ " + 'é' * rng.randrange(0, 200), rng.random() * 1e6,
+         None if i % 3 else 'x' * rng.randrange(0, 300))
+        for i in range(count)
+    ]
+
+@pytest.mark.parametrize('suffix', ['', ' AS new ON DUPLICATE KEY UPDATE amount = new.amount'])
+def test_statements_fit_the_packet_and_keep_every_row(suffix):
+    manager = database()
+    rows = make_rows(500)
+
+    manager.insert_multirow('properties', COLUMNS, rows, suffix=suffix)
+
+    statements = manager.cursor.statements
+    assert len(statements) > 10
+    sent = []
+    for query, params in statements:
+        assert query.startswith('INSERT INTO properties (property_id, address, amount, notes) VALUES (')
+        assert query.endswith(suffix)
+        assert len(rendered(query, params)) <= PACKET_BYTES
+        assert len(params) % len(COLUMNS) == 0
+        sent.extend(tuple(params[i:i + len(COLUMNS)]) for i in range(0, len(params), len(COLUMNS)))
+    assert sent == rows
+
+def test_commits_every_commit_every_rows(monkeypatch):
+    monkeypatch.setitem(ETL_CONFIG, 'commit_every', 100)
+    manager = database()
+
+    manager.insert_multirow('properties', COLUMNS, make_rows(500))
+    statements = len(manager.cursor.statements)
+    assert 1 < manager.connection.commits < statements
+
+    manager = database()
+    manager.insert_multirow('properties', COLUMNS, make_rows(500), commit=False)
+    assert manager.connection.commits == 0
+
+def test_row_larger_than_the_budget_is_sent_on_its_own():
+    manager = database()
+    rows = [('a', 'small', 1, None), ('b', 'x' * PACKET_BYTES, 2, None), ('c', 'small', 3, None)]
+
+    manager.insert_multirow('properties', COLUMNS, rows)
+
+    assert [len(params) // len(COLUMNS) for _, params in manager.cursor.statements] == [1, 1, 1]
@@ -0,0 +1,62 @@
+"""
+Streaming JSON extraction across read-chunk boundaries
+"""
+
+import io
+import json
+
+import pytest
+
+from utils import DataProcessor
+
+RECORDS = [
+    {'id': 1, 'price': -1.5e-3, 'city': 'Zürich "Old Town"', 'flags': [True, False, None]},
+    {'id': 2, 'note': '\\u1234 ሴ', 'market_value': float('-inf'), 'units': 12345678901234}
+]
+
+DOCUMENTS = {
+    'array': json.dumps(RECORDS),
+    'indented array': json.dumps(RECORDS, indent=2),
+    'ndjson': ''.join(json.dumps(record) + '\n' for record in RECORDS),
+    'empty array': ' [ ] \n'
+}
+
+MALFORMED = {
+    'missing comma': '[{"id": 1} {"id": 2}]',
+    'repeated comma': '[{"id": 1},, {"id": 2}]',
+    'leading comma': '[, {"id": 1}]',
+    'trailing comma': '[{"id": 1},]',
+    'data after array': '[{"id": 1}] {"id": 2}',
+    'second array': '[{"id": 1}][{"id": 2}]',
+    'unclosed array': '[{"id": 1}',
+    'bad record': '[{"id": 1}, {"id": tru}, {"id": 3}]'
+}
+
+def stream(text: str, chunk_size: int):
+    return list(DataProcessor.iter_json(io.StringIO(text), chunk_size))
+
+@pytest.mark.parametrize('name', DOCUMENTS)
+def test_any_chunk_size_yields_the_same_records(name):
+    text = DOCUMENTS[name]
+    expected = stream(text, 1 << 20)
+    assert json.dumps(expected) == json.dumps(RECORDS if name != 'empty array' else [])
+    for chunk_size in range(1, 40):
+        assert json.dumps(stream(text, chunk_size)) == json.dumps(expected), chunk_size
+
+@pytest.mark.parametrize('name', MALFORMED)
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+def test_malformed_input_is_rejected(name, chunk_size):
+    with pytest.raises(ValueError):
+        stream(MALFORMED[name], chunk_size)
+
+def test_bad_record_fails_without_reading_the_rest_of_the_file():
+    record = json.dumps({'description': 'x' * 100})
+    prefix = '[' + record + ', '
+    text = io.StringIO(prefix + '{"id": bogus}, ' + ', '.join([record] * 10000) + ']')
+    reads = []
+    read = text.read
+    text.read = lambda size=-1: reads.append(size) or read(size)
+
+    with pytest.raises(ValueError, match=f'record at character {len(prefix)}:'):
+        list(DataProcessor.iter_json(text, 4096))
+    assert len(reads) == 1
@@ -0,0 +1,84 @@
+"""
+Address normalization and the persisted location index
+"""
+
+import uuid
+
+import pytest
+
+from location_index import LocationIndex, normalize_address
+from rows import LocationsRow
+
+def location(address_line_1='12 Main St', city='Atlanta', state='GA', zip_code='30301', address_line_2=None,
+             latitude=33.748995, longitude=-84.387982, location_id=None):
+    return LocationsRow(location_id or str(uuid.uuid4()), address_line_1, address_line_2, city, state, zip_code,
+                        'Fulton', latitude, longitude)
+
+def test_case_and_whitespace_do_not_split_an_address():
+    key = normalize_address(location())
+    assert key == '12 main st|atlanta|ga|30301'
+    assert normalize_address(location(address_line_1='  12  MAIN\tst ', city='ATLANTA', state='ga')) == key
+
+def test_units_and_fields_keep_addresses_apart():
+    key = normalize_address(location())
+    assert normalize_address(location(address_line_2='Apt 1')) == key + '|apt 1'
+    assert normalize_address(location(address_line_2='APT  1')) == key + '|apt 1'
+    assert normalize_address(location(address_line_2='Apt 2')) != normalize_address(location(address_line_2='Apt 1'))
+    assert normalize_address(location(zip_code='30302')) != key
+    assert normalize_address(location(address_line_1=None)) is None
+
+def test_coordinates_count_only_with_a_precision():
+    near = location(latitude=33.74901, longitude=-84.38801)
+    far = location(latitude=33.7501, longitude=-84.38801)
+
+    assert normalize_address(near) == normalize_address(far)
+    assert normalize_address(location(), 4) == normalize_address(near, 4) == '12 main st|atlanta|ga|30301|33.7490|-84.3880'
+    assert normalize_address(far, 4) != normalize_address(near, 4)
+    assert normalize_address(location(latitude=None), 4).endswith('|30301||-84.3880')
+
+def test_same_address_resolves_to_the_first_id_and_is_emitted_once():
+    index = LocationIndex('uuid4')
+    first = location(location_id='first')
+
+    assert index.resolve(first) == ('first', True)
+    assert index.resolve(location(city='atlanta', location_id='second')) == ('first', False)
+    assert index.resolve(location(address_line_2='Apt 1', location_id='third')) == ('third', True)
+    assert index.resolve(location(address_line_1='', location_id='fourth')) == ('fourth', True)
+    assert (index.hits, index.misses) == (1, 3)
+
+@pytest.mark.parametrize('key_strategy, make_id', [('uuid4', lambda: str(uuid.uuid4())),
+                                                   ('uuid7_binary', lambda: uuid.uuid4().bytes)])
+def test_saved_index_loads_back(tmp_path, key_strategy, make_id):
+    path = tmp_path / 'location_index.json'
+    index = LocationIndex(key_strategy, 4)
+    for street in ('1 Oak Ave', '2 Oak Ave'):
+        index.resolve(location(address_line_1=street, location_id=make_id()))
+    index.save(path)
+
+    loaded = LocationIndex(key_strategy, 4)
+    loaded.load(path)
+    assert loaded.locations == index.locations
+    # A new run emits each location's row again, under its saved id
+    again = location(address_line_1='1 OAK AVE', location_id=make_id())
+    assert loaded.resolve(again) == (index.locations[normalize_address(again, 4)], True)
+
+@pytest.mark.parametrize('key_strategy, precision', [('uuid7_binary', 4), ('uuid4', None), ('uuid4', 3)])
+def test_index_built_with_other_key_settings_is_ignored(tmp_path, key_strategy, precision):
+    path = tmp_path / 'location_index.json'
+    index = LocationIndex('uuid4', 4)
+    index.resolve(location())
+    index.save(path)
+
+    loaded = LocationIndex(key_strategy, precision)
+    loaded.load(path)
+    assert loaded.locations == {}
+
+def test_changes_replay_onto_an_empty_index():
+    index = LocationIndex('uuid7_binary')
+    index.resolve(location(location_id=uuid.uuid4().bytes))
+    index.resolve(location(location_id=uuid.uuid4().bytes))
+
+    replayed = LocationIndex('uuid7_binary')
+    replayed.apply_changes(index.take_changes())
+    assert (replayed.locations, replayed.emitted) == (index.locations, index.emitted)
+    assert index.take_changes() == {'binary': False, 'locations': {}, 'emitted': []}
@@ -0,0 +1,21 @@
+"""
+Schema script generated per key strategy
+"""
+
+from config import KEY_COLUMN_TYPES, SCHEMA_FILE
+from utils import KEY_COLUMN_PATTERN, schema_script
+
+def test_uuid4_schema_is_the_file_itself():
+    assert schema_script(SCHEMA_FILE, 'uuid4') == SCHEMA_FILE.read_text()
+
+def test_binary_schema_differs_only_in_key_column_types():
+    original = SCHEMA_FILE.read_text().splitlines()
+    binary = schema_script(SCHEMA_FILE, 'uuid7_binary').splitlines()
+    assert len(binary) == len(original)
+
+    changed = [(before, after) for before, after in zip(original, binary) if before != after]
+    assert changed
+    for before, after in changed:
+        assert KEY_COLUMN_PATTERN.match(before), before
+        assert after == before.replace(KEY_COLUMN_TYPES['uuid4'], KEY_COLUMN_TYPES['uuid7_binary'], 1)
+    assert not KEY_COLUMN_PATTERN.search('\n'.join(binary))
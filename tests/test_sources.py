@@ -0,0 +1,23 @@
+"""
+Decompressing input sources
+"""
+
+import json
+
+import pytest
+
+from sources import InputSource
+
+def test_every_frame_of_a_multi_frame_zstd_file_is_read(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    records = [{'id': index, 'city': f'City {index}'} for index in range(6)]
+    path = tmp_path / 'shards.ndjson.zst'
+    # Two independently compressed frames, as concatenated shards or pzstd write them
+    path.write_bytes(b''.join(
+        zstandard.ZstdCompressor().compress(''.join(json.dumps(record) + '\n' for record in part).encode('utf-8'))
+        for part in (records[:3], records[3:])
+    ))
+
+    source = InputSource(path, readers=1)
+    assert list(source.records()) == records
+    assert source.stats[0]['records'] == len(records)
@@ -0,0 +1,74 @@
+"""
+Compiled validation scans
+"""
+
+from typing import List, Optional
+
+from config import ETL_CONFIG
+from validation_rules import VALIDATED_TABLES, ValidationEngine, active_rules, compile_rules, compile_table_scan
+
+RULES = [
+    {'name': 'Orphans', 'table': 'hoa_details', 'category': 'foreign_keys', 'join': 'p',
+     'condition': 'p.property_id IS NULL'},
+    {'name': 'High fees', 'table': 'hoa_details', 'category': 'business_rules', 'condition': 't.monthly_fee > 5000'},
+    {'name': 'Orphan fees', 'table': 'hoa_details', 'category': 'foreign_keys', 'join': 'p',
+     'condition': 'p.property_id IS NULL AND t.monthly_fee > 0'},
+    {'name': 'Negative amounts', 'table': 'property_valuations', 'category': 'data_quality',
+     'condition': 't.valuation_amount <= 0'}
+]
+
+class FakeDatabase:
+    """Stands in for DatabaseManager: one canned result row per query"""
+
+    pool = None
+
+    def __init__(self):
+        self.queries: List[str] = []
+
+    def execute_query(self, query: str, params: Optional[tuple] = None, commit: bool = True, fetch: bool = True):
+        self.queries.append(query)
+        return [(10,) + (3,) * query.count('SUM(')]
+
+def test_rules_of_a_table_compile_to_one_select():
+    assert compile_table_scan('hoa_details', RULES[:3]) == (
+        "SELECT COUNT(*), "
+        "SUM(CASE WHEN p.property_id IS NULL THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN t.monthly_fee > 5000 THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN p.property_id IS NULL AND t.monthly_fee > 0 THEN 1 ELSE 0 END) "
+        "FROM hoa_details t LEFT JOIN properties p ON t.property_id = p.property_id"
+    )
+    assert compile_table_scan('property_locations', []) == "SELECT COUNT(*) FROM property_locations t"
+
+def test_custom_rules_scan_only_their_tables():
+    compiled = compile_rules(RULES)
+    assert list(compiled) == ['hoa_details', 'property_valuations']
+    assert compiled['property_valuations'] == (
+        "SELECT COUNT(*), SUM(CASE WHEN t.valuation_amount <= 0 THEN 1 ELSE 0 END) FROM property_valuations t",
+        [RULES[3]]
+    )
+
+def test_default_rules_scan_each_table_once(monkeypatch):
+    for dimension_tables in (False, True):
+        monkeypatch.setitem(ETL_CONFIG, 'dimension_tables', dimension_tables)
+        compiled = compile_rules()
+
+        assert list(compiled) == VALIDATED_TABLES
+        assert sorted(rule['name'] for _, rules in compiled.values() for rule in rules) == \
+            sorted(rule['name'] for rule in active_rules())
+        for table, (query, rules) in compiled.items():
+            assert query.count('SELECT') == 1 and query.count('SUM(') == len(rules)
+            assert f"FROM {table} t" in query
+
+    # Categorical columns are ids with dimension tables
+    assert 't.property_type_id IS NULL' in compiled['properties'][0]
+
+def test_engine_reports_one_count_per_rule():
+    database = FakeDatabase()
+    report = ValidationEngine(database, RULES).run()
+
+    assert len(database.queries) == 2
+    assert report['tables'].keys() == {'hoa_details', 'property_valuations'}
+    assert [(check['name'], check['count'], check['status']) for check in report['checks']] == [
+        (rule['name'], 3, 'warning') for rule in RULES
+    ]
+    assert report['passed'] and report['warnings'] == 4